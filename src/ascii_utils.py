@@ -1,23 +1,72 @@
-from src.logger import logger
+from src.logger import logger, preview
+
+
+def text_to_bytes(text: str) -> bytes:
+    """
+    Convert text to bytes, one byte per character.
+    Example:
+        >>> text_to_bytes("Hi")
+        b'Hi'
+    """
+    try:
+        return text.encode("latin-1")
+    except UnicodeEncodeError as e:
+        raise ValueError(
+            f"Character {text[e.start]!r} does not fit in an 8-bit block"
+        ) from e
+
+
+def bytes_to_text(data: bytes) -> str:
+    """
+    Convert bytes back to text, one character per byte.
+    Example:
+        >>> bytes_to_text(b"Hi")
+        'Hi'
+    """
+    return str(data, "latin-1")
+
+
+def bytes_to_binary(data: bytes) -> str:
+    """
+    Convert bytes to a string of '0'/'1' characters, 8 per byte.
+    Example:
+        >>> bytes_to_binary(b"A")
+        '01000001'
+    """
+    if not len(data):
+        return ""
+    return format(int.from_bytes(data, "big"), f"0{len(data) * 8}b")
+
+
+def binary_to_bytes(binary: str) -> bytes:
+    """
+    Convert a string of '0'/'1' characters to bytes, 8 bits per byte.
+    A trailing partial block becomes one last byte holding its value.
+    Example:
+        >>> binary_to_bytes("0100000101000010")
+        b'AB'
+    """
+    whole = len(binary) - len(binary) % 8
+    data = int(binary[:whole], 2).to_bytes(whole // 8, "big") if whole else b""
+    if whole < len(binary):
+        data += bytes([int(binary[whole:], 2)])
+    return data
 
 
 def text_to_binary(text: str) -> str:
-    logger.info(f"Converting text to binary: {text}")
-    binary = []
-    for char in text:
-        binary.append(format(ord(char), "08b"))
-    logger.info(f"Binary representation: {''.join(binary)}")
-    return "".join(binary)
+    logger.opt(lazy=True).debug("Converting text to binary: {}", lambda: preview(text))
+    binary = bytes_to_binary(text_to_bytes(text))
+    logger.opt(lazy=True).debug("Binary representation: {}", lambda: preview(binary))
+    return binary
 
 
 def binary_to_text(binary: str) -> str:
-    logger.info(f"Converting binary to text: {binary}")
-    text = []
-    for i in range(0, len(binary), 8):
-        byte = binary[i : i + 8]
-        text.append(chr(int(byte, 2)))
-    logger.info(f"Reconverted text: {''.join(text)}")
-    return "".join(text)
+    logger.opt(lazy=True).debug(
+        "Converting binary to text: {}", lambda: preview(binary)
+    )
+    text = bytes_to_text(binary_to_bytes(binary))
+    logger.opt(lazy=True).debug("Reconverted text: {}", lambda: preview(text))
+    return text
 
 
 if __name__ == "__main__":
@@ -0,0 +1,299 @@
+"""
+asyncio client and connection pool for PAM5 servers.
+
+AsyncPAM5Client keeps one connection open and pipelines frames on it:
+send_many writes every frame before waiting for the socket to drain, so
+many small messages cost one round of syscalls instead of one round trip
+each. PAM5ConnectionPool reuses those clients per (host, port) and
+reconnects with exponential backoff when a connection drops.
+"""
+
+import asyncio
+import pickle
+import random
+import socket
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, Dict, Iterable, List, Tuple, Union
+
+from src.logger import logger
+from src.protocol import (
+    FRAME_ACCEPT,
+    HEADER,
+    SUPPORTED_PACKINGS,
+    ProtocolError,
+    accepted_codecs,
+    build_hello,
+    frame_buffers,
+    parse_control,
+    parse_header,
+)
+
+
+class AsyncPAM5Client:
+    def __init__(
+        self,
+        host: str = "192.168.15.4",
+        port: int = 5225,
+        wire_format: str = "binary",
+        handshake_timeout: float = 2.0,
+    ):
+        self.host = host
+        self.port = port
+        self.wire_format = wire_format
+        self.handshake_timeout = handshake_timeout
+        self.reader = None
+        self.writer = None
+        # Empacotamentos e codecs aceitos pelo servidor; None = pickle legado
+        self.packings = None
+        self.last_used = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return (
+            self.writer is not None
+            and not self.writer.is_closing()
+            and not self.reader.at_eof()
+        )
+
+    @property
+    def codecs(self) -> Tuple[str, ...]:
+        """Compression codecs the server can decompress, from its ACCEPT."""
+        if self.packings is None:
+            return ()
+        return accepted_codecs(self.packings)
+
+    async def connect(self):
+        """
+        Open the connection and negotiate the wire format.
+
+        wire_format is "binary", "pickle" or "auto", which tries the binary
+        format and falls back to pickle if the server does not answer the
+        handshake.
+        """
+        await self._open()
+        self.packings = None
+        if self.wire_format != "pickle":
+            try:
+                self.packings = await asyncio.wait_for(
+                    self._negotiate(), self.handshake_timeout
+                )
+            except (
+                asyncio.TimeoutError,
+                asyncio.IncompleteReadError,
+                OSError,
+                ProtocolError,
+            ) as e:
+                await self.close()
+                if self.wire_format == "binary":
+                    raise ConnectionError(f"Handshake failed: {e}") from e
+                # Servidor legado: reconecta com o framing pickle
+                logger.warning(f"Handshake failed ({e}), using pickle framing")
+                await self._open()
+
+        self.last_used = time.monotonic()
+        logger.info(f"Connected to server at {self.host}:{self.port}")
+
+    async def _open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        sock = self.writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    async def _negotiate(self) -> int:
+        self.writer.write(build_hello())
+        await self.writer.drain()
+        header = parse_header(await self.reader.readexactly(HEADER.size))
+        # ACCEPT leva um único byte de capacidades: não lê corpos de outro tamanho
+        if header.body_length != 1:
+            raise ProtocolError(
+                f"Control frame body of {header.body_length} bytes, expected 1"
+            )
+        body = await self.reader.readexactly(header.body_length)
+        packings = parse_control(header, body, FRAME_ACCEPT)
+        if not packings & SUPPORTED_PACKINGS:
+            raise ProtocolError("Server accepted no symbol packing")
+        return packings
+
+    def _buffers(self, data: Dict) -> List:
+        if self.packings is None:
+            serialized_data = pickle.dumps(data)
+            return [len(serialized_data).to_bytes(4, byteorder="big"), serialized_data]
+        return frame_buffers(data, self.packings)
+
+    async def send_data(self, data: Dict):
+        """Send one message and wait until it has been handed to the kernel."""
+        await self.send_many([data])
+
+    async def send_many(self, messages: Iterable[Dict]) -> int:
+        """
+        Pipeline many messages on the connection: every frame is queued
+        before a single drain, so throughput is bound by bandwidth, not RTT.
+        """
+        if not self.connected:
+            raise ConnectionError("Client is not connected to the server.")
+        buffers = []
+        sent = 0
+        for data in messages:
+            buffers.extend(self._buffers(data))
+            sent += 1
+        # writelines usa sendmsg (scatter-gather) quando disponível
+        self.writer.writelines(buffers)
+        await self.writer.drain()
+        self.last_used = time.monotonic()
+        logger.debug("Sent {} messages to {}:{}", sent, self.host, self.port)
+        return sent
+
+    async def send_stream(
+        self, frames: Union[Iterable[Dict], AsyncIterable[Dict]]
+    ) -> int:
+        """Send frames as they are produced, draining after each one."""
+        sent = 0
+        if hasattr(frames, "__aiter__"):
+            async for frame in frames:
+                sent += await self.send_many([frame])
+        else:
+            for frame in frames:
+                sent += await self.send_many([frame])
+        return sent
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError as e:
+                logger.error(f"Error while disconnecting: {e}")
+            finally:
+                self.reader = None
+                self.writer = None
+                logger.info("Disconnected from server.")
+
+
+class PAM5ConnectionPool:
+    """
+    Keep-alive pool of AsyncPAM5Client connections keyed by (host, port).
+
+    At most max_per_host connections are open per key; idle connections
+    older than idle_timeout are closed instead of reused.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 4,
+        idle_timeout: float = 60.0,
+        max_retries: int = 5,
+        backoff_base: float = 0.1,
+        backoff_max: float = 5.0,
+        **client_options,
+    ):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.client_options = client_options
+        self._idle = {}
+        self._slots = {}
+
+    def _slot(self, key) -> asyncio.Semaphore:
+        if key not in self._slots:
+            self._slots[key] = asyncio.Semaphore(self.max_per_host)
+            self._idle[key] = deque()
+        return self._slots[key]
+
+    async def _open(self, host: str, port: int) -> AsyncPAM5Client:
+        """Connect, retrying with exponential backoff and jitter."""
+        for attempt in range(self.max_retries + 1):
+            client = AsyncPAM5Client(host, port, **self.client_options)
+            try:
+                await client.connect()
+                return client
+            except OSError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(
+                    f"Connection to {host}:{port} failed ({e}), "
+                    f"retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def acquire(self, host: str, port: int) -> AsyncPAM5Client:
+        key = (host, port)
+        await self._slot(key).acquire()
+        idle = self._idle[key]
+        try:
+            if idle:
+                # Uma volta do event loop processa o EOF pendente de conexões
+                # que o servidor fechou enquanto estavam ociosas
+                await asyncio.sleep(0)
+            now = time.monotonic()
+            while idle:
+                client = idle.pop()
+                if client.connected and now - client.last_used < self.idle_timeout:
+                    return client
+                await client.close()
+            return await self._open(host, port)
+        except BaseException:
+            self._slots[key].release()
+            raise
+
+    async def release(self, client: AsyncPAM5Client):
+        key = (client.host, client.port)
+        if client.connected:
+            self._idle[key].append(client)
+        else:
+            await client.close()
+        self._slots[key].release()
+
+    @asynccontextmanager
+    async def connection(self, host: str, port: int):
+        client = await self.acquire(host, port)
+        try:
+            yield client
+        except BaseException:
+            await client.close()
+            raise
+        finally:
+            await self.release(client)
+
+    async def send_many(self, host: str, port: int, messages: Iterable[Dict]) -> int:
+        """
+        Pipeline messages on a pooled connection. Pooled connections the
+        server closed are replaced before anything is written; a connection
+        lost during the send is not retried, since the server may already
+        have received part of the batch.
+        """
+        async with self.connection(host, port) as client:
+            return await client.send_many(messages)
+
+    async def send_data(self, host: str, port: int, data: Dict):
+        await self.send_many(host, port, [data])
+
+    async def close(self):
+        for idle in self._idle.values():
+            while idle:
+                await idle.pop().close()
+
+
+if __name__ == "__main__":
+    from src.ascii_utils import text_to_bytes
+    from src.stream import encode_stream
+
+    async def main():
+        pool = PAM5ConnectionPool()
+        messages = [
+            next(encode_stream(text_to_bytes(f"Mensagem {i}"), "chave123"))
+            for i in range(1000)
+        ]
+        start = time.perf_counter()
+        await pool.send_many("127.0.0.1", 5225, messages)
+        elapsed = time.perf_counter() - start
+        print(f"{len(messages)} mensagens em {elapsed * 1000:.1f} ms")
+        await pool.close()
+
+    asyncio.run(main())
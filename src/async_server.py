@@ -0,0 +1,290 @@
+"""
+asyncio variant of PAM5Server for many concurrent connections.
+
+Each connection is a task instead of a thread, so thousands of idle
+clients cost only a few KB each. The message_callback contract is the
+same as PAM5Server's: it gets the message dict and may be a plain function
+or a coroutine function.
+"""
+
+import asyncio
+import inspect
+import pickle
+from typing import Optional
+
+from src.logger import logger
+from src.metrics import (
+    ACTIVE_CONNECTIONS,
+    PENDING_CALLBACKS,
+    STAGE_SECONDS,
+    get_metrics,
+    serve_metrics,
+)
+from src.protocol import (
+    FRAME_HELLO,
+    HEADER,
+    MAGIC,
+    SUPPORTED_CAPABILITIES,
+    SUPPORTED_PACKINGS,
+    ChecksumError,
+    ProtocolError,
+    build_accept,
+    build_nack,
+    build_window,
+    decode_frame,
+    encode_frame,
+    parse_control,
+    parse_header,
+)
+from src.reliable import Resequencer
+
+
+class AsyncPAM5Server:
+    def __init__(
+        self,
+        allow_pickle: bool = False,
+        backlog: int = 4096,
+        max_pending_callbacks: int = 1024,
+        max_frame_size: int = 256 * 1024 * 1024,
+        sync_callback_in_thread: bool = False,
+        metrics_port: Optional[int] = None,
+        metrics_host: str = "127.0.0.1",
+    ):
+        self.server = None
+        self.running = False
+        self.allow_pickle = allow_pickle
+        self.backlog = backlog
+        self.max_frame_size = max_frame_size
+        # Rodar callbacks síncronos em thread evita travar o event loop
+        self.sync_callback_in_thread = sync_callback_in_thread
+        # Backpressure: cada conexão só lê o próximo frame depois que o
+        # callback do anterior terminou, e no máximo max_pending_callbacks
+        # callbacks rodam ao mesmo tempo no servidor inteiro
+        self._callback_slots = asyncio.Semaphore(max_pending_callbacks)
+        self.message_callback = None
+        self.clients = {}
+        self._busy = set()
+        self.metrics_port = metrics_port
+        # O endpoint fica só local, mesmo com o servidor em 0.0.0.0
+        self.metrics_host = metrics_host
+        self.metrics_server = None
+
+    @property
+    def active_connections(self) -> int:
+        return len(self.clients)
+
+    async def start(self, host="0.0.0.0", port=5225, message_callback=None):
+        """Bind and start accepting connections; returns once listening."""
+        self.message_callback = message_callback
+        self.server = await asyncio.start_server(
+            self._handle_client, host, port, backlog=self.backlog, reuse_address=True
+        )
+        self.running = True
+        logger.info(f"Async server running on {host}:{port}")
+        if self.metrics_port is not None and self.metrics_server is None:
+            self.metrics_server = serve_metrics(self.metrics_host, self.metrics_port)
+
+    async def serve_forever(self):
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    async def _handle_client(self, reader, writer):
+        client_address = writer.get_extra_info("peername")
+        task = asyncio.current_task()
+        self.clients[task] = [writer, None]
+        metrics = get_metrics()
+        metrics.set(ACTIVE_CONNECTIONS, len(self.clients), server="async")
+        logger.debug("Client connection established: {}", client_address)
+
+        try:
+            async for data in self._iter_messages(reader, writer, task):
+                self._busy.add(task)
+                metrics.set(PENDING_CALLBACKS, len(self._busy), server="async")
+                try:
+                    error = None
+                    async with self._callback_slots:
+                        with metrics.timer(STAGE_SECONDS, stage="callback"):
+                            try:
+                                await self._run_callback(data)
+                            except Exception as e:
+                                # Como no PAM5Server: o erro não derruba a
+                                # conexão nem os outros streams dela
+                                logger.error(f"Error in message callback: {e}")
+                                error = e
+                    if data.get("flow_control"):
+                        if error is not None:
+                            # Sem janela: o NACK encerra o stream no remetente
+                            writer.write(build_nack(data["stream_id"], data["seq"]))
+                        elif data["original_length"] >= 8:
+                            # Chunk consumido: devolve a janela do stream
+                            writer.write(
+                                build_window(
+                                    data["stream_id"], data["original_length"] // 8
+                                )
+                            )
+                finally:
+                    self._busy.discard(task)
+                    metrics.set(PENDING_CALLBACKS, len(self._busy), server="async")
+        except asyncio.CancelledError:
+            pass
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.error(
+                f"Connection error while handling client {client_address}: {e}"
+            )
+        except Exception as e:
+            logger.error(f"Error handling client {client_address}: {e}")
+        finally:
+            self.clients.pop(task, None)
+            metrics.set(ACTIVE_CONNECTIONS, len(self.clients), server="async")
+            writer.close()
+            logger.debug("Client {} disconnected.", client_address)
+
+    async def _run_callback(self, data):
+        callback = self.message_callback
+        if callback is None:
+            return
+        if self.sync_callback_in_thread and not inspect.iscoroutinefunction(callback):
+            result = await asyncio.to_thread(callback, data)
+        else:
+            result = callback(data)
+        if inspect.isawaitable(result):
+            await result
+
+    async def _iter_messages(self, reader, writer, task):
+        try:
+            prefix = await reader.readexactly(len(MAGIC))
+        except asyncio.IncompleteReadError:
+            return
+
+        if prefix == MAGIC:
+            header = parse_header(prefix + await reader.readexactly(HEADER.size - 2))
+            self._check_size(header.body_length)
+            body = await reader.readexactly(header.body_length)
+            packings = parse_control(header, body, FRAME_HELLO) & SUPPORTED_CAPABILITIES
+            if not packings & SUPPORTED_PACKINGS:
+                raise ProtocolError("Client offered no supported symbol packing")
+            self.clients[task][1] = packings
+            writer.write(build_accept(packings))
+            await writer.drain()
+
+            resequencer = Resequencer(writer.write)
+            metrics = get_metrics()
+            while self.running:
+                header_bytes = await self._read_next(reader, HEADER.size)
+                if header_bytes is None:
+                    return
+                header = parse_header(header_bytes)
+                self._check_size(header.body_length)
+                with metrics.stage("recv", nbytes=HEADER.size + header.body_length):
+                    body = await reader.readexactly(header.body_length)
+                try:
+                    with metrics.stage("deserialize", symbols=header.symbol_count):
+                        message = decode_frame(header, body)
+                except ChecksumError as e:
+                    resequencer.corrupt(e)
+                    continue
+                if message.get("checksum") and "stream_id" in message:
+                    for delivered in resequencer.push(message):
+                        yield delivered
+                else:
+                    yield message
+
+        elif self.allow_pickle:
+            size_data = prefix + await reader.readexactly(2)
+            while self.running and size_data:
+                data_size = int.from_bytes(size_data, byteorder="big")
+                self._check_size(data_size)
+                yield pickle.loads(await reader.readexactly(data_size))
+                size_data = await self._read_next(reader, 4)
+
+        else:
+            logger.warning("Rejected client using legacy pickle framing")
+
+    @staticmethod
+    async def _read_next(reader, size):
+        """Read the next frame prefix, or None on a clean close between frames."""
+        try:
+            return await reader.readexactly(size)
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            return None
+
+    def _check_size(self, size):
+        if size > self.max_frame_size:
+            raise ProtocolError(
+                f"Frame of {size} bytes exceeds the {self.max_frame_size} byte limit"
+            )
+
+    async def broadcast_message(self, data):
+        """Send data to every connected client, serialized once per format."""
+        serialized = {}
+        writers = []
+        for writer, packings in list(self.clients.values()):
+            if packings not in serialized:
+                if packings:
+                    serialized[packings] = encode_frame(data, packings)
+                else:
+                    payload = pickle.dumps(data)
+                    serialized[packings] = len(payload).to_bytes(4, "big") + payload
+            writer.write(serialized[packings])
+            writers.append(writer)
+
+        results = await asyncio.gather(
+            *(writer.drain() for writer in writers), return_exceptions=True
+        )
+        for writer, result in zip(writers, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error in broadcasting to client: {result}")
+                writer.close()
+
+    async def stop(self, timeout: float = 5.0):
+        """
+        Stop accepting connections, let callbacks already running finish for
+        up to timeout seconds, then close every connection.
+        """
+        self.running = False
+        if self.server:
+            self.server.close()
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+
+        idle = [task for task in self.clients if task not in self._busy]
+        for task in idle:
+            task.cancel()
+
+        busy = list(self._busy)
+        if busy:
+            _, pending = await asyncio.wait(busy, timeout=timeout)
+            for task in pending:
+                task.cancel()
+
+        remaining = list(self.clients)
+        if remaining:
+            await asyncio.gather(*remaining, return_exceptions=True)
+
+        if self.server:
+            await self.server.wait_closed()
+            self.server = None
+        logger.info("Async server stopped successfully.")
+
+
+if __name__ == "__main__":
+    from src.stream import decode_chunk
+
+    async def print_message(data):
+        print(f"Mensagem recebida: {decode_chunk(data)!r}")
+
+    async def main():
+        server = AsyncPAM5Server()
+        await server.start(port=5225, message_callback=print_message)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.stop()
+
+    asyncio.run(main())
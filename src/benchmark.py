@@ -0,0 +1,331 @@
+"""
+Benchmark harness for the Host A -> Host B pipeline.
+
+Times every stage on its own, fed with the output of the previous one:
+
+    str API    text_to_binary, encrypt_data, encoder_4d_pam5, pickle,
+               tcp_loopback (pickle framing), decoder_4d_pam5, decrypt_data
+    bytes API  text_to_bytes, encrypt_bytes, encoder_4d_pam5_bytes,
+               frame, tcp_loopback (binary frames), decoder_4d_pam5_bytes,
+               decrypt_bytes
+
+and writes the results as JSON so two commits can be compared:
+
+    python -m src.benchmark --output before.json
+    python -m src.benchmark --output after.json --compare before.json
+
+The str API keeps one Python object per bit/symbol, so it is skipped above
+--str-limit bytes (1M by default) to stay within memory.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import statistics
+import string
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.ascii_utils import text_to_binary, text_to_bytes
+from src.client import PAM5Client
+from src.crypto import decrypt_bytes, decrypt_data, encrypt_bytes, encrypt_data
+from src.decoder import decoder_4d_pam5, decoder_4d_pam5_bytes
+from src.encoder import encoder_4d_pam5, encoder_4d_pam5_bytes
+from src.logger import configure_logging, logger
+from src.protocol import encode_frame
+from src.server import PAM5Server
+
+DEFAULT_SIZES = "16,1K,64K,1M,16M,100M"
+DEFAULT_KEY = "chave123"
+_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a size such as "16", "64K" or "100M".
+    Example:
+        >>> parse_size("64K")
+        65536
+    """
+    text = text.strip().upper().removesuffix("B")
+    unit = text[-1:] if text[-1:] in _UNITS else ""
+    return int(text[: len(text) - len(unit)]) * _UNITS[unit]
+
+
+def make_message(size: int, seed: int = 0) -> str:
+    """Printable ASCII text of exactly size characters."""
+    alphabet = np.frombuffer(
+        (string.ascii_letters + string.digits + " ").encode("ascii"), dtype=np.uint8
+    )
+    indices = np.random.default_rng(seed).integers(
+        0, len(alphabet), size, dtype=np.uint8
+    )
+    return alphabet[indices].tobytes().decode("ascii")
+
+
+def measure(
+    function: Callable, repeat: int = 5, min_time: float = 0.2
+) -> Dict[str, float]:
+    """
+    Run function up to repeat times (at least once), stopping early once
+    min_time seconds were spent, and summarize the timings.
+    """
+    timings = []
+    while len(timings) < repeat:
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+        if sum(timings) >= min_time:
+            break
+    return {
+        "rounds": len(timings),
+        "min_s": min(timings),
+        "mean_s": statistics.fmean(timings),
+        "median_s": statistics.median(timings),
+    }
+
+
+class LoopbackLink:
+    """
+    A PAM5Server on 127.0.0.1 plus one client per wire format. send()
+    returns once the server callback received the message.
+    """
+
+    def __init__(self, timeout: float = 120.0):
+        self.timeout = timeout
+        self.received = threading.Event()
+        self.server = PAM5Server(allow_pickle=True)
+        self.thread = threading.Thread(
+            target=lambda: self.server.start(
+                host="127.0.0.1", port=0, message_callback=self._on_message
+            ),
+            daemon=True,
+        )
+        self.thread.start()
+
+        deadline = time.monotonic() + 5
+        while not self.server.running:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Benchmark server did not start")
+            time.sleep(0.01)
+        self.port = self.server.socket.getsockname()[1]
+        self.clients = {}
+
+    def _on_message(self, data):
+        self.received.set()
+
+    def client(self, wire_format: str) -> PAM5Client:
+        if wire_format not in self.clients:
+            client = PAM5Client()
+            client.connect("127.0.0.1", self.port, wire_format=wire_format)
+            self.clients[wire_format] = client
+        return self.clients[wire_format]
+
+    def send(self, data: Dict, wire_format: str) -> None:
+        self.received.clear()
+        self.client(wire_format).send_data(data)
+        if not self.received.wait(self.timeout):
+            raise TimeoutError("Server did not receive the benchmark message")
+
+    def close(self) -> None:
+        for client in self.clients.values():
+            client.disconnect()
+        self.server.stop()
+
+
+def str_stages(message: str, key: str, link: Optional[LoopbackLink]) -> List:
+    """(name, function) pairs of the string API, each fed by the previous one."""
+    # encrypt_data recebe o texto, como na GUI; text_to_binary é só exibido
+    encrypted = encrypt_data(message, key)
+    symbols = encoder_4d_pam5(encrypted)
+    data = {"symbols": symbols, "key": key, "original_length": len(encrypted)}
+    decoded = decoder_4d_pam5(symbols)[: len(encrypted)]
+
+    stages = [
+        ("text_to_binary", lambda: text_to_binary(message)),
+        ("encrypt_data", lambda: encrypt_data(message, key)),
+        ("encoder_4d_pam5", lambda: encoder_4d_pam5(encrypted)),
+        ("pickle", lambda: pickle.loads(pickle.dumps(data))),
+    ]
+    if link is not None:
+        stages.append(("tcp_loopback", lambda: link.send(data, "pickle")))
+    stages += [
+        ("decoder_4d_pam5", lambda: decoder_4d_pam5(symbols)),
+        ("decrypt_data", lambda: decrypt_data(decoded, key)),
+    ]
+    return stages
+
+
+def bytes_stages(message: str, key: str, link: Optional[LoopbackLink]) -> List:
+    """(name, function) pairs of the bytes API, each fed by the previous one."""
+    key_bytes = key.encode("utf-8")
+    payload = text_to_bytes(message)
+    encrypted = encrypt_bytes(payload, key_bytes)
+    symbols = encoder_4d_pam5_bytes(encrypted)
+    data = {"symbols": symbols, "key": key, "original_length": len(encrypted) * 8}
+    decoded = decoder_4d_pam5_bytes(symbols)
+
+    stages = [
+        ("text_to_bytes", lambda: text_to_bytes(message)),
+        ("encrypt_bytes", lambda: encrypt_bytes(payload, key_bytes)),
+        ("encoder_4d_pam5_bytes", lambda: encoder_4d_pam5_bytes(encrypted)),
+        ("frame", lambda: encode_frame(data)),
+    ]
+    if link is not None:
+        stages.append(("tcp_loopback", lambda: link.send(data, "binary")))
+    stages += [
+        ("decoder_4d_pam5_bytes", lambda: decoder_4d_pam5_bytes(symbols)),
+        ("decrypt_bytes", lambda: decrypt_bytes(decoded, key_bytes)),
+    ]
+    return stages
+
+
+API_STAGES = {"str": str_stages, "bytes": bytes_stages}
+
+
+def run(
+    sizes: List[int],
+    apis: List[str],
+    key: str = DEFAULT_KEY,
+    repeat: int = 5,
+    min_time: float = 0.2,
+    str_limit: int = 1024**2,
+    tcp: bool = True,
+    stages: Optional[List[str]] = None,
+) -> List[Dict]:
+    """Benchmark every selected stage for every size and API."""
+    results = []
+    link = LoopbackLink() if tcp else None
+    try:
+        for size in sizes:
+            message = make_message(size, seed=size)
+            for api in apis:
+                if api == "str" and size > str_limit:
+                    results.append(
+                        {"api": api, "size": size, "skipped": "above --str-limit"}
+                    )
+                    continue
+                for name, function in API_STAGES[api](message, key, link):
+                    if stages and name not in stages:
+                        continue
+                    timing = measure(function, repeat, min_time)
+                    results.append(
+                        {
+                            "api": api,
+                            "stage": name,
+                            "size": size,
+                            **timing,
+                            "mb_per_s": size / timing["median_s"] / 1e6,
+                        }
+                    )
+                    logger.info(
+                        "{} {:>22} {:>10} B {:>10.3f} ms {:>10.1f} MB/s",
+                        api,
+                        name,
+                        size,
+                        timing["median_s"] * 1e3,
+                        results[-1]["mb_per_s"],
+                    )
+    finally:
+        if link is not None:
+            link.close()
+    return results
+
+
+def environment() -> Dict:
+    """Interpreter, library and commit information stored with the results."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: List[Dict], baseline: List[Dict]) -> List[str]:
+    """
+    One line per stage present in both runs, with the median speedup.
+    Example:
+        >>> compare(
+        ...     [{"api": "str", "stage": "pickle", "size": 16, "median_s": 1.0}],
+        ...     [{"api": "str", "stage": "pickle", "size": 16, "median_s": 2.0}],
+        ... )
+        ['str pickle 16 B: 2.00x']
+    """
+    previous = {
+        (row["api"], row["stage"], row["size"]): row["median_s"]
+        for row in baseline
+        if "stage" in row
+    }
+    lines = []
+    for row in results:
+        key = (row.get("api"), row.get("stage"), row.get("size"))
+        if key in previous:
+            speedup = previous[key] / row["median_s"]
+            lines.append(f"{key[0]} {key[1]} {key[2]} B: {speedup:.2f}x")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="e.g. 16,1K,1M,100M")
+    parser.add_argument("--api", default="str,bytes", help="str, bytes or both")
+    parser.add_argument("--stages", default="", help="only these stage names")
+    parser.add_argument("--key", default=DEFAULT_KEY)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--str-limit", default="1M")
+    parser.add_argument("--no-tcp", action="store_true", help="skip tcp_loopback")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    args = parser.parse_args(argv)
+
+    configure_logging(level=os.environ.get("PAM5_LOG_LEVEL", "INFO"), log_dir="")
+
+    results = run(
+        sizes=[parse_size(size) for size in args.sizes.split(",")],
+        apis=[api.strip() for api in args.api.split(",")],
+        key=args.key,
+        repeat=args.repeat,
+        min_time=args.min_time,
+        str_limit=parse_size(args.str_limit),
+        tcp=not args.no_tcp,
+        stages=[stage for stage in args.stages.split(",") if stage],
+    )
+    report = {"environment": environment(), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info("Results written to {}", args.output)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        for line in compare(results, baseline):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
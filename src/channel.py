@@ -0,0 +1,364 @@
+"""
+Sampled line signal, channel model and slicer for load-testing the decoder.
+
+The four levels of a 4D-PAM5 symbol go out at the same time on four wire
+pairs (lanes). A Transmitter expands symbols into an oversampled waveform
+per lane with a pulse shape; a Channel attenuates it, smears it through an
+ISI filter and adds white Gaussian noise; a Receiver runs the matched
+filter, samples once per symbol and slices every sample to the nearest
+level, giving symbols decoder_4d_pam5 accepts:
+
+    transmitter, channel, receiver = link(noise_std=0.3, isi=(1.0, 0.25))
+    symbols = receiver(channel(transmitter(encoder_4d_pam5_bytes(data))))
+
+All three keep filter state between calls, so a long transmission can be
+pushed through in chunks. The filters run at the symbol rate (polyphase
+in the transmitter and channel, only the sampling instants in the
+receiver); the noise buffer is reused across chunks. measure_ber counts
+bit and symbol errors over random data that way, with the plain mapping
+or trellis coding (trellis=True); run "python -m src.channel" for BER
+against noise.
+"""
+
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.decoder import decoder_4d_pam5_bytes
+from src.encoder import encoder_4d_pam5_bytes
+from src.logger import logger
+from src.tables import BIT2LEVEL
+from src.trellis import SUBSET_POINTS, TrellisDecoder, TrellisEncoder
+
+LANES = 4
+DATA_LEVELS = np.array(sorted(BIT2LEVEL.values()), dtype=np.int8)
+PAM5_LEVELS = np.arange(-2, 3, dtype=np.int8)
+PULSES = ("rect", "rrc")
+
+OVERSAMPLE = 8
+CHUNK_SYMBOLS = 1 << 16
+
+# Popcount de cada byte, para contar bits errados com um XOR
+_BIT_COUNT = np.array([bin(value).count("1") for value in range(256)], np.uint8)
+
+
+def pulse_shape(
+    kind: str = "rrc", oversample: int = OVERSAMPLE, span: int = 6, beta: float = 0.35
+) -> np.ndarray:
+    """
+    Transmit pulse, normalized to unit energy. "rect" holds the level for
+    one symbol period; "rrc" is a root-raised-cosine over span symbols.
+    Example:
+        >>> pulse_shape("rect", oversample=4).tolist()
+        [0.5, 0.5, 0.5, 0.5]
+    """
+    if kind == "rect":
+        taps = np.ones(oversample)
+    elif kind == "rrc":
+        t = np.arange(-span * oversample // 2, span * oversample // 2 + 1) / oversample
+        taps = np.empty(len(t))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            taps[:] = (
+                np.sin(np.pi * t * (1 - beta))
+                + 4 * beta * t * np.cos(np.pi * t * (1 + beta))
+            ) / (np.pi * t * (1 - (4 * beta * t) ** 2))
+        taps[t == 0] = 1 - beta + 4 * beta / np.pi
+        if beta:
+            edge = np.isclose(np.abs(t), 1 / (4 * beta))
+            taps[edge] = (beta / np.sqrt(2)) * (
+                (1 + 2 / np.pi) * np.sin(np.pi / (4 * beta))
+                + (1 - 2 / np.pi) * np.cos(np.pi / (4 * beta))
+            )
+    else:
+        raise ValueError(f"pulse must be one of {PULSES}, got {kind!r}")
+    return (taps / np.sqrt(np.sum(taps**2))).astype(np.float32)
+
+
+class FIRFilter:
+    """
+    FIR filter over the time axis of a (lanes, samples) array that keeps
+    the last len(taps) - 1 inputs, so chunked calls match one long call.
+    Example:
+        >>> fir = FIRFilter([1.0, 1.0], lanes=1)
+        >>> fir(np.array([[1.0, 2.0]])).tolist(), fir(np.array([[3.0]])).tolist()
+        ([[1.0, 3.0]], [[5.0]])
+    """
+
+    def __init__(self, taps: Sequence[float], lanes: int = LANES):
+        self.taps = np.asarray(taps, dtype=np.float32)
+        self._state = np.zeros((lanes, len(self.taps) - 1), dtype=np.float32)
+
+    def __call__(self, signal: np.ndarray) -> np.ndarray:
+        history = self._state.shape[1]
+        extended = np.concatenate((self._state, signal), axis=1)
+        output = np.empty(signal.shape, dtype=np.float32)
+        for lane in range(len(signal)):
+            output[lane] = np.convolve(extended[lane], self.taps, "valid")
+        if history:
+            self._state = extended[:, -history:]
+        return output
+
+
+class Transmitter:
+    """
+    Oversampled (lanes, N * oversample) waveform of (N, 4) symbols.
+
+    Only one sample in oversample carries a symbol impulse, so the pulse
+    filter runs as oversample polyphase filters at the symbol rate.
+    """
+
+    def __init__(self, pulse: str = "rrc", oversample: int = OVERSAMPLE):
+        self.oversample = oversample
+        self.pulse = pulse_shape(pulse, oversample)
+        self._phases = [FIRFilter(self.pulse[p::oversample]) for p in range(oversample)]
+
+    def __call__(self, symbols: np.ndarray) -> np.ndarray:
+        levels = np.asarray(symbols, dtype=np.float32).reshape(-1, LANES).T
+        output = np.empty((LANES, levels.shape[1], self.oversample), np.float32)
+        for phase, fir in enumerate(self._phases):
+            output[:, :, phase] = fir(levels)
+        return output.reshape(LANES, -1)
+
+
+class Channel:
+    """
+    Line between transmitter and receiver: gain attenuation, ISI filter
+    taps at symbol spacing (the first one is the main cursor) and white
+    Gaussian noise of noise_std per sample.
+    """
+
+    def __init__(
+        self,
+        attenuation: float = 1.0,
+        isi: Sequence[float] = (1.0,),
+        noise_std: float = 0.0,
+        oversample: int = OVERSAMPLE,
+        seed: Optional[int] = None,
+    ):
+        self.attenuation = attenuation
+        self.noise_std = noise_std
+        self.isi = np.asarray(isi, dtype=np.float32)
+        self.oversample = oversample
+        # Taps só em múltiplos de oversample: um filtro por fase de amostragem
+        self._phases = [FIRFilter(self.isi * attenuation) for _ in range(oversample)]
+        self._rng = np.random.default_rng(seed)
+        self._noise = np.empty((LANES, 0), dtype=np.float32)
+
+    @property
+    def taps(self) -> np.ndarray:
+        """ISI filter at the sample rate."""
+        taps = np.zeros((len(self.isi) - 1) * self.oversample + 1, dtype=np.float32)
+        taps[:: self.oversample] = self.isi * self.attenuation
+        return taps
+
+    def __call__(self, signal: np.ndarray) -> np.ndarray:
+        phases = signal.reshape(LANES, -1, self.oversample)
+        output = np.empty(phases.shape, dtype=np.float32)
+        for phase, fir in enumerate(self._phases):
+            output[:, :, phase] = fir(phases[:, :, phase])
+        output = output.reshape(signal.shape)
+        if self.noise_std:
+            if self._noise.shape != output.shape:
+                self._noise = np.empty(output.shape, dtype=np.float32)
+            self._rng.standard_normal(out=self._noise, dtype=np.float32)
+            self._noise *= self.noise_std
+            output += self._noise
+        return output
+
+
+def slice_levels(
+    samples: np.ndarray, scale: float = 1.0, levels: np.ndarray = DATA_LEVELS
+) -> np.ndarray:
+    """
+    Nearest level of every sample, after dividing by scale.
+    Example:
+        >>> slice_levels(np.array([2.4, 0.2, -0.9, -3.0])).tolist()
+        [2, 1, -1, -2]
+        >>> slice_levels(np.array([0.2, 1.6]), levels=PAM5_LEVELS).tolist()
+        [0, 2]
+    """
+    levels = np.asarray(levels, dtype=np.int8)
+    thresholds = (levels[1:] + levels[:-1]) * (scale / 2)
+    return levels[np.searchsorted(thresholds, samples)]
+
+
+class Receiver:
+    """
+    Matched filter, one sample per symbol at the peak of the end-to-end
+    response, and slicer. Returns (N, 4) int8 symbols, or with samples()
+    the unsliced values in level units (for trellis.TrellisDecoder). The
+    first delay symbols of the first call come out on later calls, so lag
+    silent symbols must follow the last real one.
+    """
+
+    def __init__(
+        self,
+        transmitter: Transmitter,
+        channel: Channel,
+        levels: np.ndarray = DATA_LEVELS,
+    ):
+        self.oversample = transmitter.oversample
+        self.levels = levels
+        matched = transmitter.pulse[::-1]
+        # Janela invertida: a saída do filtro em m é janela(m) @ reversed
+        self._reversed = np.ascontiguousarray(matched[::-1])
+        self._history = np.zeros((LANES, len(matched) - 1), dtype=np.float32)
+
+        response = np.convolve(
+            np.convolve(transmitter.pulse, channel.taps), matched
+        ).astype(np.float64)
+        # Instante de amostragem: pico da resposta do enlace inteiro
+        self.delay = int(np.argmax(np.abs(response)))
+        self.scale = float(response[self.delay])
+        self._position = 0  # amostras já filtradas
+
+    def __call__(self, signal: np.ndarray) -> np.ndarray:
+        return slice_levels(self.samples(signal), levels=self.levels)
+
+    def samples(self, signal: np.ndarray) -> np.ndarray:
+        """(N, 4) matched filter outputs at the sampling instants, in levels."""
+        extended = np.concatenate((self._history, signal), axis=1)
+        self._history = extended[:, extended.shape[1] - self._history.shape[1] :]
+        start = self._position
+        self._position += signal.shape[1]
+
+        # O filtro casado só é calculado nos instantes de amostragem
+        first = max(self.delay, start)
+        first += (self.delay - first) % self.oversample
+        windows = sliding_window_view(extended, len(self._reversed), axis=1)
+        samples = windows[:, first - start :: self.oversample] @ self._reversed
+        samples *= np.float32(1 / self.scale)
+        return samples.T
+
+    @property
+    def lag(self) -> int:
+        """Symbols of silence that push the last real symbol out."""
+        return self.delay // self.oversample + 1
+
+
+def link(
+    pulse: str = "rrc",
+    oversample: int = OVERSAMPLE,
+    levels: np.ndarray = DATA_LEVELS,
+    **channel_options,
+) -> Tuple[Transmitter, Channel, Receiver]:
+    """Transmitter, Channel(**channel_options) and the Receiver matched to them."""
+    transmitter = Transmitter(pulse, oversample)
+    channel = Channel(oversample=oversample, **channel_options)
+    return transmitter, channel, Receiver(transmitter, channel, levels)
+
+
+def measure_ber(
+    nbytes: int,
+    pulse: str = "rrc",
+    oversample: int = OVERSAMPLE,
+    chunk_symbols: int = CHUNK_SYMBOLS,
+    seed: Optional[int] = 0,
+    trellis: bool = False,
+    **channel_options,
+) -> Dict[str, float]:
+    """
+    Send nbytes of random data (one symbol per byte) through a link in
+    chunks and count bit and symbol errors after decoder_4d_pam5_bytes,
+    or with trellis, after trellis coding and Viterbi decoding.
+    Example:
+        >>> result = measure_ber(1000, noise_std=0.0)
+        >>> result["bit_errors"], result["symbols"]
+        (0, 1000)
+    """
+    transmitter, channel, receiver = link(
+        pulse, oversample, seed=seed, **channel_options
+    )
+    rng = np.random.default_rng(None if seed is None else seed + 1)
+    if trellis:
+        encode, decoder = TrellisEncoder(), TrellisDecoder()
+        levels = SUBSET_POINTS
+    else:
+        encode, decoder = encoder_4d_pam5_bytes, None
+        levels = DATA_LEVELS
+    # Bytes enviados que ainda não voltaram do decodificador
+    pending = np.empty(0, dtype=np.uint8)
+    bit_errors = symbol_errors = received = 0
+
+    def compare(samples: np.ndarray, final: bool = False):
+        nonlocal pending, bit_errors, symbol_errors, received
+        if decoder is None:
+            decoded = decoder_4d_pam5_bytes(slice_levels(samples))
+        else:
+            decoded = decoder(samples)
+            if final:
+                decoded = np.concatenate((decoded, decoder.flush()))
+        sent, pending = pending[: len(decoded)], pending[len(decoded) :]
+        wrong = decoded != sent
+        symbol_errors += int(np.count_nonzero(wrong))
+        bit_errors += int(_BIT_COUNT[decoded[wrong] ^ sent[wrong]].sum(dtype=np.int64))
+        received += len(decoded)
+
+    started = time.perf_counter()
+    sampled = 0
+    for offset in range(0, nbytes, chunk_symbols):
+        size = min(chunk_symbols, nbytes - offset)
+        chunk = np.frombuffer(rng.bytes(size), dtype=np.uint8)
+        pending = np.concatenate((pending, chunk))
+        samples = receiver.samples(channel(transmitter(encode(chunk))))
+        sampled += len(samples)
+        compare(samples)
+    silence = np.zeros((receiver.lag, LANES), dtype=np.int8)
+    samples = receiver.samples(channel(transmitter(silence)))
+    compare(samples[: nbytes - sampled], final=True)
+    seconds = time.perf_counter() - started
+
+    signal_power = float(np.mean(levels.astype(np.float64) ** 2))
+    noise_std = channel.noise_std
+    result = {
+        "symbols": received,
+        "bits": received * 8,
+        "bit_errors": bit_errors,
+        "symbol_errors": symbol_errors,
+        "ber": bit_errors / max(1, received * 8),
+        "ser": symbol_errors / max(1, received),
+        "snr_db": (
+            10 * np.log10(signal_power * receiver.scale**2 / noise_std**2)
+            if noise_std
+            else float("inf")
+        ),
+        "seconds": seconds,
+    }
+    logger.debug(
+        "BER {:.3g} over {} symbols ({:.2f} s)", result["ber"], received, seconds
+    )
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.benchmark import parse_size
+
+    parser = argparse.ArgumentParser(description="BER of the 4D-PAM5 link")
+    parser.add_argument("--symbols", type=parse_size, default=parse_size("1M"))
+    parser.add_argument("--pulse", choices=PULSES, default="rrc")
+    parser.add_argument("--oversample", type=int, default=OVERSAMPLE)
+    parser.add_argument("--isi", default="1.0,0.1", help="taps at symbol spacing")
+    parser.add_argument("--attenuation", type=float, default=0.5)
+    parser.add_argument("--noise", default="0.05,0.1,0.15,0.2,0.25")
+    parser.add_argument("--trellis", action="store_true", help="trellis coding")
+    args = parser.parse_args()
+
+    for noise_std in map(float, args.noise.split(",")):
+        result = measure_ber(
+            args.symbols,
+            pulse=args.pulse,
+            oversample=args.oversample,
+            isi=[float(tap) for tap in args.isi.split(",")],
+            attenuation=args.attenuation,
+            noise_std=noise_std,
+            trellis=args.trellis,
+        )
+        print(
+            f"noise {noise_std:<5} SNR {result['snr_db']:6.2f} dB"
+            f"  BER {result['ber']:.3e}  SER {result['ser']:.3e}"
+            f"  ({result['symbols']} symbols, {result['seconds']:.2f} s)"
+        )
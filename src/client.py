@@ -1,40 +1,193 @@
 import pickle
+import select
 import socket
-
-from src.logger import logger
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.logger import logger, preview
+from src.metrics import STAGE_BYTES, get_metrics
+from src.protocol import (
+    FRAME_ACCEPT,
+    SUPPORTED_PACKINGS,
+    ProtocolError,
+    accepted_codecs,
+    build_hello,
+    frame_buffers,
+    parse_control,
+)
+from src.reliable import ReliableSender
+from src.transport import FrameReader, send_buffers
 
 
 class PAM5Client:
     def __init__(self):
         self.socket = None
         self.connected = False
-
-    def connect(self, host: str = "192.168.15.4", port: int = 5225): #IP de destino
-        """Connect to the PAM5 server."""
+        # Empacotamentos e codecs aceitos pelo servidor; None = pickle legado
+        self.packings = None
+        # Leitor das respostas do servidor (ACCEPT, ACK/NACK, janelas)
+        self.reader = None
+
+    @property
+    def codecs(self) -> Tuple[str, ...]:
+        """Compression codecs the server can decompress, from its ACCEPT."""
+        if self.packings is None:
+            return ()
+        return accepted_codecs(self.packings)
+
+    def connect(
+        self,
+        host: str = "192.168.15.4",  # IP de destino
+        port: int = 5225,
+        wire_format: str = "auto",
+        handshake_timeout: float = 2.0,
+        connect_timeout: Optional[float] = None,
+    ):
+        """
+        Connect to the PAM5 server and negotiate the wire format.
+
+        wire_format is "binary", "pickle" or "auto", which tries the binary
+        format and falls back to pickle if the server does not answer the
+        handshake. connect_timeout bounds the TCP connect itself (None
+        waits for the operating system's timeout). A failed handshake with
+        wire_format="binary" raises ConnectionError.
+        """
+        self.connected = False
+        handshake_error = None
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((host, port))
-            self.connected = True
-            logger.info(f"Connected to server at {host}:{port}")
+            self.socket = socket.create_connection((host, port), connect_timeout)
+            self.socket.settimeout(None)
+            self.packings = None
+            self.reader = None
+            if wire_format != "pickle":
+                try:
+                    self.packings = self._negotiate(handshake_timeout)
+                except (OSError, ProtocolError) as e:
+                    if wire_format == "binary":
+                        handshake_error = e
+                    else:
+                        logger.warning(f"Handshake failed ({e}), using pickle framing")
+                        self.socket.close()
+                        self.socket = socket.create_connection(
+                            (host, port), connect_timeout
+                        )
+                        self.socket.settimeout(None)
+            if handshake_error is None:
+                self.connected = True
+                logger.info(f"Connected to server at {host}:{port}")
         except socket.error as e:
             logger.error(f"Failed to connect to server: {e}")
-            self.connected = False
 
-    def send_data(self, data: str):
+        if not self.connected and self.socket:
+            # Não deixa aberto o socket de uma conexão que falhou
+            self.socket.close()
+            self.socket = None
+        if handshake_error is not None:
+            # Só binário foi pedido: sem fallback, a falha vai para quem chamou
+            raise ConnectionError(
+                f"Handshake failed: {handshake_error}"
+            ) from handshake_error
+
+    def _negotiate(self, timeout: float) -> int:
+        self.socket.settimeout(timeout)
+        try:
+            self.socket.sendall(build_hello())
+            self.reader = FrameReader(self.socket)
+            header, body = self.reader.read_frame()
+            packings = parse_control(header, body, FRAME_ACCEPT)
+        finally:
+            self.socket.settimeout(None)
+        if not packings & SUPPORTED_PACKINGS:
+            raise ProtocolError("Server accepted no symbol packing")
+        logger.debug("Negotiated binary wire format, packings {:#x}", packings)
+        return packings
+
+    def _buffers(self, data: Dict) -> List:
+        if self.packings is None:
+            serialized_data = pickle.dumps(data)
+            return [len(serialized_data).to_bytes(4, byteorder="big"), serialized_data]
+        return frame_buffers(data, self.packings)
+
+    def send_data(self, data: Dict):
         """Send data to the PAM5 server."""
         if not self.connected:
             raise ConnectionError("Client is not connected to the server.")
 
+        metrics = get_metrics()
         try:
-            serialized_data = pickle.dumps(data)
-            data_size = len(serialized_data)
-            self.socket.sendall(data_size.to_bytes(4, byteorder="big"))
+            with metrics.stage("serialize"):
+                buffers = self._buffers(data)
+            with metrics.stage("send"):
+                sent_bytes = send_buffers(self.socket, buffers)
+            metrics.inc(STAGE_BYTES, sent_bytes, stage="send")
+            logger.opt(lazy=True).debug(
+                "Sent data to server: {}", lambda: preview(data)
+            )
+        except socket.error as e:
+            logger.error(f"Failed to send data: {e}")
+            raise e
+
+    def send_many(self, messages: Iterable[Dict]) -> int:
+        """
+        Send a batch of messages with scatter-gather writes: the header, key
+        and payload of every frame go out in as few syscalls as possible.
+        """
+        if not self.connected:
+            raise ConnectionError("Client is not connected to the server.")
+
+        metrics = get_metrics()
+        buffers = []
+        count = 0
+        for data in messages:
+            with metrics.stage("serialize"):
+                buffers.extend(self._buffers(data))
+            count += 1
 
-            self.socket.sendall(serialized_data)
-            logger.info(f"Sent data to server: {data}")
+        try:
+            with metrics.stage("send"):
+                sent_bytes = send_buffers(self.socket, buffers)
+            metrics.inc(STAGE_BYTES, sent_bytes, stage="send")
+            logger.debug("Sent {} messages ({} bytes) to server", count, sent_bytes)
         except socket.error as e:
             logger.error(f"Failed to send data: {e}")
             raise e
+        return count
+
+    def send_stream(self, frames: Iterable[Dict]) -> int:
+        """Send each frame as soon as it is produced, e.g. from encode_stream."""
+        sent = 0
+        for frame in frames:
+            self.send_data(frame)
+            sent += 1
+        logger.debug("Sent stream of {} chunks to server", sent)
+        return sent
+
+    def send_reliable(
+        self,
+        frames: Iterable[Dict],
+        ack_timeout: float = 1.0,
+        max_unacked: int = 64,
+    ) -> int:
+        """
+        Send the frames of one stream with a CRC32 each and resend only the
+        chunks the server reports corrupt or missing, or does not acknowledge
+        within ack_timeout. At most max_unacked chunks are kept for resending;
+        returns once every chunk was acknowledged.
+        """
+        if not self.connected:
+            raise ConnectionError("Client is not connected to the server.")
+        return ReliableSender(self, ack_timeout, max_unacked).send(frames)
+
+    def is_alive(self) -> bool:
+        """Check that the connection can be reused, i.e. the server did not close it."""
+        if not self.connected:
+            return False
+        try:
+            readable, _, _ = select.select([self.socket], [], [], 0)
+            if readable and not self.socket.recv(1, socket.MSG_PEEK):
+                return False
+        except (OSError, ValueError):
+            return False
+        return True
 
     def disconnect(self):
         if self.socket:
@@ -49,8 +202,8 @@ class PAM5Client:
 
 
 if __name__ == "__main__":
-    from src.crypto import encrypt_data
-    from src.encoder import encoder_4d_pam5
+    from src.ascii_utils import text_to_bytes
+    from src.stream import encode_stream
 
     client = PAM5Client()
 
@@ -60,12 +213,7 @@ if __name__ == "__main__":
         message = "Teste de comunicação!"
         key = "chave123"
 
-        encrypted_bin = encrypt_data(message, key)
-        symbols = encoder_4d_pam5(encrypted_bin)
-
-        data = {"symbols": symbols, "key": key, "original_length": len(encrypted_bin)}
-
-        client.send_data(data)
+        client.send_stream(encode_stream(text_to_bytes(message), key))
         print("Dados enviados com sucesso!")
 
     except Exception as e:
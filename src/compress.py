@@ -0,0 +1,189 @@
+"""
+Optional compression stage applied to each chunk before encryption.
+
+Every byte costs one 4D symbol on the line, so text sent through
+compression needs proportionally fewer symbols. Compressing is skipped
+(the chunk goes as-is) when it would not pay off:
+
+    - the chunk is shorter than min_size bytes
+    - a fast zlib probe of its first PROBE_SIZE bytes barely shrinks, as
+      for encrypted, random or already compressed data
+    - the compressed chunk is not below max_ratio of the original
+
+The codec of a compressed chunk travels in the frame flags (see
+src.protocol), so the receiver knows per chunk whether to decompress.
+zlib and lzma are always available; zstd only where the standard
+library provides it (compression.zstd, Python 3.14+).
+
+Run "python -m src.compress" for the symbols sent and the end-to-end
+latency with compression on and off, over loopback and with the time
+the symbols would take on a 125 Msymbol/s line added.
+"""
+
+import lzma
+import zlib
+from typing import Optional, Tuple
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+# Identificadores gravados nos bits de compressão do cabeçalho
+CODEC_IDS = {"zlib": 1, "lzma": 2, "zstd": 3}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+
+MIN_COMPRESS_SIZE = 128
+PROBE_SIZE = 4096
+MAX_RATIO = 0.9
+MAX_DECOMPRESSED_SIZE = 256 * 1024 * 1024
+
+_COMPRESS = {
+    "zlib": zlib.compress,
+    "lzma": lzma.compress,
+}
+_DECOMPRESSOR = {
+    "zlib": zlib.decompressobj,
+    "lzma": lzma.LZMADecompressor,
+}
+if zstd is not None:
+    _COMPRESS["zstd"] = zstd.compress
+    _DECOMPRESSOR["zstd"] = zstd.ZstdDecompressor
+
+
+def available_codecs() -> Tuple[str, ...]:
+    """Codecs this Python can compress and decompress."""
+    return tuple(_COMPRESS)
+
+
+def compress_chunk(
+    data: bytes,
+    codec: str = "zlib",
+    min_size: int = MIN_COMPRESS_SIZE,
+    max_ratio: float = MAX_RATIO,
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress data with codec, or bypass compression when it does not pay.
+
+    Returns (payload, codec), with codec None when data is returned as-is.
+    Example:
+        >>> compress_chunk(b"short")
+        (b'short', None)
+        >>> payload, codec = compress_chunk(b"abc" * 1000)
+        >>> codec, len(payload) < 100
+        ('zlib', True)
+    """
+    if codec not in _COMPRESS:
+        raise ValueError(
+            f"Unsupported compression {codec!r}, available: {available_codecs()}"
+        )
+    if len(data) < min_size:
+        return data, None
+
+    # Amostra rápida antes de gastar CPU com o bloco inteiro
+    if len(data) >= 2 * PROBE_SIZE:
+        probe = zlib.compress(data[:PROBE_SIZE], 1)
+        if len(probe) > max_ratio * PROBE_SIZE:
+            return data, None
+
+    compressed = _COMPRESS[codec](data)
+    if len(compressed) > max_ratio * len(data):
+        return data, None
+    return compressed, codec
+
+
+def decompress_chunk(
+    data: bytes, codec: str, max_size: int = MAX_DECOMPRESSED_SIZE
+) -> bytes:
+    """
+    Inverse of compress_chunk. Raises ValueError for corrupt or truncated
+    data, or data that expands beyond max_size bytes.
+    """
+    if codec not in _DECOMPRESSOR:
+        raise ValueError(f"Unsupported compression {codec!r}")
+    decompressor = _DECOMPRESSOR[codec]()
+    try:
+        plain = decompressor.decompress(data, max_size)
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f"Corrupt {codec} data: {e}") from e
+    except Exception as e:
+        if zstd is not None and isinstance(e, zstd.ZstdError):
+            raise ValueError(f"Corrupt {codec} data: {e}") from e
+        raise
+    if not decompressor.eof:
+        raise ValueError(
+            f"{codec} data is truncated or expands beyond {max_size} bytes"
+        )
+    return plain
+
+
+if __name__ == "__main__":
+    import glob
+    import os
+    import socket
+    import threading
+    import time
+
+    from src.protocol import decode_frame, frame_buffers
+    from src.stream import decode_chunk, encode_stream
+    from src.transport import FrameReader, send_buffers
+
+    def round_trip(payload, compression, sender, receiver):
+        """Codifica, envia e decodifica; devolve (símbolos, segundos)."""
+        reader = FrameReader(receiver)
+        frames = []
+
+        def send():
+            for frame in encode_stream(payload, "chave123", compression=compression):
+                frames.append(len(frame["symbols"]))
+                send_buffers(sender, frame_buffers(frame))
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=send)
+        thread.start()
+        recovered = []
+        while True:
+            message = decode_frame(*reader.read_frame())
+            recovered.append(decode_chunk(message))
+            if message["final"]:
+                break
+        elapsed = time.perf_counter() - start
+        thread.join()
+        assert b"".join(recovered) == payload
+        return sum(frames), elapsed
+
+    def read(path):
+        with open(path, "rb") as file:
+            return file.read()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sources = sorted(glob.glob(os.path.join(root, "src", "*.py")))
+    code = b"".join(read(path) for path in sources)
+    corpora = {
+        "chat message": "Teste de comunicação!".encode("latin-1"),
+        "README": read(os.path.join(root, "README.md")),
+        "source code": code,
+        "random": os.urandom(len(code)),
+    }
+
+    # 1000BASE-T: 125 Msímbolos/s por par; o loopback não tem esse limite
+    line_rate = 125e6
+    sender, receiver = socket.socketpair()
+    print(
+        f"{'corpus':<13} {'bytes':>9} {'codec':>6} {'symbols':>9}"
+        f" {'saved':>6} {'latency ms':>11} {'+line ms':>9}"
+    )
+    for name, payload in corpora.items():
+        baseline = None
+        for codec in (None, *available_codecs()):
+            symbols, seconds = min(
+                round_trip(payload, codec, sender, receiver) for _ in range(3)
+            )
+            baseline = baseline or symbols
+            print(
+                f"{name:<13} {len(payload):>9} {codec or 'off':>6} {symbols:>9}"
+                f" {1 - symbols / baseline:>6.1%} {seconds * 1e3:>11.2f}"
+                f" {(seconds + symbols / line_rate) * 1e3:>9.2f}"
+            )
+    sender.close()
+    receiver.close()
@@ -1,5 +1,16 @@
-from src.ascii_utils import binary_to_text, text_to_binary
-from src.logger import logger
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from src.ascii_utils import (
+    binary_to_bytes,
+    bytes_to_binary,
+    bytes_to_text,
+    text_to_bytes,
+)
+from src.logger import logger, preview
 
 
 def xor_binary(bin_str: str, key: str) -> str:
@@ -9,23 +20,182 @@ def xor_binary(bin_str: str, key: str) -> str:
         >>> xor_binary("1100", "1010")
         '0110'
     """
-    logger.debug(f"Performing XOR on: '{bin_str}' with key: {key}")
+    logger.opt(lazy=True).debug(
+        "Performing XOR on: '{}' with key: {}",
+        lambda: preview(bin_str),
+        lambda: preview(key),
+    )
+
+    if not bin_str:
+        return ""
 
     # Ensure both strings are of equal length
     key_repetitions = len(bin_str) // len(key) + 1
     expanded_key = (key * key_repetitions)[: len(bin_str)]
 
-    result = []
+    xor_value = int(bin_str, 2) ^ int(expanded_key, 2)
 
-    for idx, bit in enumerate(bin_str):
-        result_bit = str(int(bit) ^ int(expanded_key[idx]))
-        result.append(result_bit)
-
-    xor_result = "".join(result)
-    logger.info(f"XOR result: {xor_result}")
+    xor_result = format(xor_value, f"0{len(bin_str)}b")
+    logger.opt(lazy=True).debug("XOR result: {}", lambda: preview(xor_result))
     return xor_result
 
 
+def xor_bytes(data: bytes, key: bytes) -> bytes:
+    """
+    XOR a byte buffer with a key repeated to the buffer's length.
+    Example:
+        >>> xor_bytes(b"\\x0f\\xf0", b"\\xff")
+        b'\\xf0\\x0f'
+    """
+    if not key:
+        raise ValueError("Key must not be empty")
+    size = len(data)
+    if size == 0:
+        return b""
+
+    expanded_key = (bytes(key) * (size // len(key) + 1))[:size]
+    logger.debug("XOR of {} bytes with a {}-byte key", size, len(key))
+    return _xor_expanded(data, expanded_key)
+
+
+def _xor_expanded(data: bytes, expanded_key: bytes) -> bytes:
+    size = len(data)
+    xor_value = int.from_bytes(data, "big") ^ int.from_bytes(expanded_key, "big")
+    return xor_value.to_bytes(size, "big")
+
+
+def _rotate_left(data: bytes, shift: int) -> bytes:
+    bit_count = len(data) * 8
+    value = int.from_bytes(data, "big")
+    mask = (1 << bit_count) - 1
+    rotated = ((value << shift) | (value >> (bit_count - shift))) & mask
+    return rotated.to_bytes(len(data), "big")
+
+
+# Cada chave guarda um bloco de keystream de pelo menos KEYSTREAM_BLOCK bytes
+KEY_CACHE_SIZE = 128
+KEY_CACHE_BYTES = 8 * 1024 * 1024
+KEYSTREAM_BLOCK = 4096
+
+
+class KeySchedule:
+    """
+    Key material prepared once per key: the key bytes, the rotation seed
+    and a block of the key repeated to at least KEYSTREAM_BLOCK bytes.
+    Example:
+        >>> schedule = KeySchedule(b"abc")
+        >>> schedule.keystream(5, offset=1)
+        b'bcabc'
+    """
+
+    __slots__ = ("key", "seed", "block")
+
+    def __init__(self, key: bytes):
+        if not key:
+            raise ValueError("Key must not be empty")
+        self.key = bytes(key)
+        self.seed = len(self.key)
+        # Bloco com uma chave a mais, para qualquer deslocamento caber nele
+        repetitions = -(-KEYSTREAM_BLOCK // len(self.key)) + 1
+        self.block = self.key * repetitions
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.key) + len(self.block)
+
+    def keystream(self, size: int, offset: int = 0) -> bytes:
+        """The key repeated over bytes offset .. offset+size of a message."""
+        start = offset % len(self.key)
+        if start + size <= len(self.block):
+            return self.block[start : start + size]
+        rotated = self.key[start:] + self.key[:start]
+        return (rotated * (size // len(rotated) + 1))[:size]
+
+    def shift(self, size: int) -> int:
+        """Rotation in bits that permute_bytes applies to a size-byte message."""
+        return self.seed % (size * 8) if size else 0
+
+
+class KeyCache:
+    """
+    LRU cache of KeySchedule objects, bounded by entry count and by the
+    bytes they hold, with hit/miss/eviction counters.
+
+    Hits are counted without the lock, so under concurrent use the "hits"
+    of stats() is approximate (it may undercount); misses and evictions
+    are exact.
+    Example:
+        >>> cache = KeyCache(max_entries=1)
+        >>> cache.get("a") is cache.get("a")
+        True
+        >>> _ = cache.get("b")
+        >>> cache.stats()["evictions"]
+        1
+    """
+
+    def __init__(
+        self, max_entries: int = KEY_CACHE_SIZE, max_bytes: int = KEY_CACHE_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries: "OrderedDict[Union[str, bytes], KeySchedule]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Union[str, bytes]) -> KeySchedule:
+        """Schedule of a text or byte key, built on the first use."""
+        if not isinstance(key, (str, bytes)):
+            key = bytes(key)
+        # Acerto sem lock: get e move_to_end são atômicos sob o GIL, e um
+        # lock aqui custaria mais que montar a chave de uma mensagem curta
+        schedule = self._entries.get(key)
+        if schedule is not None:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                pass  # removida por outra thread depois do get
+            self.hits += 1  # aproximado entre threads, ver docstring
+            return schedule
+
+        schedule = KeySchedule(text_to_bytes(key) if isinstance(key, str) else key)
+        if self.max_entries <= 0 or schedule.nbytes > self.max_bytes:
+            with self._lock:
+                self.misses += 1
+            return schedule
+
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = schedule
+                self.nbytes += schedule.nbytes
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return schedule
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+key_cache = KeyCache()
+
+
 def permute_bits(bin_str: str, seed: int) -> str:
     """
     Permute bits of a binary string based on a seed.
@@ -34,9 +204,9 @@ def permute_bits(bin_str: str, seed: int) -> str:
         '0110'
     """
     shift = seed % len(bin_str)
-    logger.debug(f"Shifting bits by {shift} positions")
+    logger.debug("Shifting bits by {} positions", shift)
     permuted = bin_str[shift:] + bin_str[:shift]
-    logger.info(f"Permuted bits: {permuted}")
+    logger.opt(lazy=True).debug("Permuted bits: {}", lambda: preview(permuted))
     return permuted
 
 
@@ -49,21 +219,207 @@ def unpermute_bits(bin_str: str, seed: int) -> str:
     """
     shift = seed % len(bin_str)
     unpermuted = bin_str[-shift:] + bin_str[:-shift]
-    logger.info(f"Unpermuted bits: {unpermuted}")
+    logger.opt(lazy=True).debug("Unpermuted bits: {}", lambda: preview(unpermuted))
     return unpermuted
 
 
-def encrypt_data(message_data: str, key: str) -> str:
+def permute_bytes(data: bytes, seed: int) -> bytes:
     """
-    Encrypt a binary string using XOR and permutation.
+    Rotate the bits of a byte buffer left, like permute_bits on its bits.
+    Example:
+        >>> permute_bytes(b"\\x0f\\x00", 4)
+        b'\\xf0\\x00'
+    """
+    if not len(data):
+        return b""
+    shift = seed % (len(data) * 8)
+    logger.debug("Shifting {} bytes by {} bit positions", len(data), shift)
+    return _rotate_left(data, shift)
+
+
+def unpermute_bytes(data: bytes, seed: int) -> bytes:
+    """
+    Reverse permute_bytes by rotating the bits right.
+    Example:
+        >>> unpermute_bytes(b"\\xf0\\x00", 4)
+        b'\\x0f\\x00'
+    """
+    if not len(data):
+        return b""
+    bit_count = len(data) * 8
+    shift = seed % bit_count
+    return _rotate_left(data, (bit_count - shift) % bit_count)
+
+
+def encrypt_bytes(message_data: bytes, key: bytes) -> bytes:
+    """
+    Encrypt a byte buffer using XOR and permutation.
+    """
+    schedule = key_cache.get(key)
+    size = len(message_data)
+    if size == 0:
+        return b""
+    xored = _xor_expanded(message_data, schedule.keystream(size))
+    return _rotate_left(xored, schedule.shift(size))
+
+
+def decrypt_bytes(encrypted_data: bytes, key: bytes) -> bytes:
+    """
+    Decrypt a byte buffer using reverse permutation and XOR.
+    """
+    schedule = key_cache.get(key)
+    size = len(encrypted_data)
+    if size == 0:
+        return b""
+    bit_count = size * 8
+    unpermuted = _rotate_left(
+        encrypted_data, (bit_count - schedule.shift(size)) % bit_count
+    )
+    return _xor_expanded(unpermuted, schedule.keystream(size))
+
+
+class StreamCipher:
     """
-    logger.debug(f"Encrypting data: {message_data} with key: {key}")
-    binary_data = text_to_binary(message_data)
-    binary_key = text_to_binary(key)
+    Incremental encrypt_bytes/decrypt_bytes for a message of known length
+    fed in chunks, with output bit-identical to the one-shot functions.
+
+    The permutation rotates the whole message left by s = len(key) bits,
+    so output byte j only needs XORed bytes j+q and j+q+1 (mod n), with
+    s = 8q + r. Encryption keeps the first q+1 bytes for the wrap-around
+    and emits everything else as it arrives. Decryption rotates the other
+    way, so its first output bytes need the last bytes of the ciphertext:
+    pass them as tail (decrypt_tail_size bytes, e.g. read ahead from a
+    file). Memory is O(chunk + len(key)).
+    Example:
+        >>> cipher = StreamCipher("chave", 12)
+        >>> encrypted = cipher.update(b"Hello ") + cipher.update(b"World!")
+        >>> encrypted += cipher.finalize()
+        >>> encrypted == encrypt_bytes(b"Hello World!", b"chave")
+        True
+        >>> tail = encrypted[-StreamCipher.decrypt_tail_size("chave", 12) :]
+        >>> cipher = StreamCipher("chave", 12, decrypt=True, tail=tail)
+        >>> cipher.update(encrypted[:7]) + cipher.update(encrypted[7:])
+        b'Hello World!'
+    """
+
+    def __init__(
+        self,
+        key: Union[str, bytes],
+        total_length: int,
+        decrypt: bool = False,
+        tail: Optional[bytes] = None,
+    ):
+        self.schedule = key_cache.get(key)
+        self.key = self.schedule.key
+        self.total_length = total_length
+        self.decrypt = decrypt
+        self.position = 0  # bytes recebidos
+        self.emitted = 0  # bytes devolvidos
+
+        self._shift = 0
+        self._head = bytearray()
+        self._carry = b""
+        if total_length == 0:
+            return
+
+        bit_count = total_length * 8
+        shift = self.schedule.shift(total_length)
+        if decrypt:
+            # Desfazer a rotação = girar para a esquerda pelo complemento
+            shift = (bit_count - shift) % bit_count
+        self._skip, self._shift = divmod(shift, 8)
+
+        if decrypt:
+            expected = total_length - self._skip
+            if tail is None or len(tail) != expected:
+                raise ValueError(f"Decryption needs the last {expected} bytes as tail")
+            # A sequência girada começa pelo fim do texto cifrado
+            self._carry = bytes(tail)
+            self._tail = bytes(tail)
+
+    @staticmethod
+    def decrypt_tail_size(key: Union[str, bytes], total_length: int) -> int:
+        """Bytes from the end of the ciphertext a decrypting cipher needs."""
+        if total_length == 0:
+            return 0
+        key_length = len(text_to_bytes(key) if isinstance(key, str) else key)
+        bit_count = total_length * 8
+        shift = (bit_count - key_length % bit_count) % bit_count
+        return total_length - shift // 8
+
+    def _xor_at(self, data: bytes, offset: int) -> bytes:
+        return _xor_expanded(data, self.schedule.keystream(len(data), offset))
 
-    xor_result = xor_binary(binary_data, binary_key)
+    def _rotate(self, data: bytes) -> bytes:
+        """Combine consecutive bytes of the rotated sequence; keeps the last."""
+        window = np.frombuffer(self._carry + data, dtype=np.uint8)
+        if len(window) < 2:
+            self._carry = window.tobytes()
+            return b""
+        current = window[:-1].astype(np.uint16)
+        if self._shift:
+            current = (current << self._shift) | (window[1:] >> (8 - self._shift))
+        self._carry = window[-1:].tobytes()
+        return current.astype(np.uint8).tobytes()
 
-    permuted_result = permute_bits(xor_result, len(key))
+    def update(self, chunk: bytes) -> bytes:
+        """Feed the next chunk; returns the output bytes that became ready."""
+        chunk = bytes(chunk)
+        start = self.position
+        self.position += len(chunk)
+        if self.position > self.total_length:
+            raise ValueError(
+                f"Got {self.position} bytes for a {self.total_length}-byte message"
+            )
+
+        if self.decrypt:
+            # Só os bytes até a posição q entram; o resto é a cauda já recebida
+            needed = max(0, min(len(chunk), self._skip + 1 - start))
+            extra = chunk[needed:]
+            if (
+                extra
+                and extra != self._tail[start + needed - self._skip :][: len(extra)]
+            ):
+                raise ValueError("Ciphertext does not match the tail given upfront")
+            output = self._rotate(chunk[:needed])
+            output = self._xor_at(output, self.emitted) if output else b""
+            self.emitted += len(output)
+            return output
+
+        xored = self._xor_at(chunk, start)
+        if len(self._head) <= self._skip:
+            self._head += xored[: self._skip + 1 - len(self._head)]
+        output = self._rotate(xored[max(0, self._skip - start) :])
+        self.emitted += len(output)
+        return output
+
+    def finalize(self) -> bytes:
+        """Check that the whole message was fed and return the last bytes."""
+        if self.position != self.total_length:
+            raise ValueError(
+                f"Got {self.position} of {self.total_length} bytes before finalize"
+            )
+        if self.decrypt or self.total_length == 0:
+            return b""
+        # Fecha o ciclo: o fim da rotação usa os primeiros bytes da mensagem
+        output = self._rotate(bytes(self._head))
+        self._carry = b""
+        self.emitted += len(output)
+        return output
+
+
+def encrypt_data(message_data: str, key: str) -> str:
+    """
+    Encrypt a binary string using XOR and permutation.
+    """
+    logger.opt(lazy=True).debug(
+        "Encrypting data: {} with key: {}",
+        lambda: preview(message_data),
+        lambda: preview(key),
+    )
+    encrypted = encrypt_bytes(text_to_bytes(message_data), key)
+    permuted_result = bytes_to_binary(encrypted)
+    logger.opt(lazy=True).debug("Permuted bits: {}", lambda: preview(permuted_result))
     return permuted_result
 
 
@@ -71,14 +427,21 @@ def decrypt_data(encrypted_data: str, key: str) -> str:
     """
     Decrypt a binary string using reverse permutation and XOR.
     """
-    binary_key = text_to_binary(key)
-    logger.debug(f"Decrypting data: {encrypted_data} with key: {binary_key}")
+    logger.opt(lazy=True).debug(
+        "Decrypting data: {} with key: {}",
+        lambda: preview(encrypted_data),
+        lambda: preview(key),
+    )
 
-    unpermuted_result = unpermute_bits(encrypted_data, len(key))
+    if len(encrypted_data) % 8:
+        raise ValueError(
+            f"Encrypted data must be whole 8-bit blocks, got {len(encrypted_data)} bits"
+        )
 
-    decrypted_result = xor_binary(unpermuted_result, binary_key)
+    decrypted = decrypt_bytes(binary_to_bytes(encrypted_data), key)
 
-    text_result = binary_to_text(decrypted_result)
+    text_result = bytes_to_text(decrypted)
+    logger.opt(lazy=True).debug("Reconverted text: {}", lambda: preview(text_result))
 
     return text_result
 
@@ -1,36 +1,68 @@
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
-from src.logger import logger
+import numpy as np
 
-_LEVEL2BIT = {
-    -2: "00",
-    -1: "10",
-    1: "01",
-    2: "11",
-}
+from src.ascii_utils import bytes_to_binary
+from src.logger import logger, preview
+from src.tables import HIGH_NIBBLE, INVALID, LEVEL2BIT, LOW_NIBBLE, TUPLE_TO_BYTE
 
 
-def decoder_4d_pam5(symbols: List[Tuple[int, int, int, int]]) -> str:
-    logger.info(f"Decoding symbols: {symbols}")
+def _raise_invalid_level(symbols: np.ndarray) -> None:
+    valid = np.isin(symbols, list(LEVEL2BIT))
+    row, column = np.argwhere(~valid)[0]
+    symbol = tuple(int(level) for level in symbols[row])
+    level = symbol[column]
+    logger.error(f"Invalid level {level} in symbol {symbol}")
+    raise ValueError(f"Invalid level {level} in symbol {symbol}")
 
-    bits = []
 
-    for index, symbol in enumerate(symbols):
-        logger.debug(f"Processing symbol {index}: {symbol}")
-        for level in symbol:
-            bit_pair = _LEVEL2BIT.get(level)
-            if bit_pair is None:
-                logger.error(f"Invalid level {level} in symbol {symbol}")
-                raise ValueError(f"Invalid level {level} in symbol {symbol}")
-            logger.debug(f"Level {level} corresponds to bit pair {bit_pair}")
-            bits.append(bit_pair)
+def decoder_4d_pam5(symbols: List[Tuple[int, int, int, int]]) -> str:
+    logger.opt(lazy=True).debug("Decoding symbols: {}", lambda: preview(symbols))
 
-    bin_str = "".join(bits)
+    try:
+        # Símbolos em tuplas: um lookup de dicionário por símbolo evita
+        # converter a lista inteira para array
+        decoded = bytes(map(TUPLE_TO_BYTE.__getitem__, symbols))
+    except (KeyError, TypeError):
+        # Arrays, listas de listas ou níveis inválidos (gera o ValueError)
+        decoded = decoder_4d_pam5_bytes(symbols)
+    bin_str = bytes_to_binary(decoded)
 
-    logger.info(f"Decoded binary string: {bin_str}")
+    logger.opt(lazy=True).debug("Decoded binary string: {}", lambda: preview(bin_str))
     return bin_str
 
 
+def decoder_4d_pam5_bytes(
+    symbols: Union[np.ndarray, List[Tuple[int, int, int, int]]],
+) -> np.ndarray:
+    """
+    Decode an (N, 4) array of 4D-PAM5 symbols back into a uint8 byte array.
+
+    Inverse of encoder_4d_pam5_bytes. Raises ValueError on the first
+    level outside tables.LEVEL2BIT, like decoder_4d_pam5.
+    Example:
+        >>> decoder_4d_pam5_bytes([(2, -2, -1, -1)]).tobytes()
+        b'\\xca'
+    """
+    levels = np.asarray(symbols)
+    if levels.size == 0:
+        return np.empty(0, dtype=np.uint8)
+    if levels.ndim != 2 or levels.shape[1] != 4:
+        raise ValueError(f"Expected an (N, 4) symbol array, got shape {levels.shape}")
+    if levels.dtype != np.int8:
+        if levels.min() < -2 or levels.max() > 2:
+            _raise_invalid_level(levels)
+        levels = levels.astype(np.int8)
+
+    logger.debug("Decoding {} 4D-PAM5 symbols", len(levels))
+    halves = np.ascontiguousarray(levels).view(np.uint16)
+    decoded = np.take(HIGH_NIBBLE, halves[:, 0])
+    decoded |= np.take(LOW_NIBBLE, halves[:, 1])
+    if decoded.max() >= INVALID:
+        _raise_invalid_level(levels)
+    return decoded.astype(np.uint8)
+
+
 if __name__ == "__main__":
     from src.ascii_utils import binary_to_text, text_to_binary
     from src.encoder import encoder_4d_pam5
@@ -0,0 +1,228 @@
+"""
+Worker-pool dispatch for message callbacks.
+
+PAM5Server calls message_callback on the thread that reads the socket, so
+a slow callback stops that connection from being read. A Dispatcher moves
+the call to a pool of worker threads fed by bounded queues:
+
+    dispatcher = Dispatcher(workers=4, max_queue=1024, policy="block")
+    server = PAM5Server(dispatcher=dispatcher)
+
+Every key (the server uses the client address) is always served by the
+same worker, so messages of one connection run in the order they
+arrived, while different connections run in parallel. With
+use_processes=True the workers hand each call to a process pool, still one
+at a time per key; the callback and messages must then be picklable.
+
+When a worker's queue is full the policy decides what happens:
+
+    "block"        submit waits, which stops reading the socket (TCP
+                   backpressure reaches the sender)
+    "drop_oldest"  the oldest queued message is discarded
+    "reject"       the new message is discarded
+
+Queue wait time, queue depth and dropped messages are recorded through
+src.metrics.
+"""
+
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Hashable, List, Optional
+
+from src.logger import logger
+from src.metrics import get_metrics
+
+POLICIES = ("block", "drop_oldest", "reject")
+
+DISPATCH_WAIT_SECONDS = "pam5_dispatch_wait_seconds"
+DISPATCH_QUEUE_DEPTH = "pam5_dispatch_queue_depth"
+DISPATCH_DROPPED = "pam5_dispatch_dropped_total"
+
+_STOP = object()
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 1024,
+        policy: str = "block",
+        use_processes: bool = False,
+        name: str = "dispatch",
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, got {policy!r}")
+        if workers < 1 or max_queue < 1:
+            raise ValueError("workers and max_queue must be at least 1")
+
+        self.policy = policy
+        self.name = name
+        self.submitted = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.closed = False
+        # Uma fila por worker: a mesma chave sempre cai na mesma fila, o que
+        # preserva a ordem das mensagens de cada conexão
+        self.queues: List[queue.Queue] = [
+            queue.Queue(maxsize=max_queue) for _ in range(workers)
+        ]
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(workers) if use_processes else None
+        self._threads = [
+            threading.Thread(
+                target=self._worker, args=(q,), name=f"{name}-{i}", daemon=True
+            )
+            for i, q in enumerate(self.queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _queue_for(self, key: Hashable) -> queue.Queue:
+        # Endereços são tuplas; crc32 do repr dá o mesmo worker entre execuções
+        index = zlib.crc32(repr(key).encode()) % len(self.queues)
+        return self.queues[index]
+
+    @property
+    def depth(self) -> int:
+        """Messages waiting in all queues."""
+        return sum(q.qsize() for q in self.queues)
+
+    def submit(
+        self,
+        key: Hashable,
+        function: Callable,
+        *args,
+        done: Optional[Callable[[Optional[Exception]], None]] = None,
+    ) -> bool:
+        """
+        Queue function(*args) behind earlier submissions with the same key.
+        Returns False if the message was rejected.
+
+        done, if given, is called on the worker thread (never in a pool
+        process) once function finished, with the exception it raised or
+        None; it does not need to be picklable.
+        """
+        if self.closed:
+            raise RuntimeError("Dispatcher is closed")
+
+        metrics = get_metrics()
+        target = self._queue_for(key)
+        item = (time.perf_counter(), function, args, done)
+
+        if self.policy == "block":
+            target.put(item)
+        elif self.policy == "reject":
+            try:
+                target.put_nowait(item)
+            except queue.Full:
+                with self._lock:
+                    self.rejected += 1
+                metrics.inc(DISPATCH_DROPPED, dispatcher=self.name, reason="reject")
+                logger.warning("Dispatch queue full, rejected message for {}", key)
+                return False
+        else:
+            while True:
+                try:
+                    target.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        target.get_nowait()
+                        target.task_done()
+                    except queue.Empty:
+                        continue
+                    with self._lock:
+                        self.dropped += 1
+                    metrics.inc(
+                        DISPATCH_DROPPED, dispatcher=self.name, reason="drop_oldest"
+                    )
+
+        with self._lock:
+            self.submitted += 1
+        metrics.set(DISPATCH_QUEUE_DEPTH, self.depth, dispatcher=self.name)
+        return True
+
+    def _worker(self, work_queue: queue.Queue):
+        metrics = get_metrics()
+        while True:
+            item = work_queue.get()
+            try:
+                if item is _STOP:
+                    return
+                queued_at, function, args, done = item
+                metrics.observe(
+                    DISPATCH_WAIT_SECONDS,
+                    time.perf_counter() - queued_at,
+                    dispatcher=self.name,
+                )
+                error = None
+                try:
+                    if self._executor is not None:
+                        self._executor.submit(function, *args).result()
+                    else:
+                        function(*args)
+                except Exception as e:
+                    logger.error(f"Error in dispatched callback: {e}")
+                    error = e
+                if done is not None:
+                    try:
+                        done(error)
+                    except Exception as e:
+                        logger.error(f"Error in dispatch completion callback: {e}")
+            finally:
+                work_queue.task_done()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued message was processed. Returns False if
+        timeout seconds passed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for work_queue in self.queues:
+            with work_queue.all_tasks_done:
+                while work_queue.unfinished_tasks:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                    work_queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, wait: bool = True):
+        """Stop accepting messages; with wait, finish the queued ones first."""
+        if self.closed:
+            return
+        self.closed = True
+        if not wait:
+            for work_queue in self.queues:
+                while True:
+                    try:
+                        work_queue.get_nowait()
+                        work_queue.task_done()
+                    except queue.Empty:
+                        break
+        for work_queue in self.queues:
+            work_queue.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+if __name__ == "__main__":
+
+    def slow_callback(connection, n):
+        time.sleep(0.01)
+        print(f"conexão {connection}: mensagem {n}")
+
+    dispatcher = Dispatcher(workers=2, max_queue=4, policy="drop_oldest")
+    for n in range(10):
+        for connection in ("A", "B"):
+            dispatcher.submit(connection, slow_callback, connection, n)
+    dispatcher.close()
+    print(f"descartadas: {dispatcher.dropped}")
@@ -1,36 +1,51 @@
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
-from src.logger import logger
+import numpy as np
 
-_BIT2LEVEL = {
-    "00": -2,
-    "10": -1,
-    "01": 1,
-    "11": 2,
-}
+from src.ascii_utils import binary_to_bytes
+from src.logger import logger, preview
+from src.tables import BYTE_TO_TUPLE, BYTE_TO_WORD
+
+
+def _as_uint8(data: Union[bytes, bytearray, memoryview, np.ndarray]) -> np.ndarray:
+    if isinstance(data, np.ndarray):
+        if data.dtype != np.uint8:
+            raise TypeError(f"Expected a uint8 array, got {data.dtype}")
+        return data.ravel()
+    return np.frombuffer(data, dtype=np.uint8)
 
 
 def encoder_4d_pam5(bin_str: str) -> List[Tuple[int, int, int, int]]:
     padding = (8 - len(bin_str) % 8) % 8
-    logger.debug(f"Padding needed: {padding} bits")
+    logger.debug("Padding needed: {} bits", padding)
     bin_str_padded = bin_str + "0" * padding
-    logger.info(f"Padded binary string: {bin_str_padded}")
+    logger.opt(lazy=True).debug(
+        "Padded binary string: {}", lambda: preview(bin_str_padded)
+    )
 
-    symbols = []
+    # Cada byte vira a tupla pré-construída do seu símbolo (compartilhada)
+    symbols = list(map(BYTE_TO_TUPLE.__getitem__, binary_to_bytes(bin_str_padded)))
 
-    for i in range(0, len(bin_str_padded), 8):
-        block = bin_str_padded[i : i + 8]
-        logger.debug(f"Processing block: {block}")
-        levels = []
+    logger.opt(lazy=True).debug("Encoded symbols: {}", lambda: preview(symbols))
+    return symbols
 
-        for j in range(0, 8, 2):
-            pair = block[j : j + 2]
-            logger.debug(f"Bit pair: {pair} - Level: {_BIT2LEVEL[pair]}")
-            levels.append(_BIT2LEVEL[pair])
-        symbols.append(tuple(levels))
 
-    logger.info(f"Encoded symbols: {symbols}")
-    return symbols
+def encoder_4d_pam5_bytes(
+    data: Union[bytes, bytearray, memoryview, np.ndarray],
+) -> np.ndarray:
+    """
+    Encode a byte buffer into an (N, 4) int8 array of 4D-PAM5 symbols.
+
+    Each byte is one 8-bit block, so it maps to exactly one symbol through
+    tables.BYTE_TO_WORD. The result matches
+    encoder_4d_pam5 on the same bits.
+    Example:
+        >>> encoder_4d_pam5_bytes(b"\\xca").tolist()
+        [[2, -2, -1, -1]]
+    """
+    buffer = _as_uint8(data)
+    logger.debug("Encoding {} bytes into 4D-PAM5 symbols", buffer.size)
+    return np.take(BYTE_TO_WORD, buffer).view(np.int8).reshape(-1, 4)
 
 
 if __name__ == "__main__":
@@ -38,3 +53,5 @@ if __name__ == "__main__":
     encoded_symbols = encoder_4d_pam5(sample_bin)
     print(f"Original binary: {sample_bin}")
     print(f"Encoded symbols: {encoded_symbols}")
+    vectorized = encoder_4d_pam5_bytes(bytes([0xCA, 0xB2]))
+    print(f"Vectorized:      {vectorized.tolist()}")
@@ -1,14 +1,39 @@
+import base64
+import queue
 import threading
+import time
 import tkinter as tk
-from tkinter import messagebox, scrolledtext, ttk
+from tkinter import messagebox, ttk
 
-from src.ascii_utils import binary_to_text, text_to_binary
+import numpy as np
+
+from src.ascii_utils import (
+    bytes_to_binary,
+    bytes_to_text,
+    text_to_bytes,
+)
 from src.client import PAM5Client
-from src.crypto import decrypt_data, encrypt_data
-from src.decoder import decoder_4d_pam5
-from src.encoder import encoder_4d_pam5
+from src.dispatch import Dispatcher
+from src.gui.log_view import TranscriptView
 from src.server import PAM5Server
-from src.waveform import plot_waveform
+from src.stream import (
+    DEFAULT_CHUNK_SIZE,
+    MessageReceiver,
+    decode_symbols,
+    encode_stream,
+)
+from src.waveform import WaveformExporter
+
+UI_POLL_MS = 16  # ~60 fps
+UI_POLL_BUDGET = 0.008  # segundos por quadro gastos aplicando atualizações
+ETAPAS = 6
+# Compressão antes da criptografia, se o HOST B aceitar o codec; blocos
+# que não encolhem vão sem ela
+COMPRESSAO = "zlib"
+
+
+class Cancelled(Exception):
+    """Raised inside a worker thread when the user cancels the job."""
 
 
 class App(tk.Tk):
@@ -20,8 +45,19 @@ class App(tk.Tk):
         self.client = None
         self.server = None
         self.server_thread = None
+        # Gráficos são renderizados (Agg) numa thread própria e abertos
+        # numa janela quando prontos, sem bloquear envio/recepção
+        self.exporter = WaveformExporter()
+
+        # Threads de trabalho nunca tocam nos widgets: enfileiram funções
+        # que o loop do Tk executa em _poll_ui_queue
+        self.ui_queue = queue.Queue()
+        self.job = None
+        self.cancel_event = threading.Event()
+        self.receiver = MessageReceiver(self.processar_servidor)
 
         self.create_widgets()
+        self.after(UI_POLL_MS, self._poll_ui_queue)
 
     def create_widgets(self):
         # Frame principal
@@ -45,13 +81,30 @@ class App(tk.Tk):
                                      command=self.start_servidor, width=20)
         self.btn_servidor.grid(row=0, column=1, padx=10)
 
+        self.btn_cancelar = ttk.Button(
+            button_frame,
+            text="Cancelar envio",
+            command=self.cancel_job,
+            width=20,
+            state=tk.DISABLED,
+        )
+        self.btn_cancelar.grid(row=0, column=2, padx=10)
+
         # Frame para área de exibição
         display_frame = ttk.Frame(main_frame)
         display_frame.pack(fill=tk.BOTH, expand=True, pady=10)
 
         # Área de exibição com scrollbar
-        self.txt_area = scrolledtext.ScrolledText(display_frame, width=140, height=35, 
-                                                font=("Consolas", 10), wrap=tk.WORD)
+        # Transcrição limitada: linhas antigas saem, valores longos são truncados
+        self.txt_area = TranscriptView(
+            display_frame,
+            max_lines=5000,
+            max_chars=2_000_000,
+            width=140,
+            height=35,
+            font=("Consolas", 10),
+            wrap=tk.WORD,
+        )
         self.txt_area.pack(fill=tk.BOTH, expand=True)
 
         # Status bar
@@ -61,21 +114,92 @@ class App(tk.Tk):
                              relief=tk.SUNKEN, anchor=tk.W)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X, pady=(10, 0))
 
+        # Progresso da ETAPA atual
+        self.progress = ttk.Progressbar(main_frame, mode="determinate")
+        self.progress.pack(side=tk.BOTTOM, fill=tk.X, pady=(10, 0))
+
+    def post(self, function, *args):
+        """Run function(*args) on the Tk thread; safe to call from any thread."""
+        self.ui_queue.put((function, args))
+
+    def log(self, text):
+        self.txt_area.write(text)
+
+    def log_value(self, prefix, value, suffix="\n"):
+        """Log a possibly huge value as a preview that expands on click."""
+        self.txt_area.write_value(prefix, value, suffix)
+
+    def set_status(self, text):
+        self.post(self.status_var.set, text)
+
+    def report_progress(self, step, total, text):
+        self.post(self._show_progress, step, total, text)
+
+    def _show_progress(self, step, total, text):
+        self.progress.configure(maximum=total, value=step)
+        self.status_var.set(text)
+
+    def _poll_ui_queue(self):
+        # Aplica atualizações até esgotar o orçamento do quadro; o resto
+        # fica para o próximo, assim a janela continua respondendo
+        deadline = time.perf_counter() + UI_POLL_BUDGET
+        try:
+            while time.perf_counter() < deadline:
+                function, args = self.ui_queue.get_nowait()
+                function(*args)
+        except queue.Empty:
+            pass
+        # Todo o texto acumulado no quadro entra num único insert
+        self.txt_area.flush()
+        self.after(UI_POLL_MS, self._poll_ui_queue)
+
+    def run_job(self, target, *args):
+        """Run target(*args) on a worker thread; one job at a time."""
+        if self.job and self.job.is_alive():
+            messagebox.showwarning("Aguarde", "Já existe um envio em andamento.")
+            return
+        self.cancel_event.clear()
+        self.btn_cancelar.configure(state=tk.NORMAL)
+
+        def run():
+            try:
+                target(*args)
+            except Cancelled:
+                self.log("✗ Operação cancelada pelo usuário\n\n")
+                self.set_status("Operação cancelada")
+            except Exception as e:
+                self.log(f"✗ Erro inesperado: {e}\n\n")
+                self.set_status("Erro inesperado")
+            finally:
+                self.post(self.btn_cancelar.configure, {"state": tk.DISABLED})
+
+        self.job = threading.Thread(target=run, daemon=True)
+        self.job.start()
+
+    def cancel_job(self):
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise Cancelled()
+
     def start_cliente(self):
         self.clear_area()
-        self.status_var.set("Modo HOST A (Cliente) iniciado")
+        self.set_status("Modo HOST A (Cliente) iniciado")
         self.add_separator("HOST A - PROCESSO DE ENVIO")
-        self.txt_area.insert(tk.END, "HOST A iniciado - Preparando para enviar mensagem...\n\n")
+        self.log("HOST A iniciado - Preparando para enviar mensagem...\n\n")
         self.cliente_window()
 
     def start_servidor(self):
         self.clear_area()
-        self.status_var.set("Modo HOST B (Servidor) iniciado - Aguardando conexão...")
+        self.set_status("Modo HOST B (Servidor) iniciado - Aguardando conexão...")
         self.add_separator("HOST B - PROCESSO DE RECEPÇÃO")
-        self.txt_area.insert(tk.END, "HOST B iniciado - Aguardando mensagem do HOST A...\n\n")
+        self.log("HOST B iniciado - Aguardando mensagem do HOST A...\n\n")
         
         try:
-            self.server = PAM5Server()
+            # Um worker: o processamento (e o gráfico) não trava a leitura
+            # do socket e as mensagens continuam em ordem
+            self.server = PAM5Server(dispatcher=Dispatcher(workers=1))
             self.server_thread = threading.Thread(
                 target=lambda: self.server.start(
                     host="0.0.0.0", port=5225, message_callback=self.server_callback
@@ -83,10 +207,10 @@ class App(tk.Tk):
                 daemon=True,
             )
             self.server_thread.start()
-            self.txt_area.insert(tk.END, "✓ Servidor ativo na porta 5225\n")
-            self.txt_area.insert(tk.END, "✓ Aguardando conexão do HOST A...\n\n")
+            self.log("✓ Servidor ativo na porta 5225\n")
+            self.log("✓ Aguardando conexão do HOST A...\n\n")
         except Exception as e:
-            self.txt_area.insert(tk.END, f"✗ Erro ao iniciar servidor: {e}\n")
+            self.log(f"✗ Erro ao iniciar servidor: {e}\n")
 
     def cliente_window(self):
         win = tk.Toplevel(self)
@@ -120,8 +244,8 @@ class App(tk.Tk):
             if not msg or not key:
                 messagebox.showerror("Erro", "Preencha a mensagem e a chave de criptografia.")
                 return
-            self.processar_cliente(msg, key)
             win.destroy()
+            self.run_job(self.processar_cliente, msg, key)
 
         def cancelar():
             win.destroy()
@@ -133,119 +257,218 @@ class App(tk.Tk):
         win.bind('<Return>', lambda e: enviar())
 
     def processar_cliente(self, msg, key):
-        self.txt_area.insert(tk.END, "ETAPA 1: Digitação do texto\n")
-        self.txt_area.insert(tk.END, f"→ Mensagem original: '{msg}'\n")
-        self.txt_area.insert(tk.END, f"→ Tamanho: {len(msg)} caracteres\n\n")
+        """Host A pipeline; runs on a worker thread (see run_job)."""
+        self.report_progress(1, ETAPAS, "ETAPA 1/6: Digitação do texto")
+        self.log("ETAPA 1: Digitação do texto\n")
+        self.log_value("→ Mensagem original: '", msg, "'\n")
+        self.log(f"→ Tamanho: {len(msg)} caracteres\n\n")
 
         # Transformação em binário (antes da criptografia)
-        self.txt_area.insert(tk.END, "ETAPA 2: Transformação em binário\n")
-        binario_original = text_to_binary(msg)
-        self.txt_area.insert(tk.END, f"→ Binário original: {binario_original}\n")
-        self.txt_area.insert(tk.END, f"→ Tamanho: {len(binario_original)} bits\n\n")
-
-        # Criptografia
-        self.txt_area.insert(tk.END, "ETAPA 3: Aplicação do algoritmo de criptografia\n")
-        self.txt_area.insert(tk.END, f"→ Chave utilizada: '{key}'\n")
-        encrypted_bin = encrypt_data(msg, key)
-        self.txt_area.insert(tk.END, f"→ Mensagem criptografada (binário): {encrypted_bin}\n")
-        self.txt_area.insert(tk.END, f"→ Tamanho após criptografia: {len(encrypted_bin)} bits\n\n")
-
-        # Codificação 4D-PAM5
-        self.txt_area.insert(tk.END, "ETAPA 4: Aplicação do algoritmo de codificação de linha (4D-PAM5)\n")
-        symbols = encoder_4d_pam5(encrypted_bin)
-        self.txt_area.insert(tk.END, f"→ Símbolos 4D-PAM5 gerados: {symbols}\n")
-        self.txt_area.insert(tk.END, f"→ Número de símbolos: {len(symbols)}\n")
-        self.txt_area.insert(tk.END, f"→ Cada símbolo: (nível1, nível2, nível3, nível4)\n")
-        self.txt_area.insert(tk.END, f"→ Níveis possíveis: -2, -1, +1, +2\n\n")
-
-        # Gráfico
-        self.txt_area.insert(tk.END, "ETAPA 5: Apresentação do gráfico da forma de onda\n")
-        self.txt_area.insert(tk.END, "→ Gerando gráfico da forma de onda 4D-PAM5...\n")
-        plot_waveform(symbols, title="HOST A - Sinal 4D-PAM5 (Processo de Montagem)")
-        self.txt_area.insert(tk.END, "✓ Gráfico exibido com sucesso!\n\n")
-
-        # Envio
-        self.txt_area.insert(tk.END, "ETAPA 6: Envio para o HOST B\n")
+        self.check_cancelled()
+        self.report_progress(2, ETAPAS, "ETAPA 2/6: Transformação em binário")
+        self.log("ETAPA 2: Transformação em binário\n")
+        payload = text_to_bytes(msg)
+        total_chunks = max(1, -(-len(payload) // DEFAULT_CHUNK_SIZE))
+        # As etapas 2 a 5 mostram só o primeiro bloco, como ele é enviado
+        binario_original = bytes_to_binary(payload[:DEFAULT_CHUNK_SIZE])
+        self.log_value(
+            f"→ Binário original (bloco 1 de {total_chunks}): ", binario_original
+        )
+        self.log(f"→ Tamanho: {len(payload) * 8} bits\n\n")
+
+        enviados = []
+
+        def mostrar_bloco(frame):
+            # Criptografia
+            self.check_cancelled()
+            self.report_progress(3, ETAPAS, "ETAPA 3/6: Criptografia")
+            self.log("ETAPA 3: Aplicação do algoritmo de criptografia\n")
+            self.log(f"→ Chave utilizada: '{key}'\n")
+            if frame.get("compression"):
+                # O que vai para o fio é o bloco comprimido, não o texto
+                tamanho = min(len(payload), DEFAULT_CHUNK_SIZE)
+                self.log(
+                    f"→ Compressão {frame['compression']}: {tamanho} → "
+                    f"{frame['original_length'] // 8} bytes\n"
+                )
+            encrypted_bin = bytes_to_binary(bytes(decode_symbols(frame)))
+            self.log_value("→ Bloco criptografado (binário): ", encrypted_bin)
+            self.log(f"→ Tamanho após criptografia: {len(encrypted_bin)} bits\n\n")
+
+            # Codificação 4D-PAM5
+            self.check_cancelled()
+            self.report_progress(4, ETAPAS, "ETAPA 4/6: Codificação 4D-PAM5")
+            self.log(
+                "ETAPA 4: Aplicação do algoritmo de codificação de linha (4D-PAM5)\n"
+            )
+            symbols = frame["symbols"]
+            self.log_value("→ Símbolos 4D-PAM5 gerados: ", symbols)
+            self.log(f"→ Número de símbolos: {len(symbols)}\n")
+            self.log("→ Cada símbolo: (nível1, nível2, nível3, nível4)\n")
+            self.log("→ Níveis possíveis: -2, -1, +1, +2\n\n")
+
+            # Gráfico
+            self.check_cancelled()
+            self.report_progress(5, ETAPAS, "ETAPA 5/6: Gráfico da forma de onda")
+            self.log("ETAPA 5: Apresentação do gráfico da forma de onda\n")
+            self.log("→ Gerando gráfico da forma de onda 4D-PAM5...\n")
+            self.show_waveform(symbols, "HOST A - Sinal 4D-PAM5 (Processo de Montagem)")
+            self.log("✓ Gráfico enviado para renderização!\n\n")
+
+            # Envio
+            self.check_cancelled()
+            self.report_progress(5, ETAPAS, "ETAPA 6/6: Envio para o HOST B")
+            self.log("ETAPA 6: Envio para o HOST B\n")
+
+        def frames(compressao):
+            for frame in encode_stream(payload, key, compression=compressao):
+                if frame["seq"] == 0:
+                    mostrar_bloco(frame)
+                self.check_cancelled()
+                enviados.append(len(frame["symbols"]))
+                yield frame
+                self.report_progress(
+                    5 + (frame["seq"] + 1) / total_chunks,
+                    ETAPAS,
+                    f"ETAPA 6/6: Enviado bloco {frame['seq'] + 1} de {total_chunks}",
+                )
+
         try:
-            self.client = PAM5Client()
-            self.client.connect("192.168.15.4", 5225) #IP de destino
-            data = {
-                "symbols": symbols, 
-                "key": key, 
-                "original_length": len(encrypted_bin),
-                "original_message": msg
-            }
-            self.client.send_data(data)
-            self.txt_area.insert(tk.END, "✓ Mensagem enviada ao HOST B com sucesso!\n")
-            self.txt_area.insert(tk.END, "→ Aguardando processamento no HOST B...\n\n")
-            self.client.disconnect()
-            self.status_var.set("Mensagem enviada com sucesso - Aguardando HOST B processar")
+            # Reaproveita a conexão aberta no envio anterior
+            if self.client is None or not self.client.is_alive():
+                self.client = PAM5Client()
+                # IP de destino
+                self.client.connect("192.168.15.4", 5225, connect_timeout=5.0)
+            # Só comprime se o HOST B anunciou o codec no handshake
+            compressao = COMPRESSAO if COMPRESSAO in self.client.codecs else None
+            # Envio em blocos: cada bloco é cifrado, codificado e enviado em sequência
+            chunks = self.client.send_stream(frames(compressao))
+            self.log(f"✓ Mensagem enviada ao HOST B com sucesso! ({chunks} bloco(s))\n")
+            self.log(f"→ Símbolos transmitidos: {sum(enviados)}\n")
+            self.log(f"→ Compressão: {compressao or 'nenhuma'}\n")
+            self.log("→ Aguardando processamento no HOST B...\n\n")
+            self.set_status(
+                "Mensagem enviada com sucesso - Aguardando HOST B processar"
+            )
+        except Cancelled:
+            # Stream incompleto: fecha a conexão para o HOST B descartá-lo
+            if self.client:
+                self.client.disconnect()
+                self.client = None
+            raise
         except Exception as e:
-            self.txt_area.insert(tk.END, f"✗ Erro ao enviar para HOST B: {e}\n")
-            self.txt_area.insert(tk.END, "→ Verifique se o HOST B está ativo\n\n")
-            self.status_var.set("Erro no envio - Verifique conexão")
+            if self.client:
+                self.client.disconnect()
+                self.client = None
+            self.log(f"✗ Erro ao enviar para HOST B: {e}\n")
+            self.log("→ Verifique se o HOST B está ativo\n\n")
+            self.set_status("Erro no envio - Verifique conexão")
 
     def server_callback(self, data):
+        """Host B entry point; runs on the server's dispatch worker thread."""
         try:
-            # Recepção
-            symbols = data["symbols"]
-            key = data["key"]
-            original_length = data.get("original_length", len(symbols) * 8)
-            
-            self.txt_area.insert(tk.END, "="*80 + "\n")
-            self.txt_area.insert(tk.END, "RECEPÇÃO NO HOST B - PROCESSAMENTO INICIADO\n")
-            self.txt_area.insert(tk.END, "="*80 + "\n\n")
-
-            # Etapa 1: Recepção
-            self.txt_area.insert(tk.END, "ETAPA 1: Recepção dos dados\n")
-            self.txt_area.insert(tk.END, f"✓ Símbolos recebidos do HOST A: {symbols}\n")
-            self.txt_area.insert(tk.END, f"→ Número de símbolos: {len(symbols)}\n")
-            self.txt_area.insert(tk.END, f"→ Chave recebida: '{key}'\n\n")
-
-            # Etapa 2: Apresentar gráfico
-            self.txt_area.insert(tk.END, "ETAPA 2: Apresentação do gráfico da forma de onda recebida\n")
-            self.txt_area.insert(tk.END, "→ Gerando gráfico da forma de onda recebida...\n")
-            plot_waveform(symbols, title="HOST B - Sinal 4D-PAM5 (Processo Inverso)")
-            self.txt_area.insert(tk.END, "✓ Gráfico da recepção exibido com sucesso!\n\n")
-
-            # Etapa 3: Decodificação 4D-PAM5
-            self.txt_area.insert(tk.END, "ETAPA 3: Aplicação do algoritmo de codificação de linha (modo inverso)\n")
-            recovered_bin = decoder_4d_pam5(symbols)
-            self.txt_area.insert(tk.END, f"→ Binário decodificado: {recovered_bin[:original_length]}\n")
-            self.txt_area.insert(tk.END, f"→ Tamanho: {len(recovered_bin[:original_length])} bits\n\n")
-
-            # Etapa 4: Descriptografia
-            self.txt_area.insert(tk.END, "ETAPA 4: Aplicação do algoritmo de criptografia (modo inverso)\n")
-            decrypted_msg = decrypt_data(recovered_bin[:original_length], key)
-            self.txt_area.insert(tk.END, f"→ Mensagem descriptografada: '{decrypted_msg}'\n\n")
-
-            # Etapa 5: Transformação para ASCII
-            self.txt_area.insert(tk.END, "ETAPA 5: Transformação de binário para ASCII\n")
-            self.txt_area.insert(tk.END, f"→ Texto final em ASCII: '{decrypted_msg}'\n\n")
-
-            # Etapa 6: Resultado final
-            self.txt_area.insert(tk.END, "ETAPA 6: Mensagem final\n")
-            self.txt_area.insert(tk.END, f"✓ MENSAGEM RECEBIDA COM SUCESSO: '{decrypted_msg}'\n\n")
-            
-            self.add_separator("COMUNICAÇÃO FINALIZADA COM SUCESSO")
-            self.status_var.set("Comunicação HOST A → HOST B finalizada com sucesso")
+            # Blocos são decodificados na chegada e juntados no último
+            self.receiver(data)
+            if not data.get("final", True):
+                self.set_status(f"HOST B - Recebido bloco {data['seq'] + 1}")
+        except Exception as e:
+            self.log(f"✗ Erro no processamento HOST B: {e}\n")
+            self.set_status("Erro no processamento HOST B")
+
+    def processar_servidor(self, message, frames):
+        """Host B pipeline, once per complete message (see MessageReceiver)."""
+        # Recepção
+        symbols = np.concatenate([frame["symbols"] for frame in frames])
+        key = frames[0]["key"]
+
+        self.log("=" * 80 + "\n")
+        self.log("RECEPÇÃO NO HOST B - PROCESSAMENTO INICIADO\n")
+        self.log("=" * 80 + "\n\n")
+
+        # Etapa 1: Recepção
+        self.report_progress(1, ETAPAS, "HOST B - ETAPA 1/6: Recepção")
+        self.log("ETAPA 1: Recepção dos dados\n")
+        self.log_value("✓ Símbolos recebidos do HOST A: ", symbols)
+        self.log(f"→ Número de símbolos: {len(symbols)} ({len(frames)} bloco(s))\n")
+        self.log(f"→ Chave recebida: '{key}'\n\n")
+
+        # Etapa 2: Apresentar gráfico
+        self.report_progress(2, ETAPAS, "HOST B - ETAPA 2/6: Gráfico")
+        self.log("ETAPA 2: Apresentação do gráfico da forma de onda recebida\n")
+        self.log("→ Gerando gráfico da forma de onda recebida...\n")
+        self.show_waveform(symbols, "HOST B - Sinal 4D-PAM5 (Processo Inverso)")
+        self.log("✓ Gráfico da recepção enviado para renderização!\n\n")
+
+        # Etapa 3: Decodificação 4D-PAM5, bloco a bloco
+        self.report_progress(3, ETAPAS, "HOST B - ETAPA 3/6: Decodificação")
+        self.log(
+            "ETAPA 3: Aplicação do algoritmo de codificação de linha (modo inverso)\n"
+        )
+        # decode_symbols também decodifica blocos trellis (Viterbi)
+        recovered_bin = "".join(
+            bytes_to_binary(bytes(decode_symbols(frame))) for frame in frames
+        )
+        self.log_value("→ Binário decodificado: ", recovered_bin)
+        self.log(f"→ Tamanho: {len(recovered_bin)} bits\n\n")
+
+        # Etapa 4: Descriptografia (já feita por decode_chunk na chegada)
+        self.report_progress(4, ETAPAS, "HOST B - ETAPA 4/6: Descriptografia")
+        self.log("ETAPA 4: Aplicação do algoritmo de criptografia (modo inverso)\n")
+        codecs = {frame.get("compression") for frame in frames} - {None}
+        if codecs:
+            self.log(
+                f"→ Descomprimido ({', '.join(sorted(codecs))}): {len(message)} bytes\n"
+            )
+        decrypted_msg = bytes_to_text(message)
+        self.log_value("→ Mensagem descriptografada: '", decrypted_msg, "'\n\n")
 
+        # Etapa 5: Transformação para ASCII
+        self.report_progress(5, ETAPAS, "HOST B - ETAPA 5/6: ASCII")
+        self.log("ETAPA 5: Transformação de binário para ASCII\n")
+        self.log_value("→ Texto final em ASCII: '", decrypted_msg, "'\n\n")
+
+        # Etapa 6: Resultado final
+        self.log("ETAPA 6: Mensagem final\n")
+        self.log_value("✓ MENSAGEM RECEBIDA COM SUCESSO: '", decrypted_msg, "'\n\n")
+
+        self.add_separator("COMUNICAÇÃO FINALIZADA COM SUCESSO")
+        self.report_progress(ETAPAS, ETAPAS, "HOST B - concluído")
+        self.set_status("Comunicação HOST A → HOST B finalizada com sucesso")
+
+    def show_waveform(self, symbols, title):
+        future = self.exporter.submit(symbols, title, dpi=80)
+        future.add_done_callback(
+            lambda f: self.post(self._open_waveform_window, f, title)
+        )
+
+    def _open_waveform_window(self, future, title):
+        try:
+            image = tk.PhotoImage(data=base64.b64encode(future.result()))
         except Exception as e:
-            self.txt_area.insert(tk.END, f"✗ Erro no processamento HOST B: {e}\n")
-            self.status_var.set("Erro no processamento HOST B")
+            self.log(f"✗ Erro ao gerar gráfico: {e}\n")
+            return
+        win = tk.Toplevel(self)
+        win.title(title)
+        label = ttk.Label(win, image=image)
+        label.image = image  # Mantém a referência: o Tk não guarda a imagem
+        label.pack()
 
     def add_separator(self, title=""):
-        self.txt_area.insert(tk.END, "="*80 + "\n")
+        self.log("=" * 80 + "\n")
         if title:
-            self.txt_area.insert(tk.END, f"{title:^80}\n")
-            self.txt_area.insert(tk.END, "="*80 + "\n")
+            self.log(f"{title:^80}\n")
+            self.log("=" * 80 + "\n")
 
     def clear_area(self):
-        self.txt_area.delete("1.0", tk.END)
+        self.txt_area.clear()
 
     def on_closing(self):
+        self.cancel_event.set()
+        if self.client:
+            self.client.disconnect()
         if self.server:
             self.server.stop()
+        self.exporter.close(wait=False)
         self.destroy()
 
 if __name__ == "__main__":
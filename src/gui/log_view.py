@@ -0,0 +1,171 @@
+"""
+Bounded transcript widget for the GUI.
+
+Text written from any thread is buffered and inserted once per frame by
+flush() in a single Text.insert call. The widget keeps at most max_lines
+lines and max_chars characters, dropping the oldest ones first. Long bit
+strings and symbol lists are shown as a short preview with a link that
+expands the full value on demand.
+"""
+
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import scrolledtext
+
+import numpy as np
+
+PREVIEW_CHARS = 160
+_LINK_TAG = "expand"
+
+
+def format_value(value) -> str:
+    """
+    Full text of a value as the transcript shows it.
+    Example:
+        >>> format_value(np.array([[1, -1, 2, -2]], dtype=np.int8))
+        '[(1, -1, 2, -2)]'
+    """
+    if isinstance(value, np.ndarray):
+        value = list(map(tuple, value.tolist()))
+    return value if isinstance(value, str) else str(value)
+
+
+def preview_value(value, limit: int = PREVIEW_CHARS):
+    """
+    First ~limit characters of format_value(value), without formatting the
+    whole value, and whether anything was left out.
+    Example:
+        >>> preview_value("01" * 100, limit=8)
+        ('01010101', True)
+        >>> preview_value([(1, 1, 1, 1)] * 1000, limit=20)
+        ('[(1, 1, 1, 1), (1, 1', True)
+    """
+    if isinstance(value, (list, tuple, np.ndarray)) and len(value) > limit:
+        # Uma lista com milhões de símbolos não é formatada inteira só
+        # para mostrar o começo
+        head = format_value(value[:limit])
+        return head[:limit], True
+    text = format_value(value)
+    return text[:limit], len(text) > limit
+
+
+class TranscriptView(scrolledtext.ScrolledText):
+    def __init__(
+        self,
+        master=None,
+        max_lines: int = 5000,
+        max_chars: int = 2_000_000,
+        preview_chars: int = PREVIEW_CHARS,
+        **options,
+    ):
+        super().__init__(master, **options)
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.preview_chars = preview_chars
+        self._lock = threading.Lock()
+        self._pending = []
+        self._clear = False
+        self._chars = 0
+        self._next_id = 0
+        # Valores completos dos trechos truncados, por tag; saem junto com
+        # as linhas descartadas do início
+        self._values = OrderedDict()
+
+        self.tag_configure(_LINK_TAG, foreground="#2E86C1", underline=True)
+        self.tag_bind(_LINK_TAG, "<Button-1>", self._expand)
+        self.tag_bind(_LINK_TAG, "<Enter>", lambda e: self.config(cursor="hand2"))
+        self.tag_bind(_LINK_TAG, "<Leave>", lambda e: self.config(cursor=""))
+
+    def write(self, text: str):
+        """Queue text for the next flush; safe to call from any thread."""
+        with self._lock:
+            self._pending.append((text, ()))
+
+    def write_value(self, prefix: str, value, suffix: str = "\n"):
+        """
+        Queue prefix + value + suffix, with value truncated to
+        preview_chars and an expand link when it is longer.
+        """
+        preview, truncated = preview_value(value, self.preview_chars)
+        with self._lock:
+            if not truncated:
+                self._pending.append((prefix + preview + suffix, ()))
+                return
+            tag = f"{_LINK_TAG}{self._next_id}"
+            self._next_id += 1
+            self._values[tag] = value
+            self._pending.append((prefix + preview, ()))
+            self._pending.append((" … [+ expandir]", (_LINK_TAG, tag)))
+            self._pending.append((suffix, ()))
+
+    def clear(self):
+        """Drop everything shown and queued; safe to call from any thread."""
+        with self._lock:
+            self._pending.clear()
+            self._clear = True
+
+    def flush(self):
+        """Insert queued text in one call and trim; call on the Tk thread."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            clear, self._clear = self._clear, False
+
+        if clear:
+            self.delete("1.0", tk.END)
+            for tag in self._values:
+                self.tag_delete(tag)
+            self._values.clear()
+            self._chars = 0
+        if not pending:
+            return
+
+        at_bottom = self.yview()[1] >= 0.999
+        arguments = []
+        for text, tags in pending:
+            arguments += [text, tags]
+            self._chars += len(text)
+        self.insert(tk.END, *arguments)
+        self._trim()
+        if at_bottom:
+            self.see(tk.END)
+
+    def _trim(self):
+        last_line = int(self.index("end-1c").split(".")[0])
+        cut = max(1, last_line - self.max_lines + 1)
+        removed = self._count("1.0", f"{cut}.0")
+        # Limite de caracteres: descarta linhas inteiras até caber
+        while self._chars - removed > self.max_chars and cut < last_line:
+            step = max(1, (last_line - cut) // 8)
+            removed += self._count(f"{cut}.0", f"{cut + step}.0")
+            cut += step
+        if cut == 1:
+            return
+
+        self.delete("1.0", f"{cut}.0")
+        self._chars -= removed
+        while self._values:
+            tag = next(iter(self._values))
+            if self.tag_ranges(tag):
+                break
+            del self._values[tag]
+            self.tag_delete(tag)
+
+    def _count(self, start: str, end: str) -> int:
+        counted = self.count(start, end, "chars")
+        return counted[0] if counted else 0
+
+    def _expand(self, event):
+        index = self.index(f"@{event.x},{event.y}")
+        tag = next(
+            (name for name in self.tag_names(index) if name in self._values), None
+        )
+        if tag is None:
+            return
+        start, end = self.tag_ranges(tag)
+        full = format_value(self._values.pop(tag))
+        rest = full[self.preview_chars :]
+        self.tag_delete(tag)
+        self.delete(start, end)
+        self.insert(start, rest)
+        self._chars += len(rest) - len(" … [+ expandir]")
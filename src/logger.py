@@ -1,17 +1,101 @@
+"""
+Logging setup shared by every module.
+
+Sinks are configured from the environment (or by calling
+configure_logging again):
+
+    PAM5_LOG_LEVEL  minimum level for the console and logs/app.log (INFO)
+    PAM5_LOG_DIR    directory for app.log/error.log; empty disables files
+    PAM5_LOG_ENQUEUE  "0" writes from the calling thread instead of a queue
+
+Codec hot paths log payload dumps at DEBUG through
+logger.opt(lazy=True) and preview(), so with the default level they cost
+one level check and never format the payload.
+"""
+
+import os
+import sys
+from typing import Optional
+
 from loguru import logger
 
-logger.add(
-    "logs/app.log",
-    rotation="1 MB",
-    retention="10 days",
-    level="DEBUG",
-    format="{time} {level} {message}",
-)
-
-logger.add(
-    "logs/error.log",
-    rotation="1 MB",
-    retention="10 days",
-    level="ERROR",
-    format="{time} {level} {message}",
-)
+PREVIEW_LIMIT = 64
+_PREVIEW_ITEMS = 8
+
+_handler_ids = []
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_dir: Optional[str] = None,
+    enqueue: Optional[bool] = None,
+    console: bool = True,
+) -> None:
+    """
+    Replace the current sinks. File sinks rotate at 1 MB and, with
+    enqueue, are written from a background thread.
+    """
+    level = level or os.environ.get("PAM5_LOG_LEVEL", "INFO")
+    if log_dir is None:
+        log_dir = os.environ.get("PAM5_LOG_DIR", "logs")
+    if enqueue is None:
+        enqueue = os.environ.get("PAM5_LOG_ENQUEUE", "1") != "0"
+
+    logger.remove()
+    _handler_ids.clear()
+
+    if console:
+        _handler_ids.append(logger.add(sys.stderr, level=level, enqueue=enqueue))
+
+    if log_dir:
+        _handler_ids.append(
+            logger.add(
+                os.path.join(log_dir, "app.log"),
+                rotation="1 MB",
+                retention="10 days",
+                level=level,
+                format="{time} {level} {message}",
+                enqueue=enqueue,
+            )
+        )
+        _handler_ids.append(
+            logger.add(
+                os.path.join(log_dir, "error.log"),
+                rotation="1 MB",
+                retention="10 days",
+                level="ERROR",
+                format="{time} {level} {message}",
+                enqueue=enqueue,
+            )
+        )
+
+
+def preview(value, limit: int = PREVIEW_LIMIT) -> str:
+    """
+    Short description of a possibly huge payload for log messages.
+    Example:
+        >>> preview("01" * 100, limit=8)
+        '01010101... (200 chars)'
+    """
+    if isinstance(value, dict):
+        items = ", ".join(
+            f"{key!r}: {preview(item, limit)}" for key, item in value.items()
+        )
+        return "{" + items + "}"
+    if hasattr(value, "shape") and hasattr(value, "dtype"):
+        return f"array(shape={value.shape}, dtype={value.dtype})"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value[: limit // 2])
+        suffix = f"... ({len(value)} bytes)" if len(value) > len(data) else ""
+        return data.hex() + suffix
+    if isinstance(value, (list, tuple)) and len(value) > _PREVIEW_ITEMS:
+        head = ", ".join(repr(item) for item in value[:_PREVIEW_ITEMS])
+        return f"[{head}, ...] ({len(value)} items)"
+
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
+
+
+configure_logging()
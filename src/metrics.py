@@ -0,0 +1,270 @@
+"""
+Pipeline instrumentation: per-stage timers, byte/symbol counters, gauges.
+
+Code records through get_metrics(), which returns a no-op Metrics object
+until enable_metrics() (or set_metrics() with another implementation) is
+called, so instrumented paths cost one attribute lookup and an empty
+context manager when metrics are off.
+
+The built-in MetricsRegistry renders the Prometheus text format and
+serve_metrics() exposes it over HTTP:
+
+    curl http://127.0.0.1:9464/metrics
+
+Metric names:
+
+    pam5_stage_seconds        histogram, label stage
+    pam5_stage_bytes_total    counter, label stage
+    pam5_stage_symbols_total  counter, label stage
+    pam5_active_connections   gauge, label server
+    pam5_pending_callbacks    gauge, label server
+"""
+
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from src.logger import logger
+
+STAGE_SECONDS = "pam5_stage_seconds"
+STAGE_BYTES = "pam5_stage_bytes_total"
+STAGE_SYMBOLS = "pam5_stage_symbols_total"
+ACTIVE_CONNECTIONS = "pam5_active_connections"
+PENDING_CALLBACKS = "pam5_pending_callbacks"
+
+DEFAULT_BUCKETS = (
+    0.00001,
+    0.0001,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+)
+DEFAULT_METRICS_PORT = 9464
+
+_NULL_CONTEXT = nullcontext()
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    Metrics interface. This base class discards everything; subclasses
+    override inc, set and observe (timer and stage are built on those).
+    """
+
+    enabled = False
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        pass
+
+    def set(self, name: str, value: float, **labels) -> None:
+        pass
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        pass
+
+    def timer(self, name: str, **labels):
+        """Context manager observing the seconds spent in its block."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Timer(self, name, labels)
+
+    def stage(self, stage: str, nbytes: int = 0, symbols: int = 0):
+        """
+        Time a pipeline stage and count the bytes/symbols it processed.
+        Example:
+            >>> with Metrics().stage("encrypt", nbytes=16):
+            ...     pass
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        if nbytes:
+            self.inc(STAGE_BYTES, nbytes, stage=stage)
+        if symbols:
+            self.inc(STAGE_SYMBOLS, symbols, stage=stage)
+        return _Timer(self, STAGE_SECONDS, {"stage": stage})
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics: Metrics, name: str, labels: Dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.observe(self.name, elapsed, **self.labels)
+
+
+class MetricsRegistry(Metrics):
+    """
+    Thread-safe in-memory counters, gauges and histograms.
+    Example:
+        >>> registry = MetricsRegistry()
+        >>> registry.inc("pam5_stage_bytes_total", 16, stage="encrypt")
+        >>> print(registry.render())
+        # TYPE pam5_stage_bytes_total counter
+        pam5_stage_bytes_total{stage="encrypt"} 16
+        <BLANKLINE>
+    """
+
+    enabled = True
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, list]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # [contagem por bucket (+Inf no fim), soma, contagem]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def value(self, name: str, **labels) -> Optional[float]:
+        """Current value of a counter or gauge, or the count of a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            for kind in (self._counters, self._gauges):
+                if key in kind.get(name, {}):
+                    return kind[name][key]
+            histogram = self._histograms.get(name, {}).get(key)
+            return histogram[2] if histogram else None
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for kind, families in (
+                ("counter", self._counters),
+                ("gauge", self._gauges),
+            ):
+                for name, series in sorted(families.items()):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{name}{_format_labels(key)} {_number(value)}")
+
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, (counts, total, count) in sorted(series.items()):
+                    cumulative = 0
+                    bounds = [*map(_number, self.buckets), "+Inf"]
+                    for bound, bucket_count in zip(bounds, counts):
+                        cumulative += bucket_count
+                        labels = _format_labels(key + (("le", bound),))
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(key)
+                    lines.append(f"{name}_sum{labels} {_number(total)}")
+                    lines.append(f"{name}_count{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return text.replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+_metrics: Metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """The process-wide metrics sink (a no-op Metrics unless enabled)."""
+    return _metrics
+
+
+def set_metrics(metrics: Optional[Metrics]) -> Metrics:
+    """Install a metrics implementation; None disables recording."""
+    global _metrics
+    _metrics = metrics if metrics is not None else Metrics()
+    return _metrics
+
+
+def enable_metrics() -> MetricsRegistry:
+    """Install a MetricsRegistry unless one is already recording."""
+    if not isinstance(_metrics, MetricsRegistry):
+        set_metrics(MetricsRegistry())
+    return _metrics
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("Metrics request: {}", format % args)
+
+
+def serve_metrics(
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_METRICS_PORT,
+    registry: Optional[MetricsRegistry] = None,
+) -> ThreadingHTTPServer:
+    """
+    Serve the registry (enabling metrics if needed) on http://host:port/metrics
+    from a daemon thread. Call shutdown() on the returned server to stop it.
+    """
+    registry = registry or enable_metrics()
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    http_server = ThreadingHTTPServer((host, port), handler)
+    http_server.daemon_threads = True
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    logger.info(
+        f"Metrics available at http://{host}:{http_server.server_address[1]}/metrics"
+    )
+    return http_server
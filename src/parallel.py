@@ -0,0 +1,237 @@
+"""
+Multi-core encrypt/encode and decode/decrypt for large payloads.
+
+XOR and the 4D-PAM5 mapping work byte by byte, and permute_bits' global
+rotation only means that output byte j depends on input bytes j + q and
+j + q + 1 (mod n), where the shift is 8q + r bits. Each worker therefore
+computes one contiguous output shard straight from the shared input,
+without a stitching pass. Results are identical to encrypt_bytes +
+encoder_4d_pam5_bytes and decoder_4d_pam5_bytes + decrypt_bytes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from src.crypto import decrypt_bytes, encrypt_bytes
+from src.decoder import decoder_4d_pam5_bytes
+from src.encoder import encoder_4d_pam5_bytes
+from src.logger import logger
+
+DEFAULT_SHARD_SIZE = 4 * 1024 * 1024
+DEFAULT_MIN_PARALLEL_SIZE = 8 * 1024 * 1024
+
+
+def _window(source: np.ndarray, start: int, length: int) -> np.ndarray:
+    """length (<= len(source) + 1) items of source from start, wrapping around."""
+    size = len(source)
+    start %= size
+    if start + length <= size:
+        return source[start : start + length]
+    head = source[start:]
+    return np.concatenate((head, source[: length - len(head)]))
+
+
+def _keystream(key: np.ndarray, start: int, length: int) -> np.ndarray:
+    offset = start % len(key)
+    return np.resize(key, offset + length)[offset:]
+
+
+def _xor_window(data: np.ndarray, key: np.ndarray, start: int, length: int):
+    """data ^ keystream over a window; the keystream follows the wrap too."""
+    size = len(data)
+    start %= size
+    head_length = min(length, size - start)
+    head = data[start : start + head_length] ^ _keystream(key, start, head_length)
+    if head_length == length:
+        return head
+    rest = length - head_length
+    return np.concatenate((head, data[:rest] ^ _keystream(key, 0, rest)))
+
+
+def _rotate_window(window: np.ndarray, bits: int) -> np.ndarray:
+    """Shift a window of len + 1 bytes left by bits (< 8), keeping len bytes."""
+    if not bits:
+        return window[:-1].copy()
+    return (window[:-1] << bits) | (window[1:] >> (8 - bits))
+
+
+def _attach(name: str, shape, dtype):
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _encrypt_encode_shard(
+    data_name, symbols_name, size, key, shift, start, stop
+) -> None:
+    data_memory, data = _attach(data_name, (size,), np.uint8)
+    symbols_memory, symbols = _attach(symbols_name, (size, 4), np.int8)
+    try:
+        key_array = np.frombuffer(key, dtype=np.uint8)
+        byte_shift, bit_shift = divmod(shift, 8)
+        xored = _xor_window(data, key_array, start + byte_shift, stop - start + 1)
+        encrypted = _rotate_window(xored, bit_shift)
+        symbols[start:stop] = encoder_4d_pam5_bytes(encrypted)
+    finally:
+        del data, symbols
+        data_memory.close()
+        symbols_memory.close()
+
+
+def _decode_decrypt_shard(
+    symbols_name, data_name, size, key, shift, start, stop
+) -> None:
+    symbols_memory, symbols = _attach(symbols_name, (size, 4), np.int8)
+    data_memory, data = _attach(data_name, (size,), np.uint8)
+    try:
+        key_array = np.frombuffer(key, dtype=np.uint8)
+        # Rotação à direita por shift = rotação à esquerda por n*8 - shift
+        byte_shift, bit_shift = divmod(size * 8 - shift, 8)
+        encrypted = decoder_4d_pam5_bytes(
+            _window(symbols, start + byte_shift, stop - start + 1)
+        )
+        data[start:stop] = _rotate_window(encrypted, bit_shift) ^ _keystream(
+            key_array, start, stop - start
+        )
+    finally:
+        del data, symbols
+        symbols_memory.close()
+        data_memory.close()
+
+
+class ParallelCodec:
+    """
+    Process pool that splits payloads into shards held in shared memory.
+
+    Payloads smaller than min_parallel_size run in-process, where the pool
+    start-up and shared-memory copies would cost more than they save.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        min_parallel_size: int = DEFAULT_MIN_PARALLEL_SIZE,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.min_parallel_size = min_parallel_size
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _shards(self, size: int):
+        shard_size = max(self.shard_size, -(-size // (self.workers * 4)))
+        return [
+            (start, min(start + shard_size, size))
+            for start in range(0, size, shard_size)
+        ]
+
+    def _run(self, function, input_memory, output_memory, size, key, shift):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        futures = [
+            self.executor.submit(
+                function,
+                input_memory.name,
+                output_memory.name,
+                size,
+                key,
+                shift,
+                start,
+                stop,
+            )
+            for start, stop in self._shards(size)
+        ]
+        for future in futures:
+            future.result()
+
+    def encrypt_encode(self, message: bytes, key: bytes) -> np.ndarray:
+        """Parallel encoder_4d_pam5_bytes(encrypt_bytes(message, key))."""
+        size = len(message)
+        if size < self.min_parallel_size or self.workers == 1:
+            return encoder_4d_pam5_bytes(encrypt_bytes(message, key))
+
+        key = bytes(key)
+        logger.debug("Encrypting {} bytes on {} workers", size, self.workers)
+        data_memory = shared_memory.SharedMemory(create=True, size=size)
+        symbols_memory = shared_memory.SharedMemory(create=True, size=size * 4)
+        try:
+            np.ndarray((size,), np.uint8, buffer=data_memory.buf)[:] = np.frombuffer(
+                message, dtype=np.uint8
+            )
+            self._run(
+                _encrypt_encode_shard,
+                data_memory,
+                symbols_memory,
+                size,
+                key,
+                len(key) % (size * 8),
+            )
+            return np.ndarray((size, 4), np.int8, buffer=symbols_memory.buf).copy()
+        finally:
+            for memory in (data_memory, symbols_memory):
+                memory.close()
+                memory.unlink()
+
+    def decode_decrypt(self, symbols: np.ndarray, key: bytes) -> bytes:
+        """Parallel decrypt_bytes(decoder_4d_pam5_bytes(symbols), key)."""
+        symbols = np.asarray(symbols, dtype=np.int8)
+        size = len(symbols)
+        if size < self.min_parallel_size or self.workers == 1:
+            return decrypt_bytes(decoder_4d_pam5_bytes(symbols), key)
+
+        key = bytes(key)
+        logger.debug("Decrypting {} symbols on {} workers", size, self.workers)
+        symbols_memory = shared_memory.SharedMemory(create=True, size=size * 4)
+        data_memory = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            np.ndarray((size, 4), np.int8, buffer=symbols_memory.buf)[:] = symbols
+            self._run(
+                _decode_decrypt_shard,
+                symbols_memory,
+                data_memory,
+                size,
+                key,
+                len(key) % (size * 8),
+            )
+            return bytes(data_memory.buf[:size])
+        finally:
+            for memory in (symbols_memory, data_memory):
+                memory.close()
+                memory.unlink()
+
+
+if __name__ == "__main__":
+    import time
+
+    payload = os.urandom(64 * 1024 * 1024)
+    key = b"chave123"
+
+    start = time.perf_counter()
+    expected = encoder_4d_pam5_bytes(encrypt_bytes(payload, key))
+    serial = time.perf_counter() - start
+
+    with ParallelCodec() as codec:
+        codec.encrypt_encode(payload[: codec.min_parallel_size], key)  # aquece o pool
+        start = time.perf_counter()
+        symbols = codec.encrypt_encode(payload, key)
+        parallel = time.perf_counter() - start
+        recovered = codec.decode_decrypt(symbols, key)
+
+    print(f"Workers:   {codec.workers}")
+    print(f"Serial:    {serial:.3f} s")
+    print(f"Parallel:  {parallel:.3f} s")
+    print(f"Identical: {np.array_equal(symbols, expected) and recovered == payload}")
@@ -0,0 +1,445 @@
+"""
+Binary wire format for 4D-PAM5 messages.
+
+Every frame starts with a fixed 32-byte header (network byte order):
+
+    magic        2s  b"P5"
+    version      B   protocol version
+    frame_type   B   FRAME_HELLO, FRAME_ACCEPT, FRAME_DATA, FRAME_WINDOW,
+                     FRAME_ACK or FRAME_NACK
+    flags        H   FLAG_* bits
+    key_length   H   bytes of UTF-8 key following the header
+    stream_id    I   stream of the chunk (FLAG_STREAM)
+    seq          I   chunk number inside the stream (FLAG_STREAM)
+    original_len Q   number of meaningful bits
+    symbol_count I   number of 4D symbols in the payload
+    payload_len  I   bytes of packed symbols following the key
+
+Symbols are packed either as one byte per symbol (the 8 bits it encodes,
+only valid for the ±1/±2 levels) or as 3 bits per level, which also
+carries the 0 level used by trellis-coded symbols. FLAG_TRELLIS marks
+those, and the receiver Viterbi-decodes them (see src.stream). A
+connection opens with HELLO/ACCEPT frames that agree on the version and
+the packings both sides understand.
+
+Stream chunks sent with FLAG_WINDOW are flow controlled: the receiver
+answers each one, once consumed, with a WINDOW frame (no body) whose
+stream_id names the stream and whose original_len carries the number of
+plaintext bytes the sender may send again on it (see src.session).
+
+Bits 5-6 of the flags (FLAG_COMPRESSION) hold the codec a chunk was
+compressed with before encryption, 0 for an uncompressed chunk (see
+src.compress). Compression is negotiated like the packings: bits 2-4 of
+the HELLO/ACCEPT byte name the codecs a side can decompress, and a sender
+only compresses with a codec the peer's ACCEPT listed. Peers that predate
+this ignore those bits, so they never receive compressed chunks.
+
+A DATA frame with FLAG_CHECKSUM ends with a 4-byte CRC32 of the header,
+key and payload. Stream chunks sent that way are delivered reliably (see
+src.reliable): the receiver answers a corrupt or missing chunk with a
+NACK frame naming its stream_id and seq, so only that chunk is sent
+again, and acknowledges in-order chunks with ACK frames (seq is the last
+chunk received).
+"""
+
+import struct
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+
+from src.compress import CODEC_IDS, CODEC_NAMES, available_codecs
+from src.decoder import decoder_4d_pam5_bytes
+from src.encoder import encoder_4d_pam5_bytes
+
+MAGIC = b"P5"
+VERSION = 1
+
+FRAME_HELLO = 1
+FRAME_ACCEPT = 2
+FRAME_DATA = 3
+FRAME_WINDOW = 4
+FRAME_ACK = 5
+FRAME_NACK = 6
+
+FLAG_PACK_3BIT = 0x0001
+FLAG_STREAM = 0x0002
+FLAG_FINAL = 0x0004
+FLAG_TRELLIS = 0x0008
+FLAG_WINDOW = 0x0010
+FLAG_COMPRESSION = 0x0060
+COMPRESSION_SHIFT = 5
+FLAG_CHECKSUM = 0x0080
+
+PACKING_BYTE = 0x01
+PACKING_3BIT = 0x02
+SUPPORTED_PACKINGS = PACKING_BYTE | PACKING_3BIT
+# Codecs aceitos ocupam os bits 2-4 do byte do HELLO/ACCEPT
+COMPRESSION_CAPABILITY_SHIFT = 1
+
+HEADER = struct.Struct("!2sBBHHIIQII")
+CHECKSUM_SIZE = 4
+
+
+class ProtocolError(ValueError):
+    """Raised when bytes received from a peer are not a valid frame."""
+
+
+class ChecksumError(ProtocolError):
+    """Raised when a frame's CRC32 does not match; the frame is intact otherwise."""
+
+    def __init__(self, message: str, stream_id: int, seq: int):
+        super().__init__(message)
+        self.stream_id = stream_id
+        self.seq = seq
+
+
+class FrameHeader(NamedTuple):
+    version: int
+    frame_type: int
+    flags: int
+    key_length: int
+    stream_id: int
+    seq: int
+    original_length: int
+    symbol_count: int
+    payload_length: int
+
+    @property
+    def body_length(self) -> int:
+        trailer = CHECKSUM_SIZE if self.flags & FLAG_CHECKSUM else 0
+        return self.key_length + self.payload_length + trailer
+
+
+def pack_header(header: FrameHeader) -> bytes:
+    return HEADER.pack(MAGIC, *header)
+
+
+def parse_header(buffer: bytes) -> FrameHeader:
+    """
+    Parse and validate the fixed header at the start of buffer.
+    """
+    if len(buffer) < HEADER.size:
+        raise ProtocolError(f"Frame header needs {HEADER.size} bytes")
+    magic, *fields = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ProtocolError(f"Bad frame magic {magic!r}")
+    header = FrameHeader(*fields)
+    if header.version < 1 or header.version > VERSION:
+        raise ProtocolError(f"Unsupported protocol version {header.version}")
+    return header
+
+
+def pack_symbols_3bit(symbols: np.ndarray) -> bytes:
+    """
+    Pack levels as 3 bits each (level + 2), two symbols per 3 bytes.
+    """
+    values = np.asarray(symbols, dtype=np.int16) + 2
+    if values.size and (values.min() < 0 or values.max() > 4):
+        raise ValueError("3-bit packing only carries levels -2..2")
+    words = (values[:, 0] << 9) | (values[:, 1] << 6) | (values[:, 2] << 3)
+    words = (words | values[:, 3]).astype(np.uint32)
+    if len(words) % 2:
+        words = np.append(words, np.uint32(0))
+    pairs = (words[0::2] << 12) | words[1::2]
+    return pairs.astype(">u4").view(np.uint8).reshape(-1, 4)[:, 1:].tobytes()
+
+
+def unpack_symbols_3bit(payload: bytes, symbol_count: int) -> np.ndarray:
+    """
+    Inverse of pack_symbols_3bit.
+    """
+    triplets = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3)
+    padded = np.zeros((len(triplets), 4), dtype=np.uint8)
+    padded[:, 1:] = triplets
+    pairs = padded.view(">u4").ravel().astype(np.uint32)
+
+    words = np.empty(len(pairs) * 2, dtype=np.uint32)
+    words[0::2] = pairs >> 12
+    words[1::2] = pairs & 0xFFF
+    words = words[:symbol_count]
+
+    symbols = np.empty((symbol_count, 4), dtype=np.int8)
+    for column, shift in enumerate((9, 6, 3, 0)):
+        symbols[:, column] = ((words >> shift) & 0x7).astype(np.int8) - 2
+    if symbols.size and symbols.max() > 2:
+        raise ProtocolError("3-bit payload holds a level above 2")
+    return symbols
+
+
+def _fits_byte_packing(symbols: np.ndarray) -> bool:
+    return bool(np.all(np.abs(symbols) >= 1) and np.all(np.abs(symbols) <= 2))
+
+
+def frame_buffers(message: Dict, packings: int = SUPPORTED_PACKINGS) -> List:
+    """
+    Serialize a message dict ("symbols", "key", "original_length" and
+    optionally "stream_id"/"seq"/"final", "coding", "flow_control",
+    "compression" and "checksum") into the parts of a DATA frame: header,
+    key, payload and, with "checksum", the CRC32 trailer, ready for a
+    scatter-gather send.
+
+    Byte packing is used when the symbols allow it and the peer accepts it,
+    3-bit packing otherwise.
+    """
+    try:
+        symbols = np.asarray(message["symbols"], dtype=np.int8).reshape(-1, 4)
+        key = message["key"].encode("utf-8")
+    except (KeyError, TypeError, AttributeError) as e:
+        raise TypeError(
+            "Binary frames carry dicts with 'symbols' and 'key' fields"
+        ) from e
+
+    flags = 0
+    if packings & PACKING_BYTE and _fits_byte_packing(symbols):
+        payload = memoryview(decoder_4d_pam5_bytes(symbols))
+    elif packings & PACKING_3BIT:
+        payload = pack_symbols_3bit(symbols)
+        flags |= FLAG_PACK_3BIT
+    else:
+        raise ValueError("Symbols cannot be sent with the negotiated packings")
+
+    if "stream_id" in message:
+        flags |= FLAG_STREAM
+    if message.get("final", True):
+        flags |= FLAG_FINAL
+    if message.get("coding") == "trellis":
+        flags |= FLAG_TRELLIS
+    if message.get("flow_control"):
+        flags |= FLAG_WINDOW
+    if message.get("compression"):
+        try:
+            flags |= CODEC_IDS[message["compression"]] << COMPRESSION_SHIFT
+        except KeyError:
+            raise ValueError(
+                f"Unknown compression {message['compression']!r}"
+            ) from None
+    if message.get("checksum"):
+        flags |= FLAG_CHECKSUM
+
+    header = FrameHeader(
+        version=VERSION,
+        frame_type=FRAME_DATA,
+        flags=flags,
+        key_length=len(key),
+        stream_id=message.get("stream_id", 0),
+        seq=message.get("seq", 0),
+        original_length=message.get("original_length", len(symbols) * 8),
+        symbol_count=len(symbols),
+        payload_length=len(payload),
+    )
+    header_bytes = pack_header(header)
+    if not flags & FLAG_CHECKSUM:
+        return [header_bytes, key, payload]
+    crc = zlib.crc32(payload, zlib.crc32(key, zlib.crc32(header_bytes)))
+    return [header_bytes, key, payload, crc.to_bytes(CHECKSUM_SIZE, "big")]
+
+
+def encode_frame(message: Dict, packings: int = SUPPORTED_PACKINGS) -> bytes:
+    """
+    Serialize a message dict into a single DATA frame buffer.
+    """
+    return b"".join(frame_buffers(message, packings))
+
+
+def decode_frame(header: FrameHeader, body: bytes) -> Dict:
+    """
+    Turn the header and body (key followed by payload) of a DATA frame back
+    into the message dict given to encode_frame.
+
+    Raises ChecksumError, before looking at the body, if the frame carries
+    a CRC32 that does not match.
+    """
+    if header.frame_type != FRAME_DATA:
+        raise ProtocolError(f"Expected a data frame, got type {header.frame_type}")
+    if len(body) != header.body_length:
+        raise ProtocolError(
+            f"Frame body has {len(body)} bytes, expected {header.body_length}"
+        )
+
+    view = memoryview(body)
+    if header.flags & FLAG_CHECKSUM:
+        view, trailer = view[:-CHECKSUM_SIZE], view[-CHECKSUM_SIZE:]
+        crc = zlib.crc32(view, zlib.crc32(pack_header(header)))
+        if crc != int.from_bytes(trailer, "big"):
+            raise ChecksumError(
+                f"CRC32 mismatch in chunk {header.seq} of stream {header.stream_id}",
+                header.stream_id,
+                header.seq,
+            )
+    key = str(view[: header.key_length], "utf-8")
+    payload = view[header.key_length :]
+
+    if header.flags & FLAG_PACK_3BIT:
+        if len(payload) != (header.symbol_count + 1) // 2 * 3:
+            raise ProtocolError("3-bit payload does not match the symbol count")
+        symbols = unpack_symbols_3bit(payload, header.symbol_count)
+    else:
+        if len(payload) != header.symbol_count:
+            raise ProtocolError("Byte payload does not match the symbol count")
+        symbols = encoder_4d_pam5_bytes(payload)
+
+    message = {
+        "symbols": symbols,
+        "key": key,
+        "original_length": header.original_length,
+    }
+    if header.flags & FLAG_STREAM:
+        message["stream_id"] = header.stream_id
+        message["seq"] = header.seq
+        message["final"] = bool(header.flags & FLAG_FINAL)
+    if header.flags & FLAG_TRELLIS:
+        message["coding"] = "trellis"
+    if header.flags & FLAG_WINDOW:
+        message["flow_control"] = True
+    if header.flags & FLAG_COMPRESSION:
+        codec_id = (header.flags & FLAG_COMPRESSION) >> COMPRESSION_SHIFT
+        if codec_id not in CODEC_NAMES:
+            raise ProtocolError(f"Unknown compression codec {codec_id}")
+        message["compression"] = CODEC_NAMES[codec_id]
+    if header.flags & FLAG_CHECKSUM:
+        message["checksum"] = True
+    return message
+
+
+def compression_capabilities(codecs: Iterable[str]) -> int:
+    """
+    HELLO/ACCEPT bits announcing the given compression codecs.
+
+    Example:
+        >>> compression_capabilities(["zlib", "lzma"])
+        12
+    """
+    mask = 0
+    for codec in codecs:
+        mask |= 1 << (CODEC_IDS[codec] + COMPRESSION_CAPABILITY_SHIFT)
+    return mask
+
+
+def accepted_codecs(capabilities: int) -> Tuple[str, ...]:
+    """
+    Compression codecs named by a HELLO/ACCEPT capability byte.
+
+    Example:
+        >>> accepted_codecs(PACKING_BYTE | compression_capabilities(["zlib"]))
+        ('zlib',)
+    """
+    return tuple(
+        name
+        for codec_id, name in sorted(CODEC_NAMES.items())
+        if capabilities >> (codec_id + COMPRESSION_CAPABILITY_SHIFT) & 1
+    )
+
+
+# Tudo que este processo entende: empacotamentos e codecs instalados
+SUPPORTED_CAPABILITIES = SUPPORTED_PACKINGS | compression_capabilities(
+    available_codecs()
+)
+
+
+def _control_frame(frame_type: int, packings: int) -> bytes:
+    header = FrameHeader(VERSION, frame_type, 0, 0, 0, 0, 0, 0, 1)
+    return pack_header(header) + bytes([packings])
+
+
+def build_hello(packings: int = SUPPORTED_CAPABILITIES) -> bytes:
+    """
+    First frame sent by a client: the packings it can read and write and
+    the compression codecs it can decompress.
+    """
+    return _control_frame(FRAME_HELLO, packings)
+
+
+def build_accept(packings: int) -> bytes:
+    """Server reply to HELLO with the packings and codecs both sides share."""
+    return _control_frame(FRAME_ACCEPT, packings)
+
+
+def parse_control(header: FrameHeader, body: bytes, frame_type: int) -> int:
+    """
+    Validate a HELLO or ACCEPT frame and return its capability mask
+    (packings and compression codecs).
+    """
+    if header.frame_type != frame_type or len(body) != 1:
+        raise ProtocolError(f"Expected control frame of type {frame_type}")
+    return body[0]
+
+
+def build_window(stream_id: int, increment: int) -> bytes:
+    """Give the sender of stream_id increment more bytes of window."""
+    return pack_header(
+        FrameHeader(VERSION, FRAME_WINDOW, 0, 0, stream_id, 0, increment, 0, 0)
+    )
+
+
+def parse_window(header: FrameHeader, body: bytes) -> Tuple[int, int]:
+    """
+    Validate a WINDOW frame and return (stream_id, increment).
+    """
+    if header.frame_type != FRAME_WINDOW or len(body):
+        raise ProtocolError("Expected a window update frame")
+    return header.stream_id, header.original_length
+
+
+def build_ack(stream_id: int, seq: int) -> bytes:
+    """Acknowledge every chunk of stream_id up to and including seq."""
+    return pack_header(FrameHeader(VERSION, FRAME_ACK, 0, 0, stream_id, seq, 0, 0, 0))
+
+
+def build_nack(stream_id: int, seq: int) -> bytes:
+    """Ask for chunk seq of stream_id again (corrupt or missing)."""
+    return pack_header(FrameHeader(VERSION, FRAME_NACK, 0, 0, stream_id, seq, 0, 0, 0))
+
+
+def parse_ack(header: FrameHeader, body: bytes) -> Tuple[int, int]:
+    """
+    Validate an ACK or NACK frame and return (stream_id, seq).
+    """
+    if header.frame_type not in (FRAME_ACK, FRAME_NACK) or len(body):
+        raise ProtocolError("Expected an ACK or NACK frame")
+    return header.stream_id, header.seq
+
+
+if __name__ == "__main__":
+    import pickle
+    import time
+
+    from src.stream import encode_stream
+
+    def measure(function, repeat=5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = function()
+        return result, (time.perf_counter() - start) / repeat
+
+    print(
+        f"{'payload':>10} {'format':>8} {'bytes':>12} {'B/sym':>6} "
+        f"{'enc MB/s':>9} {'dec MB/s':>9}"
+    )
+    for size in (16, 1024, 64 * 1024, 1024 * 1024):
+        payload = np.random.default_rng(size).bytes(size)
+        message = next(encode_stream(payload, "chave123", chunk_size=size))
+        del message["stream_id"], message["seq"], message["final"]
+        legacy = dict(message, symbols=list(map(tuple, message["symbols"].tolist())))
+
+        candidates = {
+            "pickle": (
+                lambda: pickle.dumps(legacy),
+                lambda frame: pickle.loads(frame),
+            ),
+            "byte": (
+                lambda: encode_frame(message, PACKING_BYTE),
+                lambda frame: decode_frame(parse_header(frame), frame[HEADER.size :]),
+            ),
+            "3bit": (
+                lambda: encode_frame(message, PACKING_3BIT),
+                lambda frame: decode_frame(parse_header(frame), frame[HEADER.size :]),
+            ),
+        }
+        for name, (encode, decode) in candidates.items():
+            frame, encode_time = measure(encode)
+            _, decode_time = measure(lambda: decode(frame))
+            print(
+                f"{size:>10} {name:>8} {len(frame):>12} {len(frame) / size:>6.2f}"
+                f" {size / encode_time / 1e6:>9.1f} {size / decode_time / 1e6:>9.1f}"
+            )
@@ -0,0 +1,334 @@
+"""
+Reliable delivery of stream chunks: CRC32, ACK/NACK and selective resend.
+
+Frames sent with "checksum" carry a CRC32 of their header, key and
+payload (see src.protocol), so a chunk hit by line errors is caught
+before it is decoded instead of failing the whole message later. The
+receiver keeps chunks in order per stream with a Resequencer:
+
+    - a corrupt chunk, or a gap in the sequence numbers, is answered with
+      a NACK for that chunk alone, and later chunks wait for it
+    - in-order chunks are acknowledged every ACK_EVERY chunks, after a
+      gap was filled and at the end of the stream (cumulative ACK)
+    - duplicates are dropped and acknowledged again
+
+ReliableSender (PAM5Client.send_reliable) keeps every chunk until it is
+acknowledged, resends the ones named by NACKs, and resends the oldest
+one if no ACK arrives within ack_timeout, which also covers lost NACKs
+and a lost final chunk.
+
+LossySocket drops or corrupts outgoing frames, as a local stand-in for a
+noisy line in tests and in "python -m src.reliable".
+"""
+
+import random
+import select
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.logger import logger
+from src.metrics import get_metrics
+from src.protocol import (
+    FRAME_ACK,
+    FRAME_DATA,
+    FRAME_NACK,
+    HEADER,
+    ChecksumError,
+    build_ack,
+    build_nack,
+    parse_ack,
+    parse_header,
+)
+
+ACK_EVERY = 8
+MAX_PENDING = 256
+COMPLETED_STREAMS = 1024
+
+CHECKSUM_ERRORS = "pam5_checksum_errors_total"
+RETRANSMITTED = "pam5_retransmitted_chunks_total"
+
+
+class Resequencer:
+    """
+    Deliver the checksummed chunks of each stream of one connection in
+    order. send(frame) writes an ACK or NACK frame back to the sender.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], None],
+        ack_every: int = ACK_EVERY,
+        max_pending: int = MAX_PENDING,
+    ):
+        self.send = send
+        self.ack_every = ack_every
+        self.max_pending = max_pending
+        self.expected: Dict[int, int] = {}
+        self.pending: Dict[int, Dict[int, Dict]] = {}
+        self.nacked: Dict[int, set] = {}
+        # Último seq de streams já concluídos, para reconhecer duplicatas
+        self.completed = OrderedDict()
+
+    def corrupt(self, error: ChecksumError):
+        """Ask again for a chunk whose checksum did not match."""
+        get_metrics().inc(CHECKSUM_ERRORS)
+        logger.debug("{}, sending NACK", error)
+        self.nacked.setdefault(error.stream_id, set()).add(error.seq)
+        self.send(build_nack(error.stream_id, error.seq))
+
+    def push(self, message: Dict) -> List[Dict]:
+        """
+        Take one chunk and return the chunks that are now in order (none
+        while an earlier chunk is missing).
+        """
+        stream_id, seq = message["stream_id"], message["seq"]
+        if stream_id in self.completed:
+            self.send(build_ack(stream_id, self.completed[stream_id]))
+            return []
+
+        expected = self.expected.get(stream_id, 0)
+        if seq < expected:
+            self.send(build_ack(stream_id, expected - 1))
+            return []
+
+        pending = self.pending.setdefault(stream_id, {})
+        if seq > expected:
+            # Fora de ordem: guarda e pede só os que faltam
+            if len(pending) < self.max_pending:
+                pending[seq] = message
+            nacked = self.nacked.setdefault(stream_id, set())
+            for missing in range(expected, seq):
+                if missing not in pending and missing not in nacked:
+                    nacked.add(missing)
+                    self.send(build_nack(stream_id, missing))
+            return []
+
+        delivered = [message]
+        seq += 1
+        while seq in pending:
+            delivered.append(pending.pop(seq))
+            seq += 1
+
+        if delivered[-1].get("final", True):
+            self._complete(stream_id, seq - 1)
+        else:
+            self.expected[stream_id] = seq
+            nacked = self.nacked.get(stream_id)
+            if nacked:
+                nacked.difference_update(range(expected, seq))
+            if len(delivered) > 1 or seq % self.ack_every == 0:
+                self.send(build_ack(stream_id, seq - 1))
+        return delivered
+
+    def _complete(self, stream_id: int, last_seq: int):
+        self.expected.pop(stream_id, None)
+        self.pending.pop(stream_id, None)
+        self.nacked.pop(stream_id, None)
+        self.completed[stream_id] = last_seq
+        if len(self.completed) > COMPLETED_STREAMS:
+            self.completed.popitem(last=False)
+        self.send(build_ack(stream_id, last_seq))
+
+
+class ReliableSender:
+    """
+    Send the chunks of one stream over a binary-format PAM5Client and
+    resend each one until the server acknowledges it.
+    """
+
+    def __init__(
+        self,
+        client,
+        ack_timeout: float = 1.0,
+        max_unacked: int = 64,
+        max_retries: int = 10,
+    ):
+        if client.packings is None:
+            raise ConnectionError("Reliable streams need the binary wire format")
+        self.client = client
+        self.ack_timeout = ack_timeout
+        self.max_unacked = max_unacked
+        self.max_retries = max_retries
+        self.retransmitted = 0
+        self.stream_id = None
+        self.unacked: Dict[int, Dict] = {}
+        self._retries = 0
+
+    def send(self, frames: Iterable[Dict]) -> int:
+        """Send every frame, e.g. from encode_stream; returns the chunk count."""
+        self.unacked = {}
+        count = 0
+        for frame in frames:
+            frame = dict(frame, checksum=True)
+            self.stream_id = frame["stream_id"]
+            self.unacked[frame["seq"]] = frame
+            self.client.send_data(frame)
+            count += 1
+            while self._poll(0):
+                pass
+            while len(self.unacked) >= self.max_unacked:
+                self._wait_for_ack()
+        while self.unacked:
+            self._wait_for_ack()
+        logger.debug(
+            "Stream {} delivered in {} chunks, {} resent",
+            self.stream_id,
+            count,
+            self.retransmitted,
+        )
+        return count
+
+    def _poll(self, timeout: float) -> bool:
+        """Handle one ACK/NACK from the server if it arrives within timeout."""
+        reader = self.client.reader
+        if not reader.buffered:
+            readable, _, _ = select.select([reader.sock], [], [], timeout)
+            if not readable:
+                return False
+        frame = reader.read_frame()
+        if frame is None:
+            raise ConnectionError("Server closed the connection")
+        header, body = frame
+        if header.frame_type not in (FRAME_ACK, FRAME_NACK):
+            return True
+        stream_id, seq = parse_ack(header, body)
+        if stream_id != self.stream_id:
+            return True
+        if header.frame_type == FRAME_ACK:
+            for acked in [s for s in self.unacked if s <= seq]:
+                del self.unacked[acked]
+        elif seq in self.unacked:
+            self._resend(seq)
+        return True
+
+    def _wait_for_ack(self):
+        oldest = min(self.unacked)
+        deadline = time.monotonic() + self.ack_timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            self._poll(remaining)
+            if oldest not in self.unacked:
+                self._retries = 0
+                return
+
+        # Sem ACK a tempo: o chunk, seu NACK ou o ACK se perdeu
+        self._retries += 1
+        if self._retries > self.max_retries:
+            raise ConnectionError(
+                f"Chunk {oldest} of stream {self.stream_id} not acknowledged "
+                f"after {self.max_retries} retries"
+            )
+        self._resend(oldest)
+
+    def _resend(self, seq: int):
+        self.retransmitted += 1
+        get_metrics().inc(RETRANSMITTED)
+        self.client.send_data(self.unacked[seq])
+
+
+class LossySocket:
+    """
+    Socket stand-in that drops or corrupts outgoing DATA frames.
+
+    Each frame is dropped with probability loss or gets one payload bit
+    flipped with probability corruption; control frames pass untouched.
+    Everything else is forwarded to the wrapped socket, so it can replace
+    PAM5Client.socket after connect.
+    """
+
+    def __init__(
+        self,
+        sock,
+        loss: float = 0.0,
+        corruption: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.sock = sock
+        self.loss = loss
+        self.corruption = corruption
+        self.random = random.Random(seed)
+        self.dropped = 0
+        self.corrupted = 0
+        self._pending = bytearray()
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def sendmsg(self, buffers) -> int:
+        data = b"".join(buffers)
+        self._forward(data)
+        return len(data)
+
+    def sendall(self, data):
+        self._forward(data)
+
+    def _forward(self, data: bytes):
+        self._pending += data
+        out = bytearray()
+        while len(self._pending) >= HEADER.size:
+            header = parse_header(self._pending)
+            size = HEADER.size + header.body_length
+            if len(self._pending) < size:
+                break
+            frame = self._pending[:size]
+            del self._pending[:size]
+            if header.frame_type == FRAME_DATA and header.payload_length:
+                roll = self.random.random()
+                if roll < self.loss:
+                    self.dropped += 1
+                    continue
+                if roll < self.loss + self.corruption:
+                    start = HEADER.size + header.key_length
+                    index = self.random.randrange(start, start + header.payload_length)
+                    frame[index] ^= 1 << self.random.randrange(8)
+                    self.corrupted += 1
+            out += frame
+        if out:
+            self.sock.sendall(out)
+
+
+if __name__ == "__main__":
+    import os
+    import threading
+
+    from src.client import PAM5Client
+    from src.server import PAM5Server
+    from src.stream import StreamReceiver, encode_stream
+
+    payload = os.urandom(4 * 1024 * 1024)
+    received = []
+    done = threading.Event()
+
+    def on_chunk(stream_id, plaintext, final):
+        received.append(plaintext)
+        if final:
+            done.set()
+
+    server = PAM5Server()
+    threading.Thread(
+        target=lambda: server.start(
+            "127.0.0.1", 5227, message_callback=StreamReceiver(on_chunk)
+        ),
+        daemon=True,
+    ).start()
+    time.sleep(0.5)
+
+    client = PAM5Client()
+    client.connect("127.0.0.1", 5227, wire_format="binary")
+    lossy = client.socket = LossySocket(
+        client.socket, loss=0.02, corruption=0.02, seed=1
+    )
+    start = time.perf_counter()
+    sender = ReliableSender(client, ack_timeout=0.2)
+    chunks = sender.send(encode_stream(payload, "chave123", chunk_size=16 * 1024))
+    done.wait(10)
+    elapsed = time.perf_counter() - start
+    client.disconnect()
+    server.stop()
+
+    print(f"Chunks:      {chunks}")
+    print(f"Dropped:     {lossy.dropped}")
+    print(f"Corrupted:   {lossy.corrupted}")
+    print(f"Resent:      {sender.retransmitted}")
+    print(f"Recovered:   {b''.join(received) == payload}")
+    print(f"Elapsed:     {elapsed:.2f} s")
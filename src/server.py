@@ -1,25 +1,79 @@
+import functools
 import pickle
 import socket
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Optional
 
-from src.logger import logger
+from src.dispatch import Dispatcher
+from src.logger import logger, preview
+from src.metrics import (
+    ACTIVE_CONNECTIONS,
+    STAGE_BYTES,
+    STAGE_SECONDS,
+    get_metrics,
+    serve_metrics,
+)
+from src.protocol import (
+    FRAME_HELLO,
+    HEADER,
+    MAGIC,
+    SUPPORTED_CAPABILITIES,
+    SUPPORTED_PACKINGS,
+    ChecksumError,
+    ProtocolError,
+    build_accept,
+    build_nack,
+    build_window,
+    decode_frame,
+    frame_buffers,
+    parse_control,
+)
+from src.reliable import Resequencer
+from src.transport import FrameReader, send_buffers
 
 
 class PAM5Server:
-    def __init__(self):
+    def __init__(
+        self,
+        allow_pickle: bool = False,
+        metrics_port: Optional[int] = None,
+        dispatcher: Dispatcher = None,
+        metrics_host: str = "127.0.0.1",
+    ):
         self.socket = None
         self.running = False
         self.clients = []
+        # Framing pickle legado só é aceito se habilitado: pickle.loads
+        # executa código arbitrário vindo da rede
+        self.allow_pickle = allow_pickle
+        self.client_packings = {}
+        # Workers do dispatcher (atualizações de janela) e broadcast escrevem
+        # no mesmo socket: um lock por cliente mantém os frames inteiros
+        self.send_locks = {}
+        # Porta do endpoint Prometheus (/metrics); None = sem endpoint
+        self.metrics_port = metrics_port
+        # O endpoint fica só local, mesmo com o servidor em 0.0.0.0
+        self.metrics_host = metrics_host
+        self.metrics_server = None
+        # Com dispatcher o callback roda num pool de workers, fora da thread
+        # que lê o socket; o servidor passa a ser o dono e o fecha em stop()
+        self.dispatcher = dispatcher
 
-    def start(self, host="0.0.0.0", port=5225, message_callback=None):
+    def start(self, host="0.0.0.0", port=5225, message_callback=None, backlog=128):
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.socket.bind((host, port))
-            self.socket.listen(5)
+            self.socket.listen(backlog)
             self.running = True
 
             logger.info(f"Server running on {host}:{port}")
+            if self.metrics_port is not None and self.metrics_server is None:
+                self.metrics_server = serve_metrics(
+                    self.metrics_host, self.metrics_port
+                )
 
             while self.running:
                 try:
@@ -42,51 +96,174 @@ class PAM5Server:
             logger.error(f"Failed to start server: {e}")
             raise e
 
-    def handle_client(self, client_socket, client_address, message_callback):
-        try:
-            self.clients.append(client_socket)
+    def iter_messages(self, client_socket):
+        """Yield each message received on client_socket as it arrives."""
+        reader = FrameReader(client_socket)
+        prefix = reader.read_exactly(len(MAGIC), allow_eof=True)
+        if prefix is None:
+            return
+        prefix = bytes(prefix)
 
-            while self.running:
-                try:
-                    size_data = client_socket.recv(4)
-                    if not size_data:
-                        break
+        if prefix == MAGIC:
+            yield from self._iter_binary_messages(client_socket, reader, prefix)
+        elif self.allow_pickle:
+            yield from self._iter_pickle_messages(client_socket, reader, prefix)
+        else:
+            logger.warning("Rejected client using legacy pickle framing")
 
-                    data_size = int.from_bytes(size_data, byteorder="big")
+    def _iter_binary_messages(self, client_socket, reader, prefix):
+        header, body = reader.read_frame(prefix)
+        packings = parse_control(header, body, FRAME_HELLO) & SUPPORTED_CAPABILITIES
+        if not packings & SUPPORTED_PACKINGS:
+            raise ProtocolError("Client offered no supported symbol packing")
+        client_socket.sendall(build_accept(packings))
+        self.client_packings[client_socket] = packings
 
-                    received_data = b""
-                    while len(received_data) < data_size:
-                        chunk = client_socket.recv(
-                            min(data_size - len(received_data), 4096)
-                        )
-                        if not chunk:
-                            break
-                        received_data += chunk
+        # Chunks com CRC32 são entregues em ordem; os corrompidos ou
+        # perdidos são pedidos de novo com NACK
+        resequencer = Resequencer(
+            lambda frame: self._send_control(client_socket, frame)
+        )
+        metrics = get_metrics()
+        while self.running:
+            prefix = reader.read_exactly(len(MAGIC), allow_eof=True)
+            if prefix is None:
+                return
+            # O tempo de recv conta a partir do primeiro byte do frame, não
+            # inclui a espera por uma nova mensagem
+            with metrics.stage("recv"):
+                header, body = reader.read_frame(bytes(prefix))
+            metrics.inc(STAGE_BYTES, HEADER.size + len(body), stage="recv")
+            # O corpo é decodificado direto do buffer de recepção
+            try:
+                with metrics.stage("deserialize", symbols=header.symbol_count):
+                    message = decode_frame(header, body)
+            except ChecksumError as e:
+                resequencer.corrupt(e)
+                continue
+            if message.get("checksum") and "stream_id" in message:
+                yield from resequencer.push(message)
+            else:
+                yield message
 
-                    # Deserializar os dados
-                    data = pickle.loads(received_data)
+    def _iter_pickle_messages(self, client_socket, reader, prefix):
+        self.client_packings[client_socket] = None
+        metrics = get_metrics()
+        while self.running:
+            received_data = reader.read_sized(prefix)
+            if received_data is None:
+                return
+            prefix = b""
 
-                    logger.info(f"Received data from {client_address}: {data}")
+            # Deserializar os dados
+            with metrics.stage("deserialize", nbytes=len(received_data)):
+                message = pickle.loads(received_data)
+            yield message
 
-                    # Chamar callback se fornecido
-                    if message_callback:
-                        message_callback(data)
+    def handle_client(self, client_socket, client_address, message_callback):
+        try:
+            self.clients.append(client_socket)
+            self.send_locks[client_socket] = threading.Lock()
+            metrics = get_metrics()
+            metrics.set(ACTIVE_CONNECTIONS, len(self.clients), server="thread")
 
-                except socket.error as e:
-                    logger.error(
-                        f"Socket error while handling client {client_address}: {e}"
+            try:
+                for data in self.iter_messages(client_socket):
+                    logger.opt(lazy=True).debug(
+                        "Received data from {}: {}",
+                        lambda: client_address,
+                        lambda: preview(data),
                     )
-                    break
+
+                    # Chamar callback se fornecido
+                    flow_control = data.get("flow_control", False)
+                    if message_callback and self.dispatcher:
+                        # Streams com controle de fluxo têm fila própria, para
+                        # que um stream lento não atrase os outros da conexão
+                        key = client_address
+                        if flow_control:
+                            key = (client_address, data["stream_id"])
+                        # Só callback e mensagem vão ao pool (use_processes
+                        # exige objetos picláveis); a resposta sai daqui
+                        done = functools.partial(self._reply, client_socket, data)
+                        if not self.dispatcher.submit(
+                            key, message_callback, data, done=done
+                        ):
+                            self._reply(client_socket, data, rejected=True)
+                    elif message_callback:
+                        error = None
+                        with metrics.timer(STAGE_SECONDS, stage="callback"):
+                            try:
+                                message_callback(data)
+                            except Exception as e:
+                                # Um callback com erro não derruba a conexão
+                                # nem os outros streams dela
+                                logger.error(f"Error in message callback: {e}")
+                                error = e
+                        self._reply(client_socket, data, error)
+                    elif flow_control:
+                        self._reply(client_socket, data)
+
+            except socket.error as e:
+                logger.error(
+                    f"Socket error while handling client {client_address}: {e}"
+                )
 
         except Exception as e:
             logger.error(f"Error handling client {client_address}: {e}")
         finally:
+            self.client_packings.pop(client_socket, None)
+            self.send_locks.pop(client_socket, None)
+            if client_socket in self.clients:
+                self.clients.remove(client_socket)
+            get_metrics().set(ACTIVE_CONNECTIONS, len(self.clients), server="thread")
             client_socket.close()
             logger.info(f"Client {client_address} disconnected.")
 
+    def _reply(self, client_socket, data, error=None, rejected=False):
+        """
+        Answer a flow-controlled chunk once its callback finished: return
+        its window, or NACK it if it was rejected or the callback failed,
+        so the sender ends the stream.
+        """
+        if not data.get("flow_control"):
+            return
+        if error is not None or rejected:
+            self._send_control(
+                client_socket, build_nack(data["stream_id"], data["seq"])
+            )
+            return
+        increment = data.get("original_length", 0) // 8
+        if increment:
+            self._send_control(
+                client_socket, build_window(data["stream_id"], increment)
+            )
+
+    def _send_control(self, client_socket, frame):
+        lock = self.send_locks.get(client_socket)
+        if lock is None:
+            return
+        try:
+            with lock:
+                client_socket.sendall(frame)
+        except OSError as e:
+            logger.debug("Could not send control frame: {}", e)
+
     def stop(self):
+        """
+        Stop listening, close every client and close the dispatcher, whose
+        queued messages are discarded.
+        """
         self.running = False
 
+        if self.dispatcher:
+            self.dispatcher.close(wait=False)
+
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+
         for client in self.clients[:]:
             try:
                 client.close()
@@ -104,18 +281,43 @@ class PAM5Server:
             finally:
                 self.socket = None
 
-    def broadcast_message(self, data):
-        disconnected_clients = []
+    def _serialize(self, packings, data):
+        if packings:
+            return frame_buffers(data, packings)
+        serialized_data = pickle.dumps(data)
+        return [len(serialized_data).to_bytes(4, byteorder="big"), serialized_data]
+
+    def broadcast_message(self, data, parallel=False, max_workers=None):
+        """
+        Send data to every client. The message is serialized once per wire
+        format and the same buffers are written to each socket, optionally
+        from a thread pool so a slow client does not delay the others.
+        """
+        serialized = {}
+        targets = []
+        for client in list(self.clients):
+            packings = self.client_packings.get(client)
+            if packings not in serialized:
+                serialized[packings] = self._serialize(packings, data)
+            targets.append((client, serialized[packings]))
 
-        for client in self.clients:
+        def send(target):
+            client, buffers = target
             try:
-                serialized_data = pickle.dumps(data)
-                data_size = len(serialized_data)
-                client.sendall(data_size.to_bytes(4, byteorder="big"))
-                client.sendall(serialized_data)
+                with self.send_locks.get(client) or nullcontext():
+                    send_buffers(client, buffers)
+                return None
             except Exception as e:
                 logger.error(f"Error in broadcasting to client: {e}")
-                disconnected_clients.append(client)
+                return client
+
+        if parallel and len(targets) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(send, targets))
+        else:
+            results = [send(target) for target in targets]
+
+        disconnected_clients = [client for client in results if client is not None]
 
         for client in disconnected_clients:
             if client in self.clients:
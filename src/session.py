@@ -0,0 +1,343 @@
+"""
+Multiplexed streams over one PAM5 connection.
+
+A Session turns a connected PAM5Client into a carrier for many concurrent
+transfers. Every payload given to send() becomes a stream of chunk frames
+(encode_stream) with its own stream ID and sequence numbers; one writer
+thread interleaves the streams chunk by chunk, round robin, so a large
+transfer never holds the connection while a small one waits behind it:
+
+    session = Session(client)
+    first = session.send(large_payload, "chave123")
+    second = session.send(b"short message", "chave123")
+    session.wait()
+
+Each stream also has a flow-control window: at most window bytes of its
+plaintext may be sent and not yet consumed by the server. The server
+returns the window of a chunk with a WINDOW frame once its callback
+returned, so a stream whose consumer is slow stops on its own while the
+others keep going. A chunk the server rejected or whose callback failed
+is answered with a NACK instead, and its stream fails (see failed), as
+does a stream whose payload could not be read or encoded. On a
+server with a Dispatcher the chunks of every flow-controlled stream run
+in order on their own key, independently of the other streams of the
+connection.
+
+StreamReceiver decodes the interleaved chunks on the server side, as it
+keeps one expected sequence number per stream.
+"""
+
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, Optional
+
+from src.client import PAM5Client
+from src.logger import logger
+from src.protocol import (
+    FRAME_DATA,
+    FRAME_NACK,
+    FRAME_WINDOW,
+    decode_frame,
+    parse_ack,
+    parse_window,
+)
+from src.stream import DEFAULT_CHUNK_SIZE, Source, encode_stream
+
+STREAM_WINDOW = 256 * 1024
+
+
+class _Stream:
+    __slots__ = ("stream_id", "frames", "pending", "credit", "sent_bytes", "done")
+
+    def __init__(self, stream_id: int, frames: Iterator[Dict], credit: int):
+        self.stream_id = stream_id
+        self.frames = frames
+        self.pending = None
+        self.credit = credit
+        self.sent_bytes = 0
+        self.done = False
+
+
+def _frame_bytes(frame: Dict) -> int:
+    return frame["original_length"] // 8
+
+
+class Session:
+    """
+    Send many streams at once over one binary-format PAM5Client connection.
+
+    Once a Session is attached, only it should write to and read from the
+    client's socket. Frames the server sends that are not window updates
+    (e.g. broadcasts) go to message_callback.
+    """
+
+    def __init__(
+        self,
+        client: PAM5Client,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        window: int = STREAM_WINDOW,
+        message_callback: Optional[Callable[[Dict], None]] = None,
+    ):
+        if not client.connected or client.packings is None:
+            raise ValueError("Sessions need a client connected with the binary format")
+        if not 0 < chunk_size <= window:
+            raise ValueError(
+                f"chunk_size must be between 1 and the window ({window}), "
+                f"got {chunk_size}"
+            )
+
+        self.client = client
+        self.chunk_size = chunk_size
+        self.window = window
+        self.message_callback = message_callback
+        self.error = None
+        self.closed = False
+        self.frames_sent = 0
+        # Streams que não chegaram inteiros: stream ID -> erro
+        self.failed: Dict[int, Exception] = {}
+        self._streams: Dict[int, _Stream] = {}
+        self._active = deque()
+        self._ready = threading.Condition()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="session-writer", daemon=True
+        )
+        self._reader = threading.Thread(
+            target=self._read_loop, name="session-reader", daemon=True
+        )
+        self._writer.start()
+        self._reader.start()
+
+    def send(self, source: Source, key: str, compression: Optional[str] = None) -> int:
+        """
+        Queue a payload as a new stream and return its stream ID. The
+        payload is read, compressed if requested (with a codec the server
+        accepted, see PAM5Client.codecs), encrypted and encoded one chunk
+        at a time by the writer thread.
+        """
+        if compression and compression not in self.client.codecs:
+            raise ValueError(f"Server did not accept {compression!r} compression")
+        with self._ready:
+            if self.closed or self.error:
+                raise ConnectionError("Session is closed")
+            # IDs aleatórios, como os de encode_stream: streams de conexões
+            # diferentes não colidem num StreamReceiver compartilhado
+            stream_id = 0
+            while not stream_id or stream_id in self._streams:
+                stream_id = int.from_bytes(os.urandom(4), "big")
+            frames = encode_stream(source, key, self.chunk_size, stream_id, compression)
+            stream = _Stream(stream_id, frames, self.window)
+            self._streams[stream_id] = stream
+            self._active.append(stream)
+            self._ready.notify_all()
+        logger.debug("Session stream {} queued", stream_id)
+        return stream_id
+
+    @property
+    def active_streams(self) -> int:
+        """Streams with chunks still to send or not yet consumed by the server."""
+        return len(self._streams)
+
+    def credit(self, stream_id: int) -> int:
+        """Bytes stream_id may still send before waiting for the server."""
+        return self._streams[stream_id].credit
+
+    def wait(
+        self, stream_id: Optional[int] = None, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Wait until the server consumed every chunk of stream_id (or of every
+        stream), i.e. returned all of its window. Returns False if timeout
+        seconds passed first or if stream_id (without it, any stream of the
+        session) failed; failed holds the error.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def finished():
+            if self.error:
+                raise ConnectionError(f"Session failed: {self.error}")
+            if stream_id is None:
+                return not self._streams
+            return stream_id not in self._streams
+
+        with self._ready:
+            while not finished():
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self._ready.wait(remaining)
+            if stream_id is None:
+                return not self.failed
+            return stream_id not in self.failed
+
+    def close(self, wait: bool = True, timeout: Optional[float] = None):
+        """
+        Stop the session, by default once the queued streams were consumed.
+        The connection stays open for sending but is no longer read.
+        """
+        if wait and not self.error:
+            self.wait(timeout=timeout)
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+        self._writer.join(timeout)
+        try:
+            self.client.socket.shutdown(socket.SHUT_RD)
+        except (OSError, AttributeError):
+            pass
+        self._reader.join(timeout)
+
+    def _next_stream(self) -> Optional[_Stream]:
+        # Round robin: cada stream envia um chunk por vez, se tiver janela
+        for _ in range(len(self._active)):
+            stream = self._active[0]
+            self._active.rotate(-1)
+            if stream.pending is None or _frame_bytes(stream.pending) <= stream.credit:
+                return stream
+        return None
+
+    def _finish(self, stream: _Stream):
+        with self._ready:
+            stream.done = True
+            # Um NACK do servidor já pode ter tirado o stream da fila
+            if stream in self._active:
+                self._active.remove(stream)
+            self._release(stream)
+            self._ready.notify_all()
+
+    def _release(self, stream: _Stream):
+        # O stream sai da sessão quando o servidor devolveu toda a janela
+        if stream.done and stream.credit >= self.window:
+            self._streams.pop(stream.stream_id, None)
+
+    def _write_loop(self):
+        while True:
+            with self._ready:
+                while True:
+                    if self.error or (self.closed and not self._active):
+                        return
+                    stream = self._next_stream()
+                    if stream is not None:
+                        break
+                    self._ready.wait()
+                frame = stream.pending
+                if frame is not None:
+                    stream.credit -= _frame_bytes(frame)
+
+            # O próximo chunk é cifrado e codificado fora do lock
+            if frame is None:
+                try:
+                    stream.pending = next(stream.frames, None)
+                except Exception as e:
+                    self._fail(stream.stream_id, e)
+                    continue
+                if stream.pending is None:
+                    self._finish(stream)
+                else:
+                    stream.pending["flow_control"] = True
+                continue
+
+            try:
+                self.client.send_data(frame)
+            except Exception as e:
+                with self._ready:
+                    self.error = e
+                    self._ready.notify_all()
+                return
+            stream.sent_bytes += _frame_bytes(frame)
+            self.frames_sent += 1
+            if frame["final"]:
+                self._finish(stream)
+            else:
+                stream.pending = None
+
+    def _read_loop(self):
+        reader = self.client.reader
+        try:
+            while True:
+                frame = reader.read_frame()
+                if frame is None:
+                    break
+                header, body = frame
+                if header.frame_type == FRAME_WINDOW:
+                    self._on_window(*parse_window(header, body))
+                elif header.frame_type == FRAME_NACK:
+                    self._on_nack(*parse_ack(header, body))
+                elif header.frame_type == FRAME_DATA and self.message_callback:
+                    self.message_callback(decode_frame(header, body))
+        except Exception as e:
+            if not self.closed:
+                logger.error(f"Session stopped reading from the server: {e}")
+        with self._ready:
+            if not self.closed and self._streams and self.error is None:
+                self.error = ConnectionError("Server closed the connection")
+            self._ready.notify_all()
+
+    def _on_nack(self, stream_id: int, seq: int):
+        self._fail(
+            stream_id,
+            ConnectionError(f"Server rejected chunk {seq} of stream {stream_id}"),
+        )
+
+    def _fail(self, stream_id: int, error: Exception):
+        with self._ready:
+            stream = self._streams.pop(stream_id, None)
+            if stream is None:
+                return
+            logger.error(f"Session stream {stream_id} failed: {error}")
+            self.failed[stream_id] = error
+            # O writer não envia mais nada deste stream
+            stream.done = True
+            if stream in self._active:
+                self._active.remove(stream)
+            self._ready.notify_all()
+
+    def _on_window(self, stream_id: int, increment: int):
+        with self._ready:
+            stream = self._streams.get(stream_id)
+            if stream is not None:
+                stream.credit += increment
+                self._release(stream)
+                self._ready.notify_all()
+
+
+if __name__ == "__main__":
+    from src.server import PAM5Server
+    from src.stream import StreamReceiver
+
+    finished_at = {}
+    started = time.perf_counter()
+
+    def on_chunk(stream_id, plaintext, final):
+        # Consumidor lento: 20 ms por chunk
+        time.sleep(0.02)
+        if final:
+            finished_at[stream_id] = time.perf_counter() - started
+
+    server = PAM5Server()
+    threading.Thread(
+        target=lambda: server.start(
+            "127.0.0.1", 5226, message_callback=StreamReceiver(on_chunk)
+        ),
+        daemon=True,
+    ).start()
+    time.sleep(0.5)
+
+    client = PAM5Client()
+    client.connect("127.0.0.1", 5226, wire_format="binary")
+    session = Session(client, chunk_size=16 * 1024, window=64 * 1024)
+    large = session.send(os.urandom(1024 * 1024), "chave123")
+    small = session.send(b"mensagem curta", "chave123")
+    session.close()
+    deadline = time.monotonic() + 10
+    while len(finished_at) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    client.disconnect()
+    server.stop()
+
+    for name, stream_id in (("large", large), ("small", small)):
+        print(f"{name:>6} stream finished after {finished_at.get(stream_id, 0):.3f} s")
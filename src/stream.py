@@ -0,0 +1,266 @@
+"""
+Chunked encrypt/encode pipeline for messages of any size.
+
+Each chunk is encrypted on its own: the key restarts at the beginning of
+the chunk and permute_bits' rotation is applied within the chunk. A message
+that fits in a single chunk therefore produces the same symbols as
+encrypt_data followed by encoder_4d_pam5, and every chunk can be decoded
+as soon as it arrives.
+
+With compression set, each chunk is compressed on its own before being
+encrypted (see src.compress); chunks that would not shrink are sent as-is.
+With coding="trellis" the encrypted chunk is trellis coded instead of
+mapped directly, and decode_chunk Viterbi-decodes it (see src.trellis).
+"""
+
+import os
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Union
+
+from src.ascii_utils import text_to_bytes
+from src.compress import compress_chunk, decompress_chunk
+from src.crypto import decrypt_bytes, encrypt_bytes
+from src.decoder import decoder_4d_pam5_bytes
+from src.encoder import encoder_4d_pam5_bytes
+from src.logger import logger
+from src.metrics import get_metrics
+from src.trellis import TrellisEncoder, trellis_decode
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+Source = Union[bytes, bytearray, memoryview, BinaryIO, Iterable[bytes]]
+
+
+def iter_chunks(
+    source: Source, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[memoryview]:
+    """
+    Split a payload into chunks of at most chunk_size bytes.
+
+    Accepts a bytes-like object (sliced without copying), a binary file
+    object or any iterable of bytes, which is regrouped into full chunks.
+    """
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source).cast("B")
+        for start in range(0, len(view), chunk_size):
+            yield view[start : start + chunk_size]
+        return
+
+    if hasattr(source, "read"):
+        while chunk := source.read(chunk_size):
+            yield memoryview(chunk)
+        return
+
+    pending = bytearray()
+    for piece in source:
+        pending += piece
+        while len(pending) >= chunk_size:
+            yield memoryview(bytes(pending[:chunk_size]))
+            del pending[:chunk_size]
+    if pending:
+        yield memoryview(bytes(pending))
+
+
+def encode_stream(
+    source: Source,
+    key: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    stream_id: Optional[int] = None,
+    compression: Optional[str] = None,
+    coding: Optional[str] = None,
+) -> Iterator[Dict]:
+    """
+    Encrypt and encode a payload chunk by chunk, yielding one frame per chunk.
+
+    Frames have the same "symbols"/"key"/"original_length" fields as a
+    regular message, plus "stream_id", "seq" and "final", and "compression"
+    for chunks compressed with the compression codec. With coding="trellis"
+    each chunk is trellis coded from the zero state (see src.trellis) and
+    its frame carries "coding". Only one chunk is held in memory at a time.
+    """
+    if coding not in (None, "trellis"):
+        raise ValueError(f"Unknown coding {coding!r}")
+    key_bytes = text_to_bytes(key)
+    if stream_id is None:
+        stream_id = int.from_bytes(os.urandom(4), "big")
+
+    def frame(chunk: memoryview, seq: int, final: bool) -> Dict:
+        metrics = get_metrics()
+        codec = None
+        if compression:
+            with metrics.stage("compress", nbytes=len(chunk)):
+                chunk, codec = compress_chunk(chunk, compression)
+        with metrics.stage("encrypt", nbytes=len(chunk)):
+            encrypted = encrypt_bytes(chunk, key_bytes)
+        with metrics.stage("encode", nbytes=len(chunk), symbols=len(chunk)):
+            if coding:
+                symbols = TrellisEncoder()(encrypted)
+            else:
+                symbols = encoder_4d_pam5_bytes(encrypted)
+        message = {
+            "symbols": symbols,
+            "key": key,
+            "original_length": len(chunk) * 8,
+            "stream_id": stream_id,
+            "seq": seq,
+            "final": final,
+        }
+        if codec:
+            message["compression"] = codec
+        if coding:
+            message["coding"] = coding
+        return message
+
+    seq = 0
+    previous = None
+    for chunk in iter_chunks(source, chunk_size):
+        # Um bloco de atraso para saber qual é o último
+        if previous is not None:
+            yield frame(previous, seq, final=False)
+            seq += 1
+        previous = chunk
+
+    yield frame(previous if previous is not None else memoryview(b""), seq, True)
+    logger.debug("Stream {} encoded in {} chunks", stream_id, seq + 1)
+
+
+def decode_symbols(frame: Dict) -> bytes:
+    """
+    Decode the symbols of a single frame back into its still encrypted
+    bytes, Viterbi-decoding trellis-coded frames.
+    """
+    symbols = frame["symbols"]
+    with get_metrics().stage("decode", nbytes=len(symbols), symbols=len(symbols)):
+        if frame.get("coding") == "trellis":
+            decoded = trellis_decode(symbols)
+        else:
+            decoded = decoder_4d_pam5_bytes(symbols)
+    length = frame.get("original_length", len(decoded) * 8) // 8
+    return decoded[:length]
+
+
+def decode_chunk(frame: Dict) -> bytes:
+    """
+    Decode, decrypt and, if needed, decompress the payload carried by a
+    single frame.
+    """
+    metrics = get_metrics()
+    decoded = decode_symbols(frame)
+    with metrics.stage("decrypt", nbytes=len(decoded)):
+        plaintext = decrypt_bytes(decoded, text_to_bytes(frame["key"]))
+    if frame.get("compression"):
+        with metrics.stage("decompress", nbytes=len(decoded)):
+            plaintext = decompress_chunk(plaintext, frame["compression"])
+    return plaintext
+
+
+def decode_stream(frames: Iterable[Dict]) -> Iterator[bytes]:
+    """
+    Yield the plaintext of each frame of one stream, in order.
+
+    Stops after the frame marked "final" and raises ValueError if a frame
+    is missing or out of order.
+    """
+    expected_seq = 0
+    for frame in frames:
+        if frame.get("seq", expected_seq) != expected_seq:
+            raise ValueError(
+                f"Expected chunk {expected_seq} of stream "
+                f"{frame.get('stream_id')}, got {frame.get('seq')}"
+            )
+        yield decode_chunk(frame)
+        if frame.get("final", True):
+            return
+        expected_seq += 1
+
+
+class StreamReceiver:
+    """
+    message_callback for PAM5Server that decodes stream frames as they arrive.
+
+    chunk_callback(stream_id, plaintext, final) is called once per frame,
+    so the receiver never holds more than one chunk per open stream.
+    Messages without a "stream_id" are treated as single-chunk streams.
+    """
+
+    def __init__(self, chunk_callback):
+        self.chunk_callback = chunk_callback
+        self.expected_seq = {}
+
+    def __call__(self, frame: Dict) -> None:
+        stream_id = frame.get("stream_id")
+        seq = frame.get("seq", 0)
+        expected = self.expected_seq.get(stream_id, 0)
+        if seq != expected:
+            self.expected_seq.pop(stream_id, None)
+            raise ValueError(
+                f"Expected chunk {expected} of stream {stream_id}, got {seq}"
+            )
+
+        final = frame.get("final", True)
+        if final:
+            self.expected_seq.pop(stream_id, None)
+        else:
+            self.expected_seq[stream_id] = seq + 1
+
+        self.chunk_callback(stream_id, decode_chunk(frame), final)
+
+
+class MessageReceiver:
+    """
+    message_callback for PAM5Server that hands over whole messages.
+
+    Chunks are decoded as they arrive (see StreamReceiver) and kept until
+    the frame marked "final"; message_callback(message, frames) then gets
+    the joined plaintext and the frames of the stream, in order.
+
+    A stream that never gets its final chunk (e.g. the sender cancelled and
+    closed the connection) is never delivered. At most max_open unfinished
+    streams are kept; the oldest one is discarded when another one starts.
+    """
+
+    def __init__(self, message_callback, max_open: int = 16):
+        if max_open < 1:
+            raise ValueError(f"max_open must be at least 1, got {max_open}")
+        self.message_callback = message_callback
+        self.max_open = max_open
+        self.open = {}
+        self.receiver = StreamReceiver(self._on_chunk)
+
+    def __call__(self, frame: Dict) -> None:
+        stream_id = frame.get("stream_id")
+        if stream_id not in self.open:
+            while len(self.open) >= self.max_open:
+                oldest = next(iter(self.open))
+                logger.warning("Discarding unfinished stream {}", oldest)
+                self.discard(oldest)
+        frames, _ = self.open.setdefault(stream_id, ([], []))
+        frames.append(frame)
+        try:
+            self.receiver(frame)
+        except Exception:
+            self.discard(stream_id)
+            raise
+
+    def discard(self, stream_id) -> None:
+        """Drop the chunks received so far for an unfinished stream."""
+        self.open.pop(stream_id, None)
+        self.receiver.expected_seq.pop(stream_id, None)
+
+    def _on_chunk(self, stream_id, plaintext: bytes, final: bool) -> None:
+        frames, chunks = self.open[stream_id]
+        chunks.append(plaintext)
+        if final:
+            del self.open[stream_id]
+            self.message_callback(b"".join(chunks), frames)
+
+
+if __name__ == "__main__":
+    message = text_to_bytes("Teste de comunicação! " * 10)
+    frames = list(encode_stream(message, "chave123", chunk_size=64))
+    recovered = b"".join(decode_stream(frames))
+
+    print(f"Chunks:    {len(frames)}")
+    print(f"Recovered: {recovered == message}")
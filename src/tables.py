@@ -0,0 +1,118 @@
+"""
+Lookup tables for the 4D-PAM5 mapping, built once at import.
+
+An 8-bit block always maps to exactly one 4D symbol (2 bits per level,
+most significant pair first), so every conversion between bytes and
+symbols is one table lookup per byte:
+
+    BYTE_TO_SYMBOL   (256, 4) int8 symbol of every byte value
+    BYTE_TO_WORD     the same rows viewed as one uint32 each (single take)
+    BYTE_TO_TUPLE    the same rows as shared Python tuples
+    TUPLE_TO_BYTE    inverse of BYTE_TO_TUPLE
+    HIGH_NIBBLE      two int8 levels read as uint16 -> high nibble
+    LOW_NIBBLE       two int8 levels read as uint16 -> low nibble
+    BYTE_TO_BITS     '0'/'1' string of every byte value
+
+Run "python -m src.tables" for a microbenchmark against the per-bit
+implementations the tables replaced.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+BIT2LEVEL = {
+    "00": -2,
+    "10": -1,
+    "01": 1,
+    "11": 2,
+}
+LEVEL2BIT = {level: bits for bits, level in BIT2LEVEL.items()}
+
+# Marca pares de níveis inválidos acima da faixa de um byte, para um único max()
+INVALID = 0x100
+
+BYTE_TO_BITS: Tuple[str, ...] = tuple(format(value, "08b") for value in range(256))
+
+
+def _build_byte_table() -> np.ndarray:
+    table = np.empty((256, 4), dtype=np.int8)
+    for value, block in enumerate(BYTE_TO_BITS):
+        table[value] = [BIT2LEVEL[block[j : j + 2]] for j in range(0, 8, 2)]
+    return table
+
+
+def _build_half_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tables indexed by two consecutive int8 levels read as one uint16: the
+    first gives the high nibble of the byte (levels 1 and 2), the second
+    the low nibble (levels 3 and 4). Invalid pairs map to INVALID.
+    """
+    high = np.full(1 << 16, INVALID, dtype=np.uint16)
+    low = np.full(1 << 16, INVALID, dtype=np.uint16)
+    for first, first_bits in LEVEL2BIT.items():
+        for second, second_bits in LEVEL2BIT.items():
+            key = np.array([first, second], dtype=np.int8).view(np.uint16)[0]
+            nibble = int(first_bits + second_bits, 2)
+            high[key] = nibble << 4
+            low[key] = nibble
+    return high, low
+
+
+BYTE_TO_SYMBOL = _build_byte_table()
+BYTE_TO_WORD = BYTE_TO_SYMBOL.view(np.uint32).ravel()
+BYTE_TO_TUPLE: Tuple[Tuple[int, int, int, int], ...] = tuple(
+    map(tuple, BYTE_TO_SYMBOL.tolist())
+)
+TUPLE_TO_BYTE: Dict[Tuple[int, int, int, int], int] = {
+    symbol: value for value, symbol in enumerate(BYTE_TO_TUPLE)
+}
+HIGH_NIBBLE, LOW_NIBBLE = _build_half_tables()
+
+for _table in (BYTE_TO_SYMBOL, BYTE_TO_WORD, HIGH_NIBBLE, LOW_NIBBLE):
+    _table.flags.writeable = False
+
+
+if __name__ == "__main__":
+    import os
+    import timeit
+
+    from src.ascii_utils import bytes_to_binary, text_to_binary
+    from src.decoder import decoder_4d_pam5
+    from src.encoder import encoder_4d_pam5
+
+    # Implementações anteriores, bit a bit, para comparação
+    def text_to_binary_per_char(text):
+        return "".join(format(ord(c), "08b") for c in text)
+
+    def encoder_per_pair(bin_str):
+        bin_str += "0" * ((8 - len(bin_str) % 8) % 8)
+        return [
+            tuple(BIT2LEVEL[bin_str[i + j : i + j + 2]] for j in range(0, 8, 2))
+            for i in range(0, len(bin_str), 8)
+        ]
+
+    def decoder_per_level(symbols):
+        return "".join(LEVEL2BIT[level] for symbol in symbols for level in symbol)
+
+    for size in (16, 1024, 64 * 1024, 1024 * 1024):
+        text = os.urandom(size).decode("latin-1")
+        binary = bytes_to_binary(text.encode("latin-1"))
+        symbols = encoder_4d_pam5(binary)
+        assert encoder_per_pair(binary) == symbols
+        assert decoder_per_level(symbols) == decoder_4d_pam5(symbols) == binary
+        assert text_to_binary_per_char(text) == text_to_binary(text)
+
+        number = max(1, 100_000 // size)
+        for name, before, after in (
+            ("text_to_binary", text_to_binary_per_char, text_to_binary),
+            ("encoder", encoder_per_pair, encoder_4d_pam5),
+            ("decoder", decoder_per_level, decoder_4d_pam5),
+        ):
+            argument = {"text_to_binary": text, "encoder": binary}.get(name, symbols)
+            old = min(timeit.repeat(lambda: before(argument), number=number, repeat=3))
+            new = min(timeit.repeat(lambda: after(argument), number=number, repeat=3))
+            print(
+                f"{size:>8} B {name:<15} {old / number * 1e3:>10.3f} ms"
+                f" -> {new / number * 1e3:>9.3f} ms ({old / new:>5.1f}x)"
+            )
@@ -0,0 +1,110 @@
+"""
+Testes da thread de trabalho, da fila de UI e da recepção da GUI
+"""
+
+import threading
+import time
+import tkinter as tk
+
+import pytest
+
+from src.ascii_utils import bytes_to_binary, text_to_bytes
+from src.gui.app import App
+from src.stream import decode_symbols, encode_stream
+
+
+@pytest.fixture
+def app():
+    try:
+        app = App()
+    except tk.TclError:
+        pytest.skip("Tk needs a display")
+    app.withdraw()
+    yield app
+    app.on_closing()
+
+
+def wait_for(app, condition, timeout=5.0):
+    # Roda o loop do Tk (e _poll_ui_queue) até a condição valer
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        app.update()
+        time.sleep(0.01)
+    return True
+
+
+def text(app):
+    app.txt_area.flush()
+    return app.txt_area.get("1.0", "end-1c")
+
+
+def test_post_runs_on_tk_thread(app):
+    seen = []
+    worker = threading.Thread(
+        target=app.post, args=(lambda: seen.append(threading.current_thread()),)
+    )
+    worker.start()
+    worker.join(5)
+    assert wait_for(app, lambda: seen)
+    assert seen == [threading.main_thread()]
+
+
+def test_report_progress_updates_bar_and_status(app):
+    app.report_progress(3, 6, "ETAPA 3/6")
+    assert wait_for(app, lambda: app.status_var.get() == "ETAPA 3/6")
+    assert float(app.progress["value"]) == 3
+    assert float(app.progress["maximum"]) == 6
+
+
+def test_run_job_cancel(app):
+    started = threading.Event()
+
+    def target():
+        started.set()
+        while True:
+            app.check_cancelled()
+            time.sleep(0.01)
+
+    app.run_job(target)
+    assert started.wait(5)
+    assert str(app.btn_cancelar["state"]) == tk.NORMAL
+
+    app.cancel_job()
+    app.job.join(5)
+    assert not app.job.is_alive()
+    assert wait_for(app, lambda: str(app.btn_cancelar["state"]) == tk.DISABLED)
+    assert "Operação cancelada pelo usuário" in text(app)
+    assert app.status_var.get() == "Operação cancelada"
+
+
+def test_server_shows_only_complete_messages(app):
+    cancelled = list(encode_stream(text_to_bytes("cancelada " * 10), "k", 16))
+    complete = list(encode_stream(text_to_bytes("completa " * 10), "k", 16))
+
+    # Envio cancelado: só parte dos blocos chega
+    for frame in cancelled[:2]:
+        app.server_callback(frame)
+    assert "RECEBIDA COM SUCESSO" not in text(app)
+
+    for frame in complete:
+        app.server_callback(frame)
+    transcript = text(app)
+    assert transcript.count("MENSAGEM RECEBIDA COM SUCESSO") == 1
+    assert "completa completa" in transcript
+    assert "cancelada cancelada" not in transcript
+
+
+def test_server_decodes_trellis_frames(app):
+    payload = text_to_bytes("trellis " * 10)
+    frames = list(encode_stream(payload, "k", 16, coding="trellis"))
+    for frame in frames:
+        app.server_callback(frame)
+
+    transcript = text(app)
+    assert "trellis trellis" in transcript
+    assert "Erro" not in transcript
+    # O binário exibido é o do chunk cifrado, não lixo do mapeamento simples
+    expected = bytes_to_binary(bytes(decode_symbols(frames[0])))
+    assert expected[:16] in transcript
@@ -0,0 +1,180 @@
+"""
+Testes do cliente asyncio e do pool de conexões
+"""
+
+import asyncio
+import pickle
+
+import pytest
+
+from src.async_client import AsyncPAM5Client, PAM5ConnectionPool
+from src.async_server import AsyncPAM5Server
+from src.compress import available_codecs
+from src.protocol import (
+    FRAME_ACCEPT,
+    SUPPORTED_PACKINGS,
+    VERSION,
+    FrameHeader,
+    ProtocolError,
+    pack_header,
+)
+from src.stream import encode_stream
+
+
+def messages(count):
+    return [next(encode_stream(b"mensagem %d" % i, "chave")) for i in range(count)]
+
+
+async def start_server(received):
+    server = AsyncPAM5Server()
+    await server.start("127.0.0.1", 0, message_callback=received.append)
+    return server, server.server.sockets[0].getsockname()[1]
+
+
+async def wait_for_count(received, count, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        if len(received) >= count:
+            break
+        await asyncio.sleep(0.01)
+    # Dá tempo de chegarem eventuais duplicatas
+    await asyncio.sleep(0.05)
+
+
+async def start_pickle_server(received):
+    # Servidor legado: só entende o framing pickle e ignora o HELLO
+    async def handle(reader, writer):
+        try:
+            while True:
+                size = int.from_bytes(await reader.readexactly(4), "big")
+                received.append(pickle.loads(await reader.readexactly(size)))
+        except (asyncio.IncompleteReadError, ConnectionError, pickle.PickleError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+@pytest.mark.parametrize("wire_format", ["binary", "auto"])
+def test_client_negotiates_binary(wire_format):
+    async def run():
+        received = []
+        server, port = await start_server(received)
+        client = AsyncPAM5Client("127.0.0.1", port, wire_format=wire_format)
+        try:
+            await client.connect()
+            assert client.packings & SUPPORTED_PACKINGS == SUPPORTED_PACKINGS
+            assert client.codecs == available_codecs()
+            assert await client.send_many(messages(50)) == 50
+            await wait_for_count(received, 50)
+        finally:
+            await client.close()
+            await server.stop()
+        return received
+
+    assert len(asyncio.run(run())) == 50
+
+
+def test_auto_falls_back_to_pickle():
+    async def run():
+        received = []
+        server, port = await start_pickle_server(received)
+        client = AsyncPAM5Client(
+            "127.0.0.1", port, wire_format="auto", handshake_timeout=0.2
+        )
+        try:
+            await client.connect()
+            assert client.packings is None
+            await client.send_data({"symbols": [], "key": "chave"})
+            await wait_for_count(received, 1)
+
+            # Só com binary, o handshake sem resposta é um erro
+            binary = AsyncPAM5Client(
+                "127.0.0.1", port, wire_format="binary", handshake_timeout=0.2
+            )
+            with pytest.raises(ConnectionError):
+                await binary.connect()
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+        return received
+
+    assert asyncio.run(run()) == [{"symbols": [], "key": "chave"}]
+
+
+@pytest.mark.parametrize("body_length", [0, 1 << 30])
+def test_bad_accept_body_length_rejected(body_length):
+    async def run():
+        # ACCEPT com corpo vazio ou enorme, que nunca chega
+        async def handle(reader, writer):
+            header = FrameHeader(VERSION, FRAME_ACCEPT, 0, 0, 0, 0, 0, 0, body_length)
+            writer.write(pack_header(header))
+            await writer.drain()
+            await reader.read()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncPAM5Client(
+            "127.0.0.1", port, wire_format="binary", handshake_timeout=30
+        )
+        try:
+            with pytest.raises(ConnectionError) as error:
+                await asyncio.wait_for(client.connect(), 5)
+            assert isinstance(error.value.__cause__, ProtocolError)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_pool_replaces_connections_closed_by_server():
+    async def run():
+        received = []
+        server, port = await start_server(received)
+        pool = PAM5ConnectionPool()
+        try:
+            await pool.send_many("127.0.0.1", port, messages(10))
+            await wait_for_count(received, 10)
+            # O servidor fecha a conexão ociosa do pool
+            for task in list(server.clients):
+                task.cancel()
+            await asyncio.sleep(0.05)
+
+            await pool.send_many("127.0.0.1", port, messages(10))
+            await wait_for_count(received, 20)
+        finally:
+            await pool.close()
+            await server.stop()
+        return received
+
+    assert len(asyncio.run(run())) == 20
+
+
+def test_pool_does_not_resend_after_partial_send(monkeypatch):
+    send_many = AsyncPAM5Client.send_many
+
+    async def lost_after_write(self, batch):
+        await send_many(self, batch)
+        raise ConnectionResetError("connection lost after the write")
+
+    monkeypatch.setattr(AsyncPAM5Client, "send_many", lost_after_write)
+
+    async def run():
+        received = []
+        server, port = await start_server(received)
+        pool = PAM5ConnectionPool()
+        try:
+            with pytest.raises(ConnectionError):
+                await pool.send_many("127.0.0.1", port, messages(20))
+            await wait_for_count(received, 20)
+        finally:
+            await pool.close()
+            await server.stop()
+        return received
+
+    # Cada mensagem chega uma vez só: o lote não é repetido
+    assert len(asyncio.run(run())) == 20
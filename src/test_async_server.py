@@ -0,0 +1,155 @@
+"""
+Testes do servidor asyncio: handshake, frames de dados e framing pickle
+"""
+
+import asyncio
+import pickle
+
+from src.async_client import AsyncPAM5Client
+from src.async_server import AsyncPAM5Server
+from src.compress import available_codecs
+from src.protocol import (
+    FRAME_HELLO,
+    FRAME_NACK,
+    SUPPORTED_PACKINGS,
+    VERSION,
+    FrameHeader,
+    pack_header,
+    parse_ack,
+    parse_header,
+    parse_window,
+)
+from src.stream import decode_chunk, encode_stream
+
+
+async def start_server(received, **options):
+    server = AsyncPAM5Server(**options)
+    await server.start("127.0.0.1", 0, message_callback=received.append)
+    port = server.server.sockets[0].getsockname()[1]
+    return server, port
+
+
+async def closed_by_server(reader):
+    # O servidor fecha a conexão sem responder
+    return await asyncio.wait_for(reader.read(), 5) == b""
+
+
+def test_handshake_and_data_frames():
+    payload = bytes(range(256)) * 40
+
+    async def run():
+        received = []
+        server, port = await start_server(received)
+        client = AsyncPAM5Client("127.0.0.1", port)
+        try:
+            await client.connect()
+            assert client.packings & SUPPORTED_PACKINGS == SUPPORTED_PACKINGS
+            assert client.codecs == available_codecs()
+            frames = list(encode_stream(payload, "chave", chunk_size=1000))
+            assert await client.send_many(frames) == len(frames)
+
+            # Um chunk com controle de fluxo devolve sua janela
+            frame = dict(frames[0], flow_control=True)
+            await client.send_data(frame)
+            header = parse_header(await client.reader.readexactly(32))
+            body = await client.reader.readexactly(header.body_length)
+            assert parse_window(header, body) == (frame["stream_id"], 1000)
+        finally:
+            await client.close()
+            await server.stop()
+        return received
+
+    received = asyncio.run(run())
+    # 11 chunks e o primeiro de novo, com controle de fluxo
+    assert len(received) == 12
+    assert b"".join(decode_chunk(m) for m in received[:-1]) == payload
+
+
+def test_pickle_framing_rejected_by_default():
+    async def run():
+        received = []
+        server, port = await start_server(received)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            message = pickle.dumps({"symbols": [], "key": "chave"})
+            writer.write(len(message).to_bytes(4, "big") + message)
+            await writer.drain()
+            assert await closed_by_server(reader)
+            writer.close()
+        finally:
+            await server.stop()
+        return received
+
+    assert asyncio.run(run()) == []
+
+
+def test_pickle_framing_allowed():
+    async def run():
+        received = []
+        server, port = await start_server(received, allow_pickle=True)
+        client = AsyncPAM5Client("127.0.0.1", port, wire_format="pickle")
+        try:
+            await client.connect()
+            await client.send_data({"symbols": [], "key": "chave"})
+            for _ in range(100):
+                if received:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await client.close()
+            await server.stop()
+        return received
+
+    assert asyncio.run(run()) == [{"symbols": [], "key": "chave"}]
+
+
+def test_oversized_hello_rejected():
+    async def run():
+        server, port = await start_server([], max_frame_size=1024)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            # HELLO anunciando um corpo enorme que nunca chega
+            header = FrameHeader(VERSION, FRAME_HELLO, 0, 0, 0, 0, 0, 0, 1 << 30)
+            writer.write(pack_header(header))
+            await writer.drain()
+            assert await closed_by_server(reader)
+            writer.close()
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_failed_callback_nacks_instead_of_window():
+    def callback(data):
+        if data["key"] == "quebrada":
+            raise ValueError("consumidor falhou")
+
+    async def read_reply(client):
+        header = parse_header(await client.reader.readexactly(32))
+        return header, await client.reader.readexactly(header.body_length)
+
+    async def run():
+        server = AsyncPAM5Server()
+        await server.start("127.0.0.1", 0, message_callback=callback)
+        port = server.server.sockets[0].getsockname()[1]
+        client = AsyncPAM5Client("127.0.0.1", port)
+        try:
+            await client.connect()
+            broken = next(encode_stream(b"x" * 1000, "quebrada", stream_id=5))
+            await client.send_data(dict(broken, flow_control=True))
+            nack = await read_reply(client)
+
+            # O erro não derruba a conexão: outro stream segue nela
+            healthy = next(encode_stream(b"y" * 1000, "chave", stream_id=6))
+            await client.send_data(dict(healthy, flow_control=True))
+            window = await read_reply(client)
+        finally:
+            await client.close()
+            await server.stop()
+        return nack, window
+
+    (header, body), window = asyncio.run(run())
+    assert header.frame_type == FRAME_NACK
+    assert parse_ack(header, body) == (5, 0)
+    assert parse_window(*window) == (6, 1000)
@@ -0,0 +1,43 @@
+"""
+Testes do benchmark por etapa do pipeline
+"""
+
+from src.benchmark import (
+    bytes_stages,
+    compare,
+    make_message,
+    parse_size,
+    run,
+    str_stages,
+)
+
+
+def test_parse_size():
+    assert parse_size("16") == 16
+    assert parse_size("64k") == 64 * 1024
+    assert parse_size("100MB") == 100 * 1024**2
+
+
+def test_run_covers_every_stage():
+    results = run(sizes=[16, 1024], apis=["str", "bytes"], repeat=1, str_limit=16)
+
+    stages = {(row["api"], row["stage"]) for row in results if "stage" in row}
+    assert ("str", "tcp_loopback") in stages
+    assert ("bytes", "tcp_loopback") in stages
+    assert len(stages) == 14
+    assert {"api": "str", "size": 1024, "skipped": "above --str-limit"} in results
+    assert all(row["mb_per_s"] > 0 for row in results if "stage" in row)
+    assert len(compare(results, results)) == len(results) - 1
+    assert len(make_message(1000)) == 1000
+
+
+def test_stage_pipelines_round_trip():
+    message = make_message(16)
+
+    outputs = {name: f() for name, f in str_stages(message, "chave123", None)}
+    assert len(outputs["encrypt_data"]) == 128
+    assert outputs["decrypt_data"] == message
+
+    outputs = {name: f() for name, f in bytes_stages(message, "chave123", None)}
+    assert len(outputs["encrypt_bytes"]) == 16
+    assert outputs["decrypt_bytes"] == message.encode("ascii")
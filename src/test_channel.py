@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.ascii_utils import bytes_to_binary
+from src.channel import link, measure_ber
+from src.decoder import decoder_4d_pam5
+from src.encoder import encoder_4d_pam5_bytes
+
+
+@pytest.mark.parametrize("pulse", ["rect", "rrc"])
+def test_noiseless_link_in_chunks_recovers_symbols(pulse):
+    data = np.random.default_rng(0).integers(0, 256, 5000, dtype=np.uint8)
+    symbols = encoder_4d_pam5_bytes(data)
+    transmitter, channel, receiver = link(pulse, isi=(1.0, 0.1), attenuation=0.3)
+
+    received = [
+        receiver(channel(transmitter(symbols[start : start + size])))
+        for start, size in zip(range(0, 5000, 700), [700] * 8)
+    ]
+    silence = np.zeros((receiver.lag, 4), dtype=np.int8)
+    received.append(receiver(channel(transmitter(silence))))
+    received = np.concatenate(received)[: len(symbols)]
+
+    assert np.array_equal(received, symbols)
+    assert decoder_4d_pam5(received) == bytes_to_binary(data.tobytes())
+
+
+def test_ber_grows_with_noise():
+    clean = measure_ber(20_000, noise_std=0.01, chunk_symbols=3000)
+    noisy = measure_ber(20_000, noise_std=0.3, chunk_symbols=3000)
+    assert clean["symbols"] == noisy["symbols"] == 20_000
+    assert clean["bit_errors"] == 0
+    assert 0 < noisy["ber"] < 0.5
+    assert noisy["snr_db"] < clean["snr_db"]
@@ -0,0 +1,118 @@
+"""
+Testes do caminho vetorizado de codificação 4D-PAM5
+"""
+
+import numpy as np
+import pytest
+
+from src.ascii_utils import bytes_to_text, text_to_binary, text_to_bytes
+from src.crypto import (
+    KeyCache,
+    StreamCipher,
+    decrypt_bytes,
+    decrypt_data,
+    encrypt_bytes,
+    encrypt_data,
+)
+from src.decoder import decoder_4d_pam5, decoder_4d_pam5_bytes
+from src.encoder import encoder_4d_pam5, encoder_4d_pam5_bytes
+
+
+def test_bytes_codec_matches_string_codec():
+    payload = bytes(range(256))
+    symbols = encoder_4d_pam5_bytes(payload)
+
+    assert symbols.dtype == np.int8
+    assert symbols.shape == (256, 4)
+    assert [tuple(s) for s in symbols.tolist()] == encoder_4d_pam5(
+        text_to_binary(payload.decode("latin-1"))
+    )
+    assert decoder_4d_pam5(symbols.tolist()) == text_to_binary(
+        payload.decode("latin-1")
+    )
+
+
+def test_bytes_codec_round_trip():
+    payload = np.random.default_rng(0).integers(0, 256, 1 << 20, dtype=np.uint8)
+    decoded = decoder_4d_pam5_bytes(encoder_4d_pam5_bytes(payload))
+    assert np.array_equal(decoded, payload)
+
+
+@pytest.mark.parametrize("bad_level", [0, 3, -3, 130])
+def test_string_decoder_rejects_invalid_levels(bad_level):
+    # Caminho das tuplas (TUPLE_TO_BYTE) cai no decodificador vetorizado
+    with pytest.raises(ValueError, match=f"Invalid level {bad_level}"):
+        decoder_4d_pam5([(1, 2, -1, -2), (2, bad_level, 1, 1)])
+
+
+@pytest.mark.parametrize("bad_level", [0, 3, -3, 130])
+def test_bytes_decoder_rejects_invalid_levels(bad_level):
+    with pytest.raises(ValueError, match=f"Invalid level {bad_level}"):
+        decoder_4d_pam5_bytes([(1, 2, -1, -2), (2, bad_level, 1, 1)])
+
+
+def test_bytes_pipeline_round_trip():
+    message = "Teste de comunicação!"
+    key = text_to_bytes("chave123")
+
+    encrypted = encrypt_bytes(text_to_bytes(message), key)
+    symbols = encoder_4d_pam5_bytes(encrypted)
+    recovered = decrypt_bytes(decoder_4d_pam5_bytes(symbols), key)
+
+    assert bytes_to_text(recovered) == message
+    assert text_to_binary(bytes_to_text(encrypted)) == encrypt_data(message, "chave123")
+    assert decrypt_data(encrypt_data(message, "chave123"), "chave123") == message
+
+
+@pytest.mark.parametrize("key_length", [1, 3, 8, 13, 40])
+@pytest.mark.parametrize("size", [1, 2, 5, 100, 4099])
+def test_stream_cipher_matches_one_shot(key_length, size):
+    rng = np.random.default_rng(size * 64 + key_length)
+    message = rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+    key = rng.integers(0, 256, key_length, dtype=np.uint8).tobytes()
+    cuts = sorted(rng.integers(0, size + 1, 6).tolist())
+    chunks = [message[a:b] for a, b in zip([0] + cuts, cuts + [size])]
+
+    cipher = StreamCipher(key, size)
+    encrypted = b"".join(map(cipher.update, chunks)) + cipher.finalize()
+    assert encrypted == encrypt_bytes(message, key)
+
+    tail = encrypted[size - StreamCipher.decrypt_tail_size(key, size) :]
+    decipher = StreamCipher(key, size, decrypt=True, tail=tail)
+    pieces = [encrypted[a:b] for a, b in zip([0] + cuts, cuts + [size])]
+    decrypted = b"".join(map(decipher.update, pieces)) + decipher.finalize()
+    assert decrypted == message
+
+
+def test_stream_cipher_checks_length():
+    cipher = StreamCipher("chave", 4)
+    cipher.update(b"abc")
+    with pytest.raises(ValueError):
+        cipher.finalize()
+    with pytest.raises(ValueError):
+        cipher.update(b"de")
+    with pytest.raises(ValueError):
+        StreamCipher("chave", 4, decrypt=True)
+
+
+def test_key_cache_limits_and_stats():
+    cache = KeyCache(max_entries=2)
+    first = cache.get("chave1")
+    cache.get("chave2")
+    assert cache.get("chave1") is first
+    cache.get("chave3")  # descarta chave2, a menos usada
+    assert cache.stats() == {
+        "entries": 2,
+        "bytes": cache.nbytes,
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+    }
+    assert cache.get("chave1") is first
+
+    small = KeyCache(max_bytes=first.nbytes)
+    small.get("chave1")
+    small.get("chave2")
+    assert small.stats()["entries"] == 1
+    assert small.nbytes <= first.nbytes
+    assert first.keystream(10, offset=3) == (b"chave1" * 3)[3:13]
@@ -3,15 +3,20 @@
 Teste de comunicação entre cliente e servidor 4D-PAM5
 """
 
+import os
+import socket
 import threading
 import time
 
+import pytest
+
 from src.client import PAM5Client
 from src.crypto import decrypt_data, encrypt_data
 from src.decoder import decoder_4d_pam5
 from src.encoder import encoder_4d_pam5
 from src.logger import logger
 from src.server import PAM5Server
+from src.stream import StreamReceiver, encode_stream
 
 
 def test_server_callback(data):
@@ -75,5 +80,62 @@ def test_communication():
         server.stop()
 
 
+def test_stream_communication():
+    """Mensagem grande enviada em blocos e decodificada bloco a bloco"""
+    message = os.urandom(300_000)
+    received = []
+    done = threading.Event()
+
+    def on_chunk(stream_id, plaintext, final):
+        received.append(plaintext)
+        if final:
+            done.set()
+
+    server = PAM5Server()
+    server_thread = threading.Thread(
+        target=lambda: server.start(
+            host="127.0.0.1", port=12346, message_callback=StreamReceiver(on_chunk)
+        ),
+        daemon=True,
+    )
+    server_thread.start()
+    time.sleep(0.5)
+
+    client = PAM5Client()
+    try:
+        client.connect("127.0.0.1", 12346)
+        sent = client.send_stream(encode_stream(message, "chave123"))
+        assert done.wait(10)
+    finally:
+        client.disconnect()
+        server.stop()
+
+    assert sent == len(received) == 5
+    assert b"".join(received) == message
+
+
+def test_binary_handshake_failure_raises():
+    """Só com binary, o handshake sem resposta é um erro e fecha o socket"""
+    # Servidor mudo: aceita a conexão (backlog) e nunca responde ao HELLO
+    with socket.create_server(("127.0.0.1", 0)) as silent:
+        port = silent.getsockname()[1]
+
+        client = PAM5Client()
+        with pytest.raises(ConnectionError, match="Handshake failed"):
+            client.connect(
+                "127.0.0.1", port, wire_format="binary", handshake_timeout=0.2
+            )
+        assert not client.connected
+        assert client.socket is None
+
+        # Em auto, o mesmo servidor cai para o framing pickle
+        client.connect("127.0.0.1", port, wire_format="auto", handshake_timeout=0.2)
+        try:
+            assert client.connected
+            assert client.packings is None
+        finally:
+            client.disconnect()
+
+
 if __name__ == "__main__":
     test_communication()
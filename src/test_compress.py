@@ -0,0 +1,102 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from src.client import PAM5Client
+from src.compress import available_codecs, compress_chunk, decompress_chunk
+from src.protocol import (
+    FRAME_ACCEPT,
+    SUPPORTED_PACKINGS,
+    accepted_codecs,
+    build_hello,
+    compression_capabilities,
+    decode_frame,
+    encode_frame,
+    parse_control,
+    parse_header,
+)
+from src.server import PAM5Server
+from src.session import Session
+from src.stream import decode_stream, encode_stream
+from src.transport import FrameReader
+
+TEXT = "Teste de comunicação! ".encode("latin-1") * 5000
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_compressed_stream_roundtrip(codec):
+    frames = []
+    for frame in encode_stream(TEXT, "chave123", chunk_size=32768, compression=codec):
+        wire = encode_frame(frame)
+        frames.append(decode_frame(parse_header(wire), wire[32:]))
+
+    assert all(frame["compression"] == codec for frame in frames)
+    assert sum(len(frame["symbols"]) for frame in frames) < len(TEXT) // 10
+    assert b"".join(decode_stream(frames)) == TEXT
+
+
+def test_compression_bypass():
+    assert compress_chunk(b"curta") == (b"curta", None)
+    noise = os.urandom(65536)
+    assert compress_chunk(noise) == (noise, None)
+    # Trecho comprimível seguido de ruído: a amostra passa, o bloco não
+    mixed = TEXT[:4096] + os.urandom(65536)
+    assert compress_chunk(mixed)[1] is None
+
+    frame = next(encode_stream(noise, "chave123", compression="zlib"))
+    assert "compression" not in frame
+    assert len(frame["symbols"]) == len(noise)
+
+
+def test_decompress_rejects_bad_input():
+    payload, codec = compress_chunk(TEXT)
+    with pytest.raises(ValueError):
+        decompress_chunk(payload[:-10], codec)
+    with pytest.raises(ValueError):
+        decompress_chunk(payload, codec, max_size=1024)
+    with pytest.raises(ValueError):
+        decompress_chunk(b"not zlib data", codec)
+
+
+def test_compression_capabilities_round_trip():
+    for codecs in [(), ("zlib",), ("zlib", "lzma"), ("lzma", "zstd")]:
+        mask = compression_capabilities(codecs)
+        # Os bits dos codecs não se misturam com os dos empacotamentos
+        assert not mask & SUPPORTED_PACKINGS
+        assert accepted_codecs(mask | SUPPORTED_PACKINGS) == codecs
+
+
+def legacy_connect(client, port):
+    # Cliente antigo: o HELLO só traz os empacotamentos
+    sock = socket.create_connection(("127.0.0.1", port))
+    client.socket, client.reader = sock, FrameReader(sock)
+    sock.sendall(build_hello(SUPPORTED_PACKINGS))
+    header, body = client.reader.read_frame()
+    client.packings = parse_control(header, body, FRAME_ACCEPT)
+    client.connected = True
+
+
+def test_compression_negotiated_in_handshake():
+    server = PAM5Server()
+    threading.Thread(
+        target=lambda: server.start("127.0.0.1", 12354), daemon=True
+    ).start()
+    time.sleep(0.5)
+    client, legacy = PAM5Client(), PAM5Client()
+    try:
+        client.connect("127.0.0.1", 12354, wire_format="binary")
+        assert client.codecs == available_codecs()
+
+        legacy_connect(legacy, 12354)
+        assert legacy.packings == SUPPORTED_PACKINGS
+        assert legacy.codecs == ()
+        # Sem o codec no ACCEPT, a sessão não comprime
+        with pytest.raises(ValueError):
+            Session(legacy).send(b"dados", "chave", compression="zlib")
+    finally:
+        client.disconnect()
+        legacy.disconnect()
+        server.stop()
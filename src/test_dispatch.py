@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from src.client import PAM5Client
+from src.dispatch import Dispatcher
+from src.server import PAM5Server
+from src.stream import encode_stream
+
+
+def test_dispatch_keeps_order_per_key():
+    results = {"A": [], "B": [], "C": []}
+    dispatcher = Dispatcher(workers=2, max_queue=8)
+    for n in range(100):
+        for key, received in results.items():
+            dispatcher.submit(key, received.append, n)
+    dispatcher.close()
+
+    for received in results.values():
+        assert received == list(range(100))
+    assert dispatcher.submitted == 300
+
+
+@pytest.mark.parametrize(
+    "policy, expected", [("drop_oldest", [0, 8, 9]), ("reject", [0, 1, 2])]
+)
+def test_dispatch_backpressure_policies(policy, expected):
+    started = threading.Event()
+    release = threading.Event()
+    received = []
+
+    def callback(n):
+        if n == 0:
+            started.set()
+            release.wait(5)
+        received.append(n)
+
+    dispatcher = Dispatcher(workers=1, max_queue=2, policy=policy)
+    dispatcher.submit("A", callback, 0)
+    # Espera o worker pegar a primeira mensagem; join() não serve aqui,
+    # pois ela só termina depois de release
+    assert started.wait(5)
+    accepted = [dispatcher.submit("A", callback, n) for n in range(1, 10)]
+    release.set()
+    dispatcher.close()
+
+    assert received == expected
+    if policy == "reject":
+        assert accepted.count(False) == dispatcher.rejected == 7
+    else:
+        assert all(accepted) and dispatcher.dropped == 7
+
+
+def test_server_reads_while_callback_is_busy():
+    release = threading.Event()
+    received = []
+
+    def callback(data):
+        release.wait(5)
+        received.append(data["seq"])
+
+    dispatcher = Dispatcher(workers=1, max_queue=64)
+    server = PAM5Server(dispatcher=dispatcher)
+    threading.Thread(
+        target=lambda: server.start("127.0.0.1", 12348, message_callback=callback),
+        daemon=True,
+    ).start()
+    time.sleep(0.5)
+
+    client = PAM5Client()
+    try:
+        client.connect("127.0.0.1", 12348)
+        client.send_many(encode_stream(b"x" * 2000, "chave", chunk_size=100))
+
+        deadline = time.monotonic() + 5
+        while dispatcher.submitted < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Todas as mensagens foram lidas enquanto o callback estava parado
+        assert dispatcher.submitted == 20
+        assert received == []
+    finally:
+        release.set()
+        dispatcher.close()
+        client.disconnect()
+        server.stop()
+
+    assert received == list(range(20))
+
+
+def test_server_stop_closes_dispatcher():
+    dispatcher = Dispatcher(workers=2)
+    PAM5Server(dispatcher=dispatcher).stop()
+    assert dispatcher.closed
+    for thread in dispatcher._threads:
+        thread.join(5)
+        assert not thread.is_alive()
@@ -0,0 +1,64 @@
+"""
+Testes do transcript limitado da GUI
+"""
+
+import tkinter as tk
+
+import numpy as np
+import pytest
+
+from src.gui.log_view import TranscriptView, format_value, preview_value
+
+
+@pytest.fixture
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("Tk needs a display")
+    root.withdraw()
+    yield root
+    root.destroy()
+
+
+def test_preview_does_not_format_whole_value():
+    symbols = np.ones((100_000, 4), dtype=np.int8)
+    preview, truncated = preview_value(symbols, limit=14)
+    assert (preview, truncated) == ("[(1, 1, 1, 1),", True)
+    assert preview_value("0101", limit=8) == ("0101", False)
+    assert format_value(symbols[:1]) == "[(1, 1, 1, 1)]"
+
+
+def test_transcript_evicts_oldest_lines(root):
+    view = TranscriptView(root, max_lines=10)
+    for i in range(50):
+        view.write(f"linha {i}\n")
+    view.flush()
+
+    lines = view.get("1.0", "end-1c").splitlines()
+    assert len(lines) <= 10
+    assert lines[-1] == "linha 49"
+    assert "linha 0" not in lines
+
+
+def test_transcript_char_limit(root):
+    view = TranscriptView(root, max_chars=100)
+    for _ in range(50):
+        view.write("x" * 10 + "\n")
+    view.flush()
+    assert len(view.get("1.0", "end-1c")) <= 100
+
+
+def test_transcript_truncates_and_forgets_evicted_values(root):
+    view = TranscriptView(root, max_lines=5, preview_chars=20)
+    view.write_value("bits: ", "01" * 500)
+    view.flush()
+    text = view.get("1.0", "end-1c")
+    assert text.startswith("bits: " + "01" * 10 + " … [+ expandir]")
+    assert len(view._values) == 1
+
+    # A linha truncada sai pelo início e leva o valor completo junto
+    for i in range(10):
+        view.write(f"linha {i}\n")
+    view.flush()
+    assert not view._values
@@ -0,0 +1,71 @@
+import threading
+import time
+import urllib.request
+
+from src.client import PAM5Client
+from src.metrics import (
+    STAGE_SECONDS,
+    Metrics,
+    MetricsRegistry,
+    get_metrics,
+    set_metrics,
+)
+from src.server import PAM5Server
+from src.stream import StreamReceiver, encode_stream
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    with metrics.stage("encrypt", nbytes=16), metrics.timer(STAGE_SECONDS):
+        pass
+    assert not metrics.enabled
+
+
+def test_registry_histogram():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.observe(STAGE_SECONDS, 0.5, stage="send")
+    registry.observe(STAGE_SECONDS, 2.0, stage="send")
+
+    text = registry.render()
+    assert 'pam5_stage_seconds_bucket{stage="send",le="0.1"} 0' in text
+    assert 'pam5_stage_seconds_bucket{stage="send",le="1"} 1' in text
+    assert 'pam5_stage_seconds_bucket{stage="send",le="+Inf"} 2' in text
+    assert 'pam5_stage_seconds_count{stage="send"} 2' in text
+    assert registry.value(STAGE_SECONDS, stage="send") == 2
+
+
+def test_server_metrics_endpoint():
+    registry = set_metrics(MetricsRegistry())
+    received = threading.Event()
+    server = PAM5Server(metrics_port=0)
+    threading.Thread(
+        target=lambda: server.start(
+            host="0.0.0.0",
+            port=12347,
+            message_callback=StreamReceiver(lambda *_: received.set()),
+        ),
+        daemon=True,
+    ).start()
+    time.sleep(0.5)
+
+    client = PAM5Client()
+    try:
+        client.connect("127.0.0.1", 12347)
+        client.send_stream(encode_stream(b"x" * 1000, "chave123"))
+        assert received.wait(5)
+
+        # Servidor em todas as interfaces, /metrics só na local
+        host, port = server.metrics_server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        client.disconnect()
+        server.stop()
+        set_metrics(None)
+
+    for stage in ("encrypt", "encode", "serialize", "send", "recv", "deserialize"):
+        assert registry.value(STAGE_SECONDS, stage=stage) == 1
+    assert 'pam5_stage_bytes_total{stage="encrypt"} 1000' in text
+    assert 'pam5_active_connections{server="thread"}' in text
+    assert not get_metrics().enabled
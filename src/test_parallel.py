@@ -0,0 +1,33 @@
+"""
+Testes do codec paralelo contra o pipeline sequencial
+"""
+
+import numpy as np
+import pytest
+
+from src.crypto import decrypt_bytes, encrypt_bytes
+from src.decoder import decoder_4d_pam5_bytes
+from src.encoder import encoder_4d_pam5_bytes
+from src.parallel import ParallelCodec
+
+
+@pytest.fixture(scope="module")
+def codec():
+    # Shards minúsculos: quase toda mensagem cruza fronteiras entre shards
+    with ParallelCodec(workers=2, shard_size=7, min_parallel_size=1) as codec:
+        yield codec
+
+
+@pytest.mark.parametrize("key", [b"k", b"abc", b"chave123", b"x" * 13, b"y" * 150])
+def test_parallel_codec_matches_serial(codec, key):
+    rng = np.random.default_rng(len(key))
+    for size in range(1, 102):
+        message = rng.bytes(size)
+        expected = encoder_4d_pam5_bytes(encrypt_bytes(message, key))
+
+        symbols = codec.encrypt_encode(message, key)
+        assert np.array_equal(symbols, expected), size
+
+        recovered = codec.decode_decrypt(symbols, key)
+        assert recovered == decrypt_bytes(decoder_4d_pam5_bytes(expected), key)
+        assert recovered == message, size
@@ -0,0 +1,61 @@
+"""
+Testes do formato binário de frames 4D-PAM5
+"""
+
+import numpy as np
+import pytest
+
+from src.protocol import (
+    HEADER,
+    PACKING_3BIT,
+    PACKING_BYTE,
+    ProtocolError,
+    decode_frame,
+    encode_frame,
+    parse_header,
+)
+
+
+def _round_trip(message, packings):
+    frame = encode_frame(message, packings)
+    return frame, decode_frame(parse_header(frame), frame[HEADER.size :])
+
+
+@pytest.mark.parametrize("packings", [PACKING_BYTE, PACKING_3BIT])
+def test_frame_round_trip(packings):
+    symbols = np.random.default_rng(0).choice([-2, -1, 1, 2], size=(101, 4))
+    message = {
+        "symbols": symbols,
+        "key": "chave123",
+        "original_length": 805,
+        "stream_id": 7,
+        "seq": 3,
+        "final": False,
+    }
+
+    frame, decoded = _round_trip(message, packings)
+
+    payload_size = 101 if packings == PACKING_BYTE else 51 * 3
+    assert len(frame) == HEADER.size + len("chave123") + payload_size
+    assert np.array_equal(decoded.pop("symbols"), symbols)
+    assert decoded == {k: v for k, v in message.items() if k != "symbols"}
+
+
+def test_zero_level_falls_back_to_3bit_packing():
+    message = {"symbols": [(0, 1, -2, 2)], "key": "k", "original_length": 8}
+
+    _, decoded = _round_trip(message, PACKING_BYTE | PACKING_3BIT)
+
+    assert decoded["symbols"].tolist() == [[0, 1, -2, 2]]
+    assert "stream_id" not in decoded
+    with pytest.raises(ValueError):
+        encode_frame(message, PACKING_BYTE)
+
+
+def test_rejects_corrupted_frames():
+    frame = encode_frame({"symbols": [(1, 1, 1, 1)], "key": "k"})
+
+    with pytest.raises(ProtocolError):
+        parse_header(b"XX" + frame[2:])
+    with pytest.raises(ProtocolError):
+        decode_frame(parse_header(frame), frame[HEADER.size : -1])
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.client import PAM5Client
+from src.dispatch import Dispatcher
+from src.protocol import build_window, parse_header, parse_window
+from src.server import PAM5Server
+from src.session import Session
+from src.stream import StreamReceiver
+
+
+def start_server(port, callback, dispatcher=None):
+    server = PAM5Server(dispatcher=dispatcher)
+    threading.Thread(
+        target=lambda: server.start("127.0.0.1", port, message_callback=callback),
+        daemon=True,
+    ).start()
+    time.sleep(0.5)
+    client = PAM5Client()
+    client.connect("127.0.0.1", port, wire_format="binary")
+    return server, client
+
+
+def test_window_frame_roundtrip():
+    frame = build_window(7, 65536)
+    assert parse_window(parse_header(frame), b"") == (7, 65536)
+
+
+def test_session_interleaves_streams():
+    """Mensagem curta não espera a grande terminar"""
+    arrivals = []
+    received = {}
+
+    def on_chunk(stream_id, plaintext, final):
+        arrivals.append((stream_id, final))
+        received[stream_id] = received.get(stream_id, b"") + plaintext
+
+    server, client = start_server(12349, StreamReceiver(on_chunk))
+    large = os.urandom(64 * 1024)
+    try:
+        session = Session(client, chunk_size=1024, window=4096)
+        large_id = session.send(large, "chave")
+        small_id = session.send(b"mensagem curta", "chave")
+        assert session.wait(timeout=10)
+        session.close()
+    finally:
+        client.disconnect()
+        server.stop()
+
+    assert received == {large_id: large, small_id: b"mensagem curta"}
+    # Com janela de 4 chunks, a curta chega logo depois deles
+    assert arrivals.index((small_id, True)) <= 5
+    assert arrivals[-1] == (large_id, True)
+
+
+def test_session_window_limits_stream_in_flight():
+    release = threading.Event()
+    consumed = []
+
+    def callback(data):
+        release.wait(5)
+        consumed.append(data["seq"])
+
+    server, client = start_server(12350, callback)
+    try:
+        session = Session(client, chunk_size=1024, window=4096)
+        stream_id = session.send(os.urandom(32 * 1024), "chave")
+        assert not session.wait(timeout=0.5)
+        # Callback parado: só a janela de 4 chunks saiu do cliente
+        assert session.frames_sent == 4
+        assert session.credit(stream_id) == 0
+        release.set()
+        assert session.wait(timeout=10)
+        session.close()
+    finally:
+        release.set()
+        client.disconnect()
+        server.stop()
+
+    assert consumed == list(range(32))
+
+
+def failing_callback(data):
+    # No módulo: com use_processes o callback vai por pickle ao pool
+    if data["key"] == "quebrada" and data["seq"] == 2:
+        raise ValueError("consumidor falhou")
+
+
+@pytest.mark.parametrize(
+    "port, dispatcher",
+    [
+        (12352, lambda: None),
+        (12355, lambda: Dispatcher(workers=2)),
+        (12356, lambda: Dispatcher(workers=2, use_processes=True)),
+    ],
+    ids=["inline", "threads", "processes"],
+)
+def test_failed_chunk_fails_only_its_stream(port, dispatcher):
+    """Callback com erro: NACK para o stream, a conexão e os outros seguem"""
+    server, client = start_server(port, failing_callback, dispatcher())
+    try:
+        session = Session(client, chunk_size=1024, window=4096)
+        broken = session.send(os.urandom(16 * 1024), "quebrada")
+        healthy = session.send(os.urandom(16 * 1024), "chave")
+        assert session.wait(healthy, timeout=10)
+        assert not session.wait(broken, timeout=10)
+        assert not session.wait(timeout=10)
+
+        # A mesma conexão continua aceitando streams novos
+        after = session.send(os.urandom(4 * 1024), "chave")
+        assert session.wait(after, timeout=10)
+        session.close()
+    finally:
+        client.disconnect()
+        server.stop()
+
+    assert list(session.failed) == [broken]
+    assert "chunk 2" in str(session.failed[broken])
+
+
+def test_rejected_chunk_gets_no_window():
+    release = threading.Event()
+
+    def callback(data):
+        release.wait(5)
+
+    dispatcher = Dispatcher(workers=1, max_queue=1, policy="reject")
+    server, client = start_server(12353, callback, dispatcher)
+    try:
+        session = Session(client, chunk_size=1024, window=4096)
+        stream_id = session.send(os.urandom(8 * 1024), "chave")
+        assert not session.wait(stream_id, timeout=10)
+        release.set()
+        session.close()
+    finally:
+        release.set()
+        client.disconnect()
+        server.stop()
+
+    # Com o callback parado e fila de 1, um dos primeiros chunks é recusado
+    assert isinstance(session.failed[stream_id], ConnectionError)
+    assert dispatcher.rejected >= 1
+
+
+def test_unreadable_payload_fails_stream():
+    def payload():
+        yield os.urandom(4096)
+        raise OSError("arquivo sumiu")
+
+    server, client = start_server(12357, lambda data: None)
+    try:
+        session = Session(client, chunk_size=1024, window=4096)
+        broken = session.send(payload(), "chave")
+        healthy = session.send(os.urandom(8 * 1024), "chave")
+        assert not session.wait(broken, timeout=10)
+        assert session.wait(healthy, timeout=10)
+        session.close()
+    finally:
+        client.disconnect()
+        server.stop()
+
+    assert isinstance(session.failed[broken], OSError)
@@ -0,0 +1,82 @@
+"""
+Testes da remontagem de mensagens recebidas em blocos
+"""
+
+import os
+
+import pytest
+
+from src.stream import MessageReceiver, encode_stream
+
+
+def test_message_receiver_delivers_whole_messages():
+    payload = os.urandom(5000)
+    received = []
+    receiver = MessageReceiver(lambda message, frames: received.append(message))
+
+    frames = list(encode_stream(payload, "chave", chunk_size=1000))
+    for frame in frames[:-1]:
+        receiver(frame)
+    # Nada é entregue antes do último bloco
+    assert received == []
+
+    receiver(frames[-1])
+    assert received == [payload]
+    assert not receiver.open
+
+
+def test_message_receiver_interleaved_streams():
+    first, second = os.urandom(3000), os.urandom(2500)
+    received = {}
+    receiver = MessageReceiver(
+        lambda message, frames: received.update({frames[0]["stream_id"]: message})
+    )
+
+    streams = [
+        list(encode_stream(first, "chave", chunk_size=1000, stream_id=1)),
+        list(encode_stream(second, "outra", chunk_size=1000, stream_id=2)),
+    ]
+    for pair in zip(*streams):
+        for frame in pair:
+            receiver(frame)
+    assert received == {1: first, 2: second}
+
+
+def test_message_receiver_drops_out_of_order_stream():
+    receiver = MessageReceiver(lambda message, frames: None)
+    frames = list(encode_stream(b"x" * 3000, "chave", chunk_size=1000))
+    receiver(frames[0])
+    with pytest.raises(ValueError):
+        receiver(frames[2])
+    assert not receiver.open
+
+
+def test_message_receiver_discards_unfinished_streams():
+    received = []
+    receiver = MessageReceiver(
+        lambda message, frames: received.append(message), max_open=2
+    )
+    cancelled = list(encode_stream(b"a" * 3000, "chave", chunk_size=1000))
+    receiver(cancelled[0])
+    receiver(cancelled[1])
+
+    # Dois streams novos: o incompleto mais antigo é descartado
+    payloads = [os.urandom(1500), os.urandom(1500)]
+    streams = [list(encode_stream(p, "chave", chunk_size=1000)) for p in payloads]
+    receiver(streams[0][0])
+    receiver(streams[1][0])
+    assert cancelled[0]["stream_id"] not in receiver.open
+    assert cancelled[0]["stream_id"] not in receiver.receiver.expected_seq
+
+    receiver(streams[0][1])
+    receiver(streams[1][1])
+    assert received == payloads
+    assert not receiver.open
+
+    # Os blocos restantes do stream descartado não formam mensagem
+    with pytest.raises(ValueError):
+        receiver(cancelled[2])
+    assert received == payloads
+
+    with pytest.raises(ValueError):
+        MessageReceiver(lambda message, frames: None, max_open=0)
@@ -0,0 +1,153 @@
+"""
+Testes do motor de recepção (FrameReader) sobre pares de sockets
+"""
+
+import os
+import socket
+import threading
+
+import pytest
+
+from src.client import PAM5Client
+from src.protocol import (
+    SUPPORTED_PACKINGS,
+    ProtocolError,
+    decode_frame,
+    encode_frame,
+)
+from src.stream import decode_chunk, encode_stream
+from src.transport import FrameReader, recv_into_exactly, send_buffers
+
+
+def read_exactly(sock, size):
+    view = memoryview(bytearray(size))
+    recv_into_exactly(sock, view)
+    return view
+
+
+class ShortReads:
+    """Socket que devolve no máximo limit bytes por recv_into."""
+
+    def __init__(self, sock, limit=3):
+        self.sock = sock
+        self.limit = limit
+
+    def recv_into(self, view):
+        return self.sock.recv_into(view[: self.limit])
+
+
+def frames(payload, chunk_size):
+    return [
+        encode_frame(frame)
+        for frame in encode_stream(payload, "chave", chunk_size=chunk_size)
+    ]
+
+
+def read_all(reader, count):
+    chunks = []
+    for _ in range(count):
+        header, body = reader.read_frame()
+        chunks.append(decode_chunk(decode_frame(header, bytes(body))))
+    return b"".join(chunks)
+
+
+@pytest.mark.parametrize("read_ahead", [64, 64 * 1024])
+def test_partial_reads_and_read_ahead(read_ahead):
+    payload = bytes(range(256)) * 20
+    wire = frames(payload, chunk_size=1000)
+    sender, receiver = socket.socketpair()
+    with sender, receiver:
+        # Vários frames num único envio: o read-ahead cruza as fronteiras
+        sender.sendall(b"".join(wire))
+        reader = FrameReader(ShortReads(receiver), read_ahead=read_ahead)
+        assert read_all(reader, len(wire)) == payload
+
+        sender.close()
+        assert reader.read_frame() is None
+
+
+def test_max_frame_size_rejected():
+    sender, receiver = socket.socketpair()
+    with sender, receiver:
+        sender.sendall(frames(b"x" * 1000, chunk_size=1000)[0])
+        with pytest.raises(ProtocolError):
+            FrameReader(receiver, max_frame_size=100).read_frame()
+
+
+def test_eof_mid_frame():
+    wire = frames(b"x" * 1000, chunk_size=1000)[0]
+    sender, receiver = socket.socketpair()
+    with receiver:
+        sender.sendall(wire[:50])
+        sender.close()
+        with pytest.raises(ConnectionError):
+            FrameReader(receiver).read_frame()
+
+    sender, receiver = socket.socketpair()
+    with receiver:
+        sender.sendall(b"abc")
+        sender.close()
+        view = memoryview(bytearray(3))
+        assert recv_into_exactly(receiver, view)
+        assert not recv_into_exactly(receiver, view, allow_eof=True)
+        with pytest.raises(ConnectionError):
+            recv_into_exactly(receiver, view)
+
+
+class PartialWrites:
+    """Socket cujo sendmsg escreve no máximo limit bytes por chamada."""
+
+    def __init__(self, sock, limit=1000):
+        self.sock = sock
+        self.limit = limit
+        self.calls = 0
+
+    def sendmsg(self, buffers):
+        self.calls += 1
+        data = b"".join(buffers)[: self.limit]
+        self.sock.sendall(data)
+        return len(data)
+
+
+@pytest.mark.parametrize("iov_max", [2, 1024])
+def test_send_buffers_resumes_partial_writes(monkeypatch, iov_max):
+    monkeypatch.setattr("src.transport._IOV_MAX", iov_max)
+    sizes = (1, 5000, 0, 70000, 3, 999, 1)
+    buffers = [bytes([i]) * size for i, size in enumerate(sizes)]
+    expected = b"".join(buffers)
+    sender, receiver = socket.socketpair()
+    with sender, receiver:
+        # Buffer de envio pequeno e escritas parciais no meio dos buffers
+        sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        partial = PartialWrites(sender)
+        received = bytearray()
+        thread = threading.Thread(
+            target=lambda: received.extend(read_exactly(receiver, len(expected)))
+        )
+        thread.start()
+        assert send_buffers(partial, buffers) == len(expected)
+        thread.join(5)
+    assert received == expected
+    assert partial.calls >= len(expected) // 1000
+
+
+def test_send_many_matches_separate_frames():
+    messages = list(encode_stream(os.urandom(300_000), "chave", chunk_size=7000))
+    server, peer = socket.socketpair()
+    client = PAM5Client()
+    client.socket, client.connected, client.packings = peer, True, SUPPORTED_PACKINGS
+    with server, peer:
+        peer.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        reader = FrameReader(server)
+        decoded = []
+
+        def receive():
+            for _ in messages:
+                header, body = reader.read_frame()
+                decoded.append(decode_chunk(decode_frame(header, bytes(body))))
+
+        thread = threading.Thread(target=receive)
+        thread.start()
+        assert client.send_many(messages) == len(messages)
+        thread.join(5)
+    assert decoded == [decode_chunk(message) for message in messages]
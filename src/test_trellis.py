@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from src.channel import slice_levels
+from src.decoder import decoder_4d_pam5_bytes
+from src.encoder import encoder_4d_pam5_bytes
+from src.protocol import HEADER, decode_frame, encode_frame, parse_header
+from src.stream import decode_chunk, encode_stream
+from src.trellis import (
+    SUBSET_POINTS,
+    TrellisDecoder,
+    TrellisEncoder,
+    _next_state,
+    trellis_decode,
+)
+
+
+def _reference_encode(data):
+    state, symbols = 0, []
+    for value in data:
+        x1, x2 = (value >> 6) & 1, value >> 7
+        label = (x2 << 2) | (x1 << 1) | (state & 1)
+        symbols.append(SUBSET_POINTS[label, value & 63])
+        state = _next_state(state, x1, x2)
+    return np.array(symbols), state
+
+
+def test_encoder_matches_state_machine_across_chunks():
+    data = np.random.default_rng(0).integers(0, 256, 1000, dtype=np.uint8)
+    expected, state = _reference_encode(data)
+
+    encoder = TrellisEncoder()
+    cuts = [0, 1, 3, 4, 500, 1000]
+    symbols = np.concatenate([encoder(data[a:b]) for a, b in zip(cuts, cuts[1:])])
+
+    assert np.array_equal(symbols, expected)
+    assert encoder.state == state
+    assert len({tuple(point) for point in SUBSET_POINTS.reshape(-1, 4)}) == 512
+
+
+def test_chunked_viterbi_decodes_noisy_symbols():
+    rng = np.random.default_rng(1)
+    data = rng.integers(0, 256, 5000, dtype=np.uint8)
+    noisy = TrellisEncoder()(data) + rng.normal(0, 0.15, (5000, 4))
+
+    decoder = TrellisDecoder(block=64, overlap=24)
+    chunks = [decoder(noisy[start : start + 333]) for start in range(0, 5000, 333)]
+    decoded = np.concatenate(chunks + [decoder.flush()])
+
+    assert np.array_equal(decoded, data)
+    assert np.array_equal(trellis_decode(noisy), data)
+
+
+def test_trellis_coding_beats_plain_mapping_at_same_noise():
+    rng = np.random.default_rng(2)
+    data = rng.integers(0, 256, 20_000, dtype=np.uint8)
+    noise = rng.normal(0, 0.2, (20_000, 4))
+
+    plain = decoder_4d_pam5_bytes(slice_levels(encoder_4d_pam5_bytes(data) + noise))
+    coded = trellis_decode(TrellisEncoder()(data) + noise)
+
+    assert np.count_nonzero(coded != data) * 10 < np.count_nonzero(plain != data)
+
+
+def test_trellis_frames_keep_the_coding_flag():
+    symbols = TrellisEncoder()(b"trellis")
+    frame = encode_frame({"symbols": symbols, "key": "k", "coding": "trellis"})
+
+    decoded = decode_frame(parse_header(frame), frame[HEADER.size :])
+
+    assert decoded["coding"] == "trellis"
+    assert trellis_decode(decoded["symbols"]).tobytes() == b"trellis"
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_trellis_stream_round_trip(compression):
+    payload = b"trellis " * 1000 + bytes(range(256)) * 8
+    frames = list(
+        encode_stream(payload, "chave", 1000, compression=compression, coding="trellis")
+    )
+    # Cada chunk vai com 3 bits por nível e é decodificado pelo Viterbi
+    wire = [encode_frame(frame) for frame in frames]
+    received = [decode_frame(parse_header(f), f[HEADER.size :]) for f in wire]
+    assert all(message["coding"] == "trellis" for message in received)
+    assert b"".join(decode_chunk(message) for message in received) == payload
+
+
+def test_unknown_coding_rejected():
+    with pytest.raises(ValueError):
+        next(encode_stream(b"dados", "chave", coding="viterbi"))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+
+from src.waveform import (
+    WaveformExporter,
+    draw_waveform,
+    minmax_envelope,
+    render_waveform,
+)
+
+
+def test_envelope_keeps_extremes():
+    symbols = np.ones((1000, 4), dtype=np.int8)
+    symbols[123, 2] = -2
+    symbols[777, 0] = 2
+
+    _, low, high = minmax_envelope(symbols, bins=100)
+    assert len(low) == 100
+    assert low.min() == -2 and high.max() == 2
+    assert (low == -2).sum() == 1 and (high == 2).sum() == 1
+
+    with pytest.raises(ValueError):
+        minmax_envelope(symbols, bins=0)
+
+
+def test_artist_count_does_not_grow_with_symbols():
+    rng = np.random.default_rng(0)
+    counts = []
+    for count in (10, 400, 100_000):
+        ax = Figure(figsize=(15, 9), dpi=120).add_subplot()
+        draw_waveform(ax, rng.choice(np.array([-2, -1, 1, 2], np.int8), (count, 4)))
+        counts.append(len(ax.collections) + len(ax.lines))
+    assert max(counts) <= 4
+
+
+def test_render_waveform_is_cached(tmp_path):
+    symbols = [(2, -1, 1, -2), (1, 1, -1, -1)]
+    path = tmp_path / "wave.png"
+
+    image = render_waveform(symbols, "teste", path=str(path), dpi=40)
+    assert image.startswith(b"\x89PNG")
+    assert path.read_bytes() == image
+    assert render_waveform(np.array(symbols, np.int8), "teste", dpi=40) is image
+
+
+def test_exporter_renders_in_background():
+    exporter = WaveformExporter()
+    try:
+        future = exporter.submit(np.ones((10, 4), np.int8), "svg", fmt="svg", dpi=40)
+        assert b"<svg" in future.result(timeout=30)
+    finally:
+        exporter.close()
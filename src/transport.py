@@ -0,0 +1,244 @@
+"""
+Socket helpers for the PAM5 client and servers.
+
+FrameReader fills preallocated bytearrays with recv_into through a
+memoryview, so a frame is copied from the kernel once: no
+`received += chunk` concatenation and no short reads on the header.
+Views it returns point into its buffers and stay valid until the next
+read on the same reader.
+"""
+
+import os
+from typing import Iterable, Optional, Tuple
+
+from src.protocol import HEADER, FrameHeader, ProtocolError, parse_header
+
+DEFAULT_MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = -1
+# sysconf devolve -1 quando o limite é indeterminado
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+
+def recv_into_exactly(sock, view: memoryview, allow_eof: bool = False) -> bool:
+    """
+    Fill view completely from sock.
+
+    Returns False if the peer closed the connection before sending any
+    byte and allow_eof is set; a close in the middle raises ConnectionError.
+    """
+    size = len(view)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            if allow_eof and received == 0:
+                return False
+            raise ConnectionError(f"Connection closed after {received} of {size} bytes")
+        received += count
+    return True
+
+
+def send_buffers(sock, buffers: Iterable) -> int:
+    """
+    Write every buffer to sock, in order, with as few syscalls as possible.
+
+    Uses sendmsg scatter-gather so headers and payloads go out together
+    without being joined first; platforms without sendmsg fall back to one
+    sendall of the joined buffers. Returns the number of bytes written.
+    """
+    views = [memoryview(buffer).cast("B") for buffer in buffers if len(buffer)]
+    total = sum(len(view) for view in views)
+    if not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(views))
+        return total
+
+    index = 0
+    while index < len(views):
+        sent = sock.sendmsg(views[index : index + _IOV_MAX])
+        # Avança sobre os buffers já enviados; o último pode ter ido pela metade
+        while sent:
+            head = views[index]
+            if sent >= len(head):
+                sent -= len(head)
+                index += 1
+            else:
+                views[index] = head[sent:]
+                sent = 0
+    return total
+
+
+class FrameReader:
+    """
+    Read frames from one socket through a reused receive buffer.
+
+    Small frames are parsed straight out of a read-ahead buffer, so a burst
+    of them costs one recv_into. A frame larger than that buffer gets a
+    bytearray of its own, filled in place; buffers up to max_retained bytes
+    are kept for the next large frame.
+    """
+
+    def __init__(
+        self,
+        sock,
+        max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+        read_ahead: int = 64 * 1024,
+        max_retained: int = 1024 * 1024,
+    ):
+        self.sock = sock
+        self.max_frame_size = max_frame_size
+        self.max_retained = max_retained
+        self._recv = bytearray(read_ahead)
+        self._view = memoryview(self._recv)
+        self._start = 0
+        self._end = 0
+        self._large = bytearray(0)
+
+    @property
+    def buffered(self) -> int:
+        """Bytes already received and not yet returned by a read."""
+        return self._end - self._start
+
+    def _large_view(self, size: int) -> memoryview:
+        if size <= len(self._large):
+            return memoryview(self._large)[:size]
+        buffer = bytearray(size)
+        if size <= self.max_retained:
+            self._large = buffer
+        return memoryview(buffer)
+
+    def read_exactly(self, size: int, allow_eof: bool = False) -> Optional[memoryview]:
+        """
+        Return a view of the next size bytes, or None if allow_eof is set and
+        the peer closed the connection before sending any of them.
+        """
+        available = self._end - self._start
+        if available >= size:
+            view = self._view[self._start : self._start + size]
+            self._start += size
+            return view
+
+        if size > len(self._recv):
+            view = self._large_view(size)
+            view[:available] = self._view[self._start : self._end]
+            self._start = self._end = 0
+            if not recv_into_exactly(
+                self.sock, view[available:], allow_eof and not available
+            ):
+                return None
+            return view
+
+        # Move o resto do frame para o início do buffer e completa com recv_into
+        self._recv[:available] = self._recv[self._start : self._end]
+        self._start, self._end = 0, available
+        while self._end < size:
+            count = self.sock.recv_into(self._view[self._end :])
+            if not count:
+                if allow_eof and self._end == 0:
+                    return None
+                raise ConnectionError(
+                    f"Connection closed after {self._end} of {size} bytes"
+                )
+            self._end += count
+        self._start = size
+        return self._view[:size]
+
+    def read_frame(
+        self, first_bytes: bytes = b""
+    ) -> Optional[Tuple[FrameHeader, memoryview]]:
+        """
+        Read one binary frame; first_bytes holds header bytes already read.
+        Returns (header, body) or None on a clean close between frames.
+        """
+        rest = self.read_exactly(HEADER.size - len(first_bytes), not first_bytes)
+        if rest is None:
+            return None
+        header = parse_header(bytes(first_bytes) + rest if first_bytes else rest)
+        return header, self.read_exactly(self._check_size(header.body_length))
+
+    def read_sized(self, first_bytes: bytes = b"") -> Optional[memoryview]:
+        """
+        Read one legacy frame: a 4-byte big-endian length, then the body.
+        """
+        rest = self.read_exactly(4 - len(first_bytes), not first_bytes)
+        if rest is None:
+            return None
+        size = int.from_bytes(bytes(first_bytes) + rest, byteorder="big")
+        return self.read_exactly(self._check_size(size))
+
+    def _check_size(self, size: int) -> int:
+        if size > self.max_frame_size:
+            raise ProtocolError(
+                f"Frame of {size} bytes exceeds the {self.max_frame_size} byte limit"
+            )
+        return size
+
+
+if __name__ == "__main__":
+    import socket
+    import threading
+    import time
+
+    def legacy_receive(sock):
+        """Laço de recepção original de PAM5Server.handle_client."""
+        size_data = sock.recv(4)
+        data_size = int.from_bytes(size_data, byteorder="big")
+        received_data = b""
+        while len(received_data) < data_size:
+            chunk = sock.recv(min(data_size - len(received_data), 4096))
+            if not chunk:
+                break
+            received_data += chunk
+        return received_data
+
+    def throughput(receive, frame, repeat):
+        sender, receiver = socket.socketpair()
+        thread = threading.Thread(
+            target=lambda: [sender.sendall(frame) for _ in range(repeat)]
+        )
+        start = time.perf_counter()
+        thread.start()
+        for _ in range(repeat):
+            receive(receiver)
+        elapsed = time.perf_counter() - start
+        thread.join()
+        sender.close()
+        receiver.close()
+        return (len(frame) - 4) * repeat / elapsed / 1e6
+
+    # O laço antigo é quadrático: acima disso levaria minutos por frame
+    legacy_limit = 16 * 1024 * 1024
+
+    print(f"{'frame':>10} {'before MB/s':>12} {'after MB/s':>11}")
+    for size in (
+        1 << 10,
+        1 << 14,
+        1 << 18,
+        1 << 20,
+        1 << 22,
+        1 << 24,
+        1 << 26,
+        1 << 28,
+    ):
+        payload = bytes(size)
+        frame = size.to_bytes(4, byteorder="big") + payload
+        repeat = max(1, (64 << 20) // size)
+
+        before = (
+            f"{throughput(legacy_receive, frame, repeat):>12.1f}"
+            if size <= legacy_limit
+            else f"{'-':>12}"
+        )
+        readers = {}
+
+        def engine_receive(sock):
+            if sock not in readers:
+                readers[sock] = FrameReader(sock)
+            return readers[sock].read_sized()
+
+        after = throughput(engine_receive, frame, repeat)
+        print(f"{size:>10} {before} {after:>11.1f}")
@@ -1,65 +1,146 @@
-from typing import List, Tuple
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib import style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 
+Symbols = Union[Sequence[Tuple[int, int, int, int]], np.ndarray]
 
-def plot_waveform(
-    symbols: List[Tuple[int, int, int, int]], title: str = "4D-PAM5 Waveform"
-) -> None:
-    plt.style.use("seaborn-v0_8-whitegrid")
+SYMBOL_DURATION = 1.0  # duração de cada símbolo
+TIME_PER_LEVEL = SYMBOL_DURATION / 4  # tempo para cada nível no símbolo
 
-    y = []
-    for symbol in symbols:
-        y.extend(symbol)
+# Paleta de cores mais suave e profissional
+COLORS = ["#E74C3C", "#3498DB", "#2ECC71", "#F39C12", "#9B59B6", "#1ABC9C"]
 
-    # Criar eixo temporal mais realista
-    symbol_duration = 1.0  # duração de cada símbolo
-    time_per_level = symbol_duration / 4  # tempo para cada nível no símbolo
-    x = np.arange(0, len(y) * time_per_level, time_per_level)
+STYLE = "seaborn-v0_8-whitegrid"
+FIGSIZE = (15, 9)
+CACHE_SIZE = 32
 
-    # Criar figura com estilo profissional
-    fig, ax = plt.subplots(figsize=(15, 9), dpi=120)
+# Acima disso os pontos de transição viram um borrão e só custam tempo
+SCATTER_LIMIT = 500
 
-    # Paleta de cores mais suave e profissional
-    colors = ["#E74C3C", "#3498DB", "#2ECC71", "#F39C12", "#9B59B6", "#1ABC9C"]
 
-    # Plotar cada símbolo com cor única
-    for i, symbol in enumerate(symbols):
-        start_time = i * symbol_duration
-        symbol_times = np.arange(
-            start_time, start_time + symbol_duration, time_per_level
-        )
-        symbol_levels = list(symbol)
-
-        # Linha principal do símbolo
-        ax.step(
-            symbol_times,
-            symbol_levels,
-            where="post",
-            color=colors[i % len(colors)],
-            linewidth=2.5,
-            alpha=0.8,
-            label=f"Símbolo {i + 1}",
-        )
+def _as_levels(symbols: Symbols) -> np.ndarray:
+    return np.asarray(symbols, dtype=np.int8).reshape(-1, 4)
+
+
+def step_segments(symbols: Symbols) -> np.ndarray:
+    """
+    Step trace of every symbol as an (N, 8, 2) array of (time, level)
+    vertices: each level is held for TIME_PER_LEVEL.
+    Example:
+        >>> step_segments([(2, -1, 1, -2)])[0, :, 1].tolist()
+        [2.0, 2.0, -1.0, -1.0, 1.0, 1.0, -2.0, -2.0]
+    """
+    levels = _as_levels(symbols)
+    count = len(levels)
+    edges = np.arange(5) * TIME_PER_LEVEL
+    starts = np.arange(count, dtype=np.float64)[:, None] * SYMBOL_DURATION
+
+    segments = np.empty((count, 8, 2))
+    segments[:, 0::2, 0] = starts + edges[:-1]
+    segments[:, 1::2, 0] = starts + edges[1:]
+    segments[:, 0::2, 1] = levels
+    segments[:, 1::2, 1] = levels
+    return segments
+
+
+def minmax_envelope(symbols: Symbols, bins: int) -> Tuple[np.ndarray, ...]:
+    """
+    Downsample the level sequence to at most bins (time, min, max) columns,
+    which is what a trace of that many pixels can show anyway.
+    Example:
+        >>> _, low, high = minmax_envelope([(2, -1, 1, -2), (1, 1, 1, 1)], 2)
+        >>> low.tolist(), high.tolist()
+        ([-2, 1], [2, 1])
+    """
+    if bins < 1:
+        raise ValueError(f"bins must be at least 1, got {bins}")
+    flat = _as_levels(symbols).ravel()
+    per_bin = max(1, -(-len(flat) // bins))
+    padding = -len(flat) % per_bin
+    if padding:
+        flat = np.concatenate([flat, np.repeat(flat[-1:], padding)])
+    grouped = flat.reshape(-1, per_bin)
+    times = np.arange(len(grouped)) * per_bin * TIME_PER_LEVEL
+    return times, grouped.min(axis=1), grouped.max(axis=1)
 
-        # Preenchimento suave abaixo da linha
-        ax.fill_between(
-            symbol_times,
-            symbol_levels,
-            alpha=0.15,
-            color=colors[i % len(colors)],
-            step="post",
+
+def draw_waveform(
+    ax,
+    symbols: Symbols,
+    title: str = "4D-PAM5 Waveform",
+    max_points: Optional[int] = None,
+) -> None:
+    """
+    Draw the waveform on ax with a fixed number of artists, whatever the
+    number of symbols. Past max_points levels (default: the axes width in
+    pixels) the trace is min/max downsampled.
+    """
+    levels = _as_levels(symbols)
+    count = len(levels)
+    if max_points is None:
+        max_points = int(ax.figure.get_figwidth() * ax.figure.dpi)
+
+    if count * 4 <= max_points:
+        segments = step_segments(levels)
+        colors = to_rgba_array(COLORS)[np.arange(count) % len(COLORS)]
+
+        # Preenchimento suave abaixo da linha: polígono de cada símbolo até 0
+        polygons = np.empty((count, 10, 2))
+        polygons[:, :8] = segments
+        polygons[:, 8:, 0] = segments[:, [-1, 0], 0]
+        polygons[:, 8:, 1] = 0
+        fill_colors = colors.copy()
+        fill_colors[:, 3] = 0.15
+        ax.add_collection(
+            PolyCollection(polygons, facecolors=fill_colors, edgecolors="none")
         )
 
-    # Pontos de transição mais elegantes
-    ax.scatter(
-        x, y, c="#34495E", s=40, zorder=5, alpha=0.7, edgecolors="white", linewidth=1
-    )
+        # Linha principal dos símbolos, uma cor por símbolo
+        line_colors = colors.copy()
+        line_colors[:, 3] = 0.8
+        ax.add_collection(LineCollection(segments, colors=line_colors, linewidths=2.5))
+
+        if count <= SCATTER_LIMIT:
+            # Pontos de transição mais elegantes
+            ax.scatter(
+                segments[:, 0::2, 0].ravel(),
+                levels.ravel(),
+                c="#34495E",
+                s=40,
+                zorder=5,
+                alpha=0.7,
+                edgecolors="white",
+                linewidth=1,
+            )
+    elif count:
+        # Mais níveis que pixels: desenha só o envelope mínimo/máximo
+        times, low, high = minmax_envelope(levels, max_points)
+        ax.fill_between(times, low, high, step="post", color=COLORS[1], alpha=0.35)
+        # Um traço vertical por coluna; uma linha única em zigue-zague custa
+        # muito mais para o Agg rasterizar
+        columns = np.empty((len(times), 2, 2))
+        columns[:, :, 0] = times[:, None]
+        columns[:, 0, 1] = low
+        columns[:, 1, 1] = high
+        ax.add_collection(
+            LineCollection(columns, colors=COLORS[1], linewidths=0.8, alpha=0.9)
+        )
 
     # Configurar eixos com melhor formatação
     ax.set_ylim(-2.8, 2.8)
-    ax.set_xlim(-0.1, len(symbols) * symbol_duration + 0.1)
+    ax.set_xlim(-0.1, count * SYMBOL_DURATION + 0.1)
     ax.set_yticks([-2, -1, 1, 2])
     ax.set_yticklabels(["-2", "-1", "+1", "+2"], fontsize=13, color="#2C3E50")
 
@@ -80,21 +161,27 @@ def plot_waveform(
     ax.axhline(y=0, color="#7F8C8D", linewidth=1.2, alpha=0.6, linestyle="--")
 
     # Legenda aprimorada
-    if len(symbols) <= 6:
+    if 0 < count <= 6:
+        handles = [
+            Line2D([], [], color=COLORS[i], linewidth=2.5, alpha=0.8)
+            for i in range(count)
+        ]
         legend = ax.legend(
+            handles,
+            [f"Símbolo {i + 1}" for i in range(count)],
             loc="upper right",
             frameon=True,
             fancybox=True,
             shadow=True,
             fontsize=11,
-            ncol=2 if len(symbols) > 3 else 1,
+            ncol=2 if count > 3 else 1,
         )
         legend.get_frame().set_facecolor("#FFFFFF")
         legend.get_frame().set_alpha(0.95)
         legend.get_frame().set_edgecolor("#BDC3C7")
 
     # Estilo visual refinado
-    fig.patch.set_facecolor("#FAFAFA")
+    ax.figure.patch.set_facecolor("#FAFAFA")
     ax.set_facecolor("#FFFFFF")
 
     # Bordas mais elegantes
@@ -102,7 +189,7 @@ def plot_waveform(
         spine.set_visible(False)
 
     # Adicionar informações técnicas
-    info_text = f"Símbolos: {len(symbols)} | Níveis: 5 | Duração total: {len(symbols)}s"
+    info_text = f"Símbolos: {count} | Níveis: 5 | Duração total: {count}s"
     ax.text(
         0.02,
         0.98,
@@ -115,14 +202,135 @@ def plot_waveform(
         ),
     )
 
+
+def waveform_samples(symbols: Symbols) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Raw (time, level) samples of the step trace, for callers that plot or
+    analyse the signal themselves.
+    Example:
+        >>> times, levels = waveform_samples([(2, -1, 1, -2)])
+        >>> times[:4].tolist(), levels[:4].tolist()
+        ([0.0, 0.25, 0.25, 0.5], [2.0, 2.0, -1.0, -1.0])
+    """
+    vertices = step_segments(symbols).reshape(-1, 2)
+    return vertices[:, 0], vertices[:, 1]
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_render_lock = threading.Lock()
+
+
+def _cache_key(levels: np.ndarray, *options) -> Tuple:
+    digest = hashlib.blake2b(levels.tobytes(), digest_size=16).hexdigest()
+    return (digest, len(levels), *options)
+
+
+def render_waveform(
+    symbols: Symbols,
+    title: str = "4D-PAM5 Waveform",
+    path: Optional[str] = None,
+    fmt: str = "png",
+    dpi: int = 120,
+    max_points: Optional[int] = None,
+) -> bytes:
+    """
+    Render the waveform without a display (Agg, no pyplot state) and return
+    the encoded image; with path it is also written to that file. Results
+    are cached by a hash of the symbol sequence and the options, so the
+    same message is only drawn once.
+    """
+    levels = _as_levels(symbols)
+    key = _cache_key(levels, title, fmt, dpi, max_points)
+    with _cache_lock:
+        image = _cache.get(key)
+        if image is not None:
+            _cache.move_to_end(key)
+
+    if image is None:
+        fig = Figure(figsize=FIGSIZE, dpi=dpi)
+        FigureCanvasAgg(fig)
+        # style.context altera rcParams globais: as renderizações são
+        # serializadas pelo lock para não misturar estilos entre threads
+        with _render_lock, style.context(STYLE):
+            draw_waveform(fig.add_subplot(), levels, title, max_points)
+            fig.tight_layout(pad=2.0)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=fmt, facecolor=fig.get_facecolor())
+        image = buffer.getvalue()
+        with _cache_lock:
+            _cache[key] = image
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    if path:
+        with open(path, "wb") as f:
+            f.write(image)
+    return image
+
+
+class WaveformExporter:
+    """
+    Renders waveforms on a background thread so callers on the send or
+    receive path never wait for matplotlib.
+    Example:
+        >>> exporter = WaveformExporter()
+        >>> exporter.submit([(2, -1, 1, -2)], fmt="svg").result()[:5]
+        b'<?xml'
+        >>> exporter.close()
+    """
+
+    def __init__(self, workers: int = 1):
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="waveform")
+
+    def submit(
+        self, symbols: Symbols, title: str = "4D-PAM5 Waveform", **options
+    ) -> Future:
+        """Queue render_waveform(symbols, title, **options); returns its Future."""
+        # Copia os símbolos: o chamador pode reutilizar o buffer
+        levels = _as_levels(symbols).copy()
+        return self._executor.submit(render_waveform, levels, title, **options)
+
+    def close(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def plot_waveform(
+    symbols: List[Tuple[int, int, int, int]],
+    title: str = "4D-PAM5 Waveform",
+    max_points: Optional[int] = None,
+) -> None:
+    """Interactive window; blocks until it is closed (see render_waveform)."""
+    plt.style.use(STYLE)
+
+    # Criar figura com estilo profissional
+    _, ax = plt.subplots(figsize=FIGSIZE, dpi=120)
+    draw_waveform(ax, symbols, title, max_points)
+
     plt.tight_layout(pad=2.0)
     plt.show()
 
 
 if __name__ == "__main__":
+    import sys
+    import time
+
     from src.ascii_utils import text_to_binary
     from src.encoder import encoder_4d_pam5
 
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench":
+        # Tempo para desenhar N símbolos num canvas Agg (sem janela)
+        rng = np.random.default_rng(0)
+        for count in (100, 10_000, 1_000_000):
+            symbols = rng.choice(np.array([-2, -1, 1, 2], np.int8), (count, 4))
+            fig = Figure(figsize=(15, 9), dpi=120)
+            canvas = FigureCanvasAgg(fig)
+            start = time.perf_counter()
+            draw_waveform(fig.add_subplot(), symbols)
+            canvas.draw()
+            print(f"{count:>9} símbolos: {time.perf_counter() - start:.3f} s")
+        sys.exit()
+
     text = "PAM5"
     binary = text_to_binary(text)
     symbols = encoder_4d_pam5(binary)